@@ -8,6 +8,13 @@ from dotenv import load_dotenv
 # Import ikapi script components
 from ikapi import IKApi, FileStorage
 
+# Shared IK response cache (persistent, shared with lex_bot and Drafter) when running in the main image
+try:
+    from backend.Deep_research.lex_bot.core.ik_cache import get_ik_cache, search_key
+    HAS_IK_CACHE = True
+except ImportError:
+    HAS_IK_CACHE = False
+
 load_dotenv()
 
 app = FastAPI(title="Case Search API", description="Wrapper for Indian Kanoon API")
@@ -57,7 +64,11 @@ def search_cases(
         
         # IKApi internally calls urllib.parse.quote_plus on 'q' inside search()
         # but let's pass it directly
-        result_json = ikapi_instance.search_with_exception(q, pagenum, maxpages)
+        fetch = lambda: ikapi_instance.search_with_exception(q, pagenum, maxpages)
+        if HAS_IK_CACHE:
+            result_json = get_ik_cache("search").get_or_fetch(search_key(q, pagenum, maxpages), fetch)
+        else:
+            result_json = fetch()
         
         if result_json is None:
             raise HTTPException(status_code=500, detail="Failed to fetch data from Indian Kanoon API")
@@ -75,12 +86,16 @@ def get_document(doc_id: int):
         storage = FileStorage("/tmp/ikapi_dummy_storage")
         ikapi_instance = IKApi(args, storage)
         
-        result_str = ikapi_instance.fetch_doc(doc_id)
-        if not result_str:
-            raise HTTPException(status_code=404, detail="Document not found")
-            
         import json
-        return json.loads(result_str)
+
+        def fetch():
+            result_str = ikapi_instance.fetch_doc(doc_id)
+            return json.loads(result_str) if result_str else None
+
+        result = get_ik_cache("doc").get_or_fetch(str(doc_id), fetch) if HAS_IK_CACHE else fetch()
+        if not result:
+            raise HTTPException(status_code=404, detail="Document not found")
+        return result
     except Exception as e:
         logging.error(f"Error fetching document {doc_id}: {e}")
         raise HTTPException(status_code=500, detail=str(e))
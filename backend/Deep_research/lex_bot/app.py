@@ -433,6 +433,46 @@ def health_check():
     }
 
 
+@app.get("/diag/inference")
+def inference_diagnostics():
+    """Batching and score-cache stats for the local embedding model and reranker."""
+    from lex_bot.core import embeddings
+    from lex_bot.tools import reranker
+    return {
+        "embed_scheduler": embeddings._scheduler.stats() if embeddings._scheduler else None,
+        "rerank_scheduler": reranker._scheduler.stats() if reranker._scheduler else None,
+        "rerank_score_cache": reranker.score_cache.stats(),
+        "rerank_stages": reranker.rerank_stats(),
+    }
+
+
+@app.get("/diag/cache")
+def cache_diagnostics():
+    """Hit rates and storage use of the shared web search / scrape cache."""
+    from lex_bot.core.web_cache import web_cache_stats
+    return web_cache_stats()
+
+
+@app.get("/diag/ik")
+def ik_cache_diagnostics():
+    """Fresh/stale hits, coalesced misses and upstream calls of the Indian Kanoon API cache."""
+    from lex_bot.core.ik_cache import ik_cache_stats
+    return ik_cache_stats()
+
+
+@app.get("/diag/web")
+def web_diagnostics():
+    """Per-provider latency/error EWMA, hedging counters, scrape engine and extraction stats."""
+    from lex_bot.tools.web_search import web_search_tool
+    from lex_bot.tools.scrape_engine import get_scrape_engine
+    from lex_bot.tools.extraction import extraction_stats
+    return {
+        "providers": web_search_tool.scheduler.stats_dict(),
+        "scrape_engine": get_scrape_engine().stats(),
+        "extraction": extraction_stats(),
+    }
+
+
 @app.get("/config/llm", response_model=LLMConfigResponse)
 def get_llm_config():
     """Get current LLM configuration."""
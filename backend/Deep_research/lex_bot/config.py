@@ -48,12 +48,57 @@ LLM_MODEL_NAME = GEMINI_FAST_MODEL
 # --- EMBEDDING MODEL ---
 EMBEDDING_MODEL_NAME = os.getenv("EMBED_MODEL") or "sentence-transformers/all-MiniLM-L6-v2"
 RERANK_MODEL = os.getenv("RERANK_MODEL") or "cross-encoder/ms-marco-MiniLM-L-6-v2"
+# "remote" = use the shared embedding server (backend/query/embedding_server.py) instead of an in-process copy
+EMBED_BACKEND = os.getenv("EMBED_BACKEND", "local").lower()
+# Inference runtime per model: torch | onnx | onnx-int8 (see core/inference_backend.py)
+EMBED_RUNTIME = os.getenv("EMBED_RUNTIME", "torch").lower()
+RERANK_RUNTIME = os.getenv("RERANK_RUNTIME", "torch").lower()
+ONNX_MODEL_DIR = os.getenv("ONNX_MODEL_DIR") or str(_this_dir / "data" / "onnx")
+ONNX_QUANT_CONFIG = os.getenv("ONNX_QUANT_CONFIG", "avx2")
+# Concurrent encode/predict calls arriving within this window share one model call (core/inference_scheduler.py)
+INFERENCE_BATCH_WINDOW_MS = float(os.getenv("INFERENCE_BATCH_WINDOW_MS", 5))
+EMBED_MAX_BATCH = int(os.getenv("EMBED_MAX_BATCH", 256))      # texts per encode call
+RERANK_MAX_BATCH = int(os.getenv("RERANK_MAX_BATCH", 1024))   # (query, passage) pairs per predict call
+# Cross-encoder scores kept per (query, passage) pair; repeated reranks of the same chunks skip the model
+RERANK_CACHE_SIZE = int(os.getenv("RERANK_CACHE_SIZE", 50000))
+# Cheap first stage before the cross-encoder: off | lexical | embedding (bi-encoder cosine, higher recall,
+# but encodes every candidate). Only the top RERANK_PREFILTER_TOP_M are cross-encoded (tools/rerank_eval.py)
+# Off until rerank_eval recall@k is measured on real queries (DB_SEARCH_LIMIT_PRE is held back the same way)
+RERANK_PREFILTER = os.getenv("RERANK_PREFILTER", "off").lower()
+RERANK_PREFILTER_TOP_M = int(os.getenv("RERANK_PREFILTER_TOP_M", 40))
 
 # --- SEARCH CONFIG ---
-DB_SEARCH_LIMIT_PRE = 150  # Reduced from 200 for faster reranking (Step 10b)
+DB_SEARCH_LIMIT_PRE = int(os.getenv("DB_SEARCH_LIMIT_PRE", 150))  # Reduced from 200 for faster reranking (Step 10b)
+# hybrid = tsvector + pgvector top-k fused with reciprocal-rank fusion in SQL; vector = nearest passages only
+DB_SEARCH_MODE = os.getenv("DB_SEARCH_MODE", "hybrid").lower()
+DB_SEARCH_BRANCH_K = int(os.getenv("DB_SEARCH_BRANCH_K", 0)) or DB_SEARCH_LIMIT_PRE  # candidates per branch
+DB_SEARCH_RRF_K = int(os.getenv("DB_SEARCH_RRF_K", 60))
+# HNSW candidate list per vector search; raised to the branch size when smaller
+DB_HNSW_EF_SEARCH = int(os.getenv("DB_HNSW_EF_SEARCH", 100))
 DB_SEARCH_LIMIT_FINAL = 20
 WEB_SEARCH_MAX_RESULTS = 5
-WEB_CACHE_TTL_SECONDS = 3600  # 1 hour
+# Provider scheduling (tools/provider_scheduler.py): per-query deadline, stop once this many unique URLs arrive
+WEB_SEARCH_DEADLINE_SECONDS = float(os.getenv("WEB_SEARCH_DEADLINE_SECONDS", 8))
+WEB_SEARCH_MIN_URLS = int(os.getenv("WEB_SEARCH_MIN_URLS", WEB_SEARCH_MAX_RESULTS))
+WEB_SEARCH_FANOUT = int(os.getenv("WEB_SEARCH_FANOUT", 1))  # providers started immediately; the rest are hedges
+# Always started in the first wave and waited for (up to the deadline): Tavily's raw_content saves the scrape
+WEB_SEARCH_PRIMARY = [p.strip() for p in os.getenv("WEB_SEARCH_PRIMARY", "DuckDuckGo,Tavily").split(",") if p.strip()]
+WEB_SEARCH_HEDGE_FLOOR_SECONDS = float(os.getenv("WEB_SEARCH_HEDGE_FLOOR_SECONDS", 0.3))
+WEB_CACHE_TTL_SECONDS = int(os.getenv("WEB_CACHE_TTL_SECONDS", 3600))  # 1 hour; backend chosen by WEB_CACHE_BACKEND (core/web_cache.py)
+
+# --- SCRAPE ENGINE (tools/scrape_engine.py) ---
+# One pooled HTTP client for all scraping; connections are kept alive between queries
+SCRAPE_MAX_CONNECTIONS = int(os.getenv("SCRAPE_MAX_CONNECTIONS", 50))
+SCRAPE_MAX_KEEPALIVE = int(os.getenv("SCRAPE_MAX_KEEPALIVE", 20))
+SCRAPE_KEEPALIVE_EXPIRY = float(os.getenv("SCRAPE_KEEPALIVE_EXPIRY", 120))
+SCRAPE_MAX_PER_HOST = int(os.getenv("SCRAPE_MAX_PER_HOST", 4))
+SCRAPE_TIMEOUT_SECONDS = float(os.getenv("SCRAPE_TIMEOUT_SECONDS", 10))
+# Pages are streamed and cut off at SCRAPE_MAX_BYTES; other content types are not downloaded
+SCRAPE_MAX_BYTES = int(os.getenv("SCRAPE_MAX_BYTES", 1_000_000))
+SCRAPE_CONTENT_TYPES = [t.strip() for t in os.getenv("SCRAPE_CONTENT_TYPES", "text/html,application/xhtml+xml,text/plain").split(",") if t.strip()]
+SCRAPE_EXTRACT_WORKERS = int(os.getenv("SCRAPE_EXTRACT_WORKERS", 2))  # trafilatura process pool; 0 = run in a thread
+# Domains whose thin results are never scraped (e.g. ones Tavily raw_content already covers)
+SCRAPE_SKIP_DOMAINS = [d.strip().lower() for d in os.getenv("SCRAPE_SKIP_DOMAINS", "").split(",") if d.strip()]
 
 # --- RATE LIMITING ---
 SCRAPE_DELAY_SECONDS = float(os.getenv("SCRAPE_DELAY", 2.0))  # Reduced from 2.5s (Step 9b)
@@ -1,12 +1,20 @@
 import logging
 import threading
-from typing import Any, List
-from lex_bot.config import EMBEDDING_MODEL_NAME
+from typing import Any, List, Sequence
+
+import numpy as np
+
+from lex_bot.config import (
+    EMBEDDING_MODEL_NAME, EMBED_BACKEND, EMBED_RUNTIME, INFERENCE_BATCH_WINDOW_MS, EMBED_MAX_BATCH,
+)
+from lex_bot.core.inference_scheduler import InferenceScheduler
 
 logger = logging.getLogger(__name__)
 
 _embedding_model = None
-_inference_lock = threading.Lock()
+_is_remote = False  # True when _embedding_model is an embedding-server client
+_scheduler = None
+_scheduler_lock = threading.Lock()
 
 def get_embedding_model() -> Any:
     """
@@ -14,26 +22,65 @@ def get_embedding_model() -> Any:
     This prevents loading the ~1.5GB model multiple times across different modules,
     and avoids loading it at startup if it's never actually used.
     """
-    global _embedding_model
+    global _embedding_model, _is_remote
+    if _embedding_model is None and EMBED_BACKEND == "remote":
+        try:
+            # Same client the query service uses; falls back to a local load if the server is down
+            from backend.query.embedding_client import RemoteEmbedder, load_embedding_model
+            _embedding_model = load_embedding_model(EMBEDDING_MODEL_NAME, device='cpu')
+            _is_remote = isinstance(_embedding_model, RemoteEmbedder)
+            return _embedding_model
+        except ImportError:
+            logger.warning("backend.query.embedding_client not importable; loading embedding model locally")
+        except Exception as e:
+            logger.error(f"❌ Embedding server client failed: {e}")
     if _embedding_model is None:
         try:
-            from sentence_transformers import SentenceTransformer
-            logger.info(f"🔍 Loading global Embedding Model: {EMBEDDING_MODEL_NAME}...")
-            # Use CPU to avoid blocking / VRAM issues in multi-threaded setup unless GPU is specified
-            _embedding_model = SentenceTransformer(EMBEDDING_MODEL_NAME, device='cpu')
+            from lex_bot.core.inference_backend import load_embedding_model
+            logger.info(f"🔍 Loading global Embedding Model: {EMBEDDING_MODEL_NAME} ({EMBED_RUNTIME})...")
+            # Always CPU; EMBED_RUNTIME=onnx/onnx-int8 swaps PyTorch for ONNX Runtime
+            _embedding_model = load_embedding_model(EMBEDDING_MODEL_NAME, EMBED_RUNTIME)
             logger.info("✅ Global Embedding Model loaded successfully")
-        except ImportError:
-            logger.error("SentenceTransformers not installed.")
+        except ImportError as e:
+            logger.error(f"SentenceTransformers not installed: {e}")
         except Exception as e:
             logger.error(f"❌ Global Model Loading Failed: {e}")
             
     return _embedding_model
 
+def get_embedding_scheduler() -> InferenceScheduler:
+    """
+    Scheduler whose worker thread is the only caller of the local model's encode().
+    Replaces the old global lock: one model call at a time (no OpenMP thread
+    thrashing), but parallel agents' texts now share that call.
+    """
+    global _scheduler
+    if _scheduler is None:
+        with _scheduler_lock:
+            if _scheduler is None:
+                model = get_embedding_model()
+                _scheduler = InferenceScheduler(
+                    "embed",
+                    lambda normalize, texts: model.encode(texts, normalize_embeddings=normalize),
+                    window_ms=INFERENCE_BATCH_WINDOW_MS,
+                    max_batch=EMBED_MAX_BATCH,
+                )
+    return _scheduler
+
+def encode_texts(texts: Sequence[str], normalize: bool = True) -> np.ndarray:
+    """Encode texts through the shared scheduler; returns a (len(texts), dim) float32 array."""
+    model = get_embedding_model()
+    if not model or not texts:
+        return np.zeros((0, 0), dtype=np.float32)
+
+    if _is_remote:
+        # Remote calls are batched server-side; queueing them here would only add latency
+        return np.asarray(model.encode(list(texts), normalize_embeddings=normalize), dtype=np.float32)
+    rows = get_embedding_scheduler().run(texts, key=normalize)
+    return np.asarray(rows, dtype=np.float32)
+
 def get_query_embedding(query: str) -> List[float]:
     """Thread-safe CPU inference wrapper for the embedding model."""
-    model = get_embedding_model()
-    if not model:
+    if not get_embedding_model():
         return []
-        
-    with _inference_lock:
-        return model.encode([query], normalize_embeddings=True)[0].tolist()
+    return encode_texts([query])[0].tolist()
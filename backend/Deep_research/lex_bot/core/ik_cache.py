@@ -0,0 +1,170 @@
+"""
+IK Cache — Shared, persistent cache for Indian Kanoon API responses.
+
+IK API calls are metered and slow. lex_bot's agents, Drafter's case search
+(through tools/indian_kanoon_api.py) and backend/Case_search send the same
+searches and document fetches over and over. lex_bot used to keep them in a
+module-level dict that was never evicted and was lost on restart. Case_search
+did not cache at all.
+
+Responses are stored raw, as returned by the API, so every service can share
+them. They go in the core/web_cache.py backends: a dedicated SQLite file at
+IK_CACHE_PATH, LRU-bounded by IK_CACHE_MAX_ENTRIES and IK_CACHE_MAX_MB, or
+Redis when WEB_CACHE_BACKEND=redis. Each kind of response has its own
+freshness:
+
+    search   /search/ by (query, pagenum, maxpages)   IK_SEARCH_TTL_SECONDS  (12 h)
+    doc      /doc/ by docid                           IK_DOC_TTL_SECONDS     (30 d)
+    citedby  "citedby:<docid>" searches by docid      IK_CITEDBY_TTL_SECONDS (24 h)
+
+Past its TTL, an entry is still served for up to IK_STALE_SECONDS while one
+background call refreshes it (stale-while-revalidate). Concurrent misses for
+the same key within a process share a single upstream call. Error responses
+("errmsg") and failed calls are never cached.
+
+Standard library only; importable from other services as
+backend.Deep_research.lex_bot.core.ik_cache.
+
+Usage:
+    raw = get_ik_cache("search").get_or_fetch(search_key(query), lambda: call_api(query))
+"""
+
+import os
+import time
+import logging
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from .web_cache import WebCache, _create_backend
+
+logger = logging.getLogger(__name__)
+
+IK_CACHE_PATH = os.getenv("IK_CACHE_PATH", "/tmp/ik_cache.sqlite3")
+IK_CACHE_MAX_ENTRIES = int(os.getenv("IK_CACHE_MAX_ENTRIES", 20000))
+IK_CACHE_MAX_BYTES = int(float(os.getenv("IK_CACHE_MAX_MB", 512)) * 1024 * 1024)
+IK_STALE_SECONDS = int(os.getenv("IK_STALE_SECONDS", 7 * 86400))
+
+_TTLS = {
+    "search": int(os.getenv("IK_SEARCH_TTL_SECONDS", 43200)),       # statutes and case law don't change often
+    "doc": int(os.getenv("IK_DOC_TTL_SECONDS", 30 * 86400)),        # judgments are immutable once published
+    "citedby": int(os.getenv("IK_CITEDBY_TTL_SECONDS", 86400)),     # grows as new judgments cite a case
+}
+
+# IK query operators are case-sensitive; everything else is normalised for the key
+_IK_OPERATORS = frozenset(("ANDD", "ORR", "NOTT"))
+
+
+def search_key(query: str, pagenum: int = 0, maxpages: int = 1) -> str:
+    """Cache key for a /search/ call; whitespace and case variants share an entry."""
+    terms = " ".join(t if t in _IK_OPERATORS else t.lower() for t in query.split())
+    return f"{terms}|{pagenum}|{maxpages}"
+
+
+def _cacheable(value: Any) -> bool:
+    return value is not None and not (isinstance(value, dict) and "errmsg" in value)
+
+
+class IKCache:
+    """Stale-while-revalidate, single-flight cache over one WebCache namespace."""
+
+    def __init__(self, namespace: str, backend, ttl: int, stale_ttl: int = IK_STALE_SECONDS,
+                 refresh_pool: Optional[ThreadPoolExecutor] = None):
+        self.ttl = ttl
+        self.cache = WebCache(namespace, backend, ttl=ttl + stale_ttl)
+        self._refresh_pool = refresh_pool or ThreadPoolExecutor(max_workers=2, thread_name_prefix="ik-refresh")
+        self._inflight: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+        self.fresh_hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.upstream_calls = 0
+        self.upstream_errors = 0
+
+    def _claim(self, key: str) -> Tuple[Future, bool]:
+        """The in-flight call for `key`, and whether the caller must make it."""
+        with self._lock:
+            fut = self._inflight.get(key)
+            if fut is not None:
+                return fut, False
+            fut = self._inflight[key] = Future()
+            return fut, True
+
+    def _run(self, key: str, fetch: Callable[[], Any], fut: Future):
+        try:
+            self.upstream_calls += 1
+            value = fetch()
+            if _cacheable(value):
+                self.cache.set(key, {"t": time.time(), "v": value})
+            fut.set_result(value)
+        except BaseException as e:
+            self.upstream_errors += 1
+            logger.warning(f"IK upstream call failed for {self.cache.namespace}:{key[:60]}: {e}")
+            fut.set_exception(e)
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+
+    def get_or_fetch(self, key: str, fetch: Callable[[], Any]) -> Any:
+        """
+        Cached value for `key`, calling `fetch()` on a miss. Stale entries are
+        returned immediately and refreshed in the background. Exceptions from
+        `fetch` reach every caller waiting on that miss.
+        """
+        entry = self.cache.get(key)
+        if entry is not None:
+            if time.time() - entry["t"] < self.ttl:
+                self.fresh_hits += 1
+                return entry["v"]
+            self.stale_hits += 1
+            fut, owner = self._claim(key)
+            if owner:
+                self._refresh_pool.submit(self._run, key, fetch, fut)
+            return entry["v"]
+
+        self.misses += 1
+        fut, owner = self._claim(key)
+        if owner:
+            self._run(key, fetch, fut)
+        else:
+            self.coalesced += 1
+        return fut.result()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            **self.cache.stats(),
+            "ttl_s": self.ttl,
+            "fresh_hits": self.fresh_hits,
+            "stale_hits": self.stale_hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "upstream_calls": self.upstream_calls,
+            "upstream_errors": self.upstream_errors,
+        }
+
+
+_backend = None
+_lock = threading.Lock()
+_caches: Dict[str, IKCache] = {}
+_refresh_pool: Optional[ThreadPoolExecutor] = None
+
+
+def get_ik_cache(kind: str) -> IKCache:
+    """Process-wide IKCache for "search", "doc" or "citedby"."""
+    global _backend, _refresh_pool
+    with _lock:
+        if kind not in _caches:
+            if _backend is None:
+                _backend = _create_backend(IK_CACHE_PATH, IK_CACHE_MAX_ENTRIES, IK_CACHE_MAX_BYTES)
+                _refresh_pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix="ik-refresh")
+            _caches[kind] = IKCache(f"ik_{kind}", _backend, _TTLS[kind], refresh_pool=_refresh_pool)
+        return _caches[kind]
+
+
+def ik_cache_stats() -> Dict[str, Any]:
+    return {
+        "backend": _backend.name if _backend else None,
+        "storage": _backend.stats() if _backend else {},
+        "kinds": {kind: c.stats() for kind, c in _caches.items()},
+    }
@@ -0,0 +1,163 @@
+"""
+Inference Backend — Runtime selection for the embedding model and cross-encoder.
+
+EMBED_RUNTIME / RERANK_RUNTIME (next to EMBED_MODEL / RERANK_MODEL in config):
+    torch      PyTorch SentenceTransformer / CrossEncoder (default, previous behavior)
+    onnx       ONNX Runtime export of the same weights (fp32)
+    onnx-int8  ONNX Runtime with dynamic int8 quantization (ONNX_QUANT_CONFIG: avx2 | avx512 | arm64)
+
+ONNX models are exported once into ONNX_MODEL_DIR and loaded from there on
+later starts. Pre-build them (e.g. in the image) with:
+
+    python -m lex_bot.core.inference_backend --export
+    python -m lex_bot.core.inference_backend --parity     # top-k overlap vs PyTorch
+
+Requires sentence-transformers >= 4.1 with the onnx extra (optimum[onnxruntime]).
+"""
+
+import re
+import logging
+from pathlib import Path
+from typing import Any, Dict, List, Sequence
+
+import numpy as np
+
+from lex_bot.config import (
+    EMBEDDING_MODEL_NAME, RERANK_MODEL, EMBED_RUNTIME, RERANK_RUNTIME,
+    ONNX_MODEL_DIR, ONNX_QUANT_CONFIG,
+)
+
+logger = logging.getLogger(__name__)
+
+RUNTIMES = ("torch", "onnx", "onnx-int8")
+_INT8_FILE = "onnx/model_qint8.onnx"
+
+
+def _export_dir(model_name: str, kind: str) -> Path:
+    slug = re.sub(r"[^A-Za-z0-9_.-]+", "_", model_name.strip("/"))
+    return Path(ONNX_MODEL_DIR) / f"{kind}-{slug}"
+
+
+def _model_cls(kind: str):
+    from sentence_transformers import SentenceTransformer, CrossEncoder
+    return SentenceTransformer if kind == "embed" else CrossEncoder
+
+
+def _load_onnx(cls, kind: str, model_name: str, runtime: str, **kwargs) -> Any:
+    export_dir = _export_dir(model_name, kind)
+    if runtime == "onnx":
+        if (export_dir / "onnx" / "model.onnx").exists():
+            return cls(str(export_dir), device="cpu", backend="onnx", **kwargs)
+        model = cls(model_name, device="cpu", backend="onnx", **kwargs)
+        model.save(str(export_dir))
+        logger.info(f"Exported {model_name} to ONNX at {export_dir}")
+        return model
+
+    # onnx-int8
+    if not (export_dir / _INT8_FILE).exists():
+        from sentence_transformers import export_dynamic_quantized_onnx_model
+        base = _load_onnx(cls, kind, model_name, "onnx", **kwargs)
+        logger.info(f"Quantizing {model_name} to int8 ({ONNX_QUANT_CONFIG})...")
+        export_dynamic_quantized_onnx_model(base, ONNX_QUANT_CONFIG, str(export_dir), file_suffix="qint8")
+    return cls(str(export_dir), device="cpu", backend="onnx",
+               model_kwargs={"file_name": _INT8_FILE}, **kwargs)
+
+
+def _load(kind: str, model_name: str, runtime: str, fallback: bool = True, **kwargs) -> Any:
+    """
+    Load on `runtime`. If an ONNX runtime fails (missing optimum/onnxruntime, a bad
+    export, an unsupported quantization config) the error is logged and the model
+    is loaded on torch instead, unless fallback=False.
+    """
+    if runtime not in RUNTIMES:
+        raise ValueError(f"Unknown inference runtime {runtime!r}; expected one of {RUNTIMES}")
+    cls = _model_cls(kind)
+    if runtime != "torch":
+        try:
+            return _load_onnx(cls, kind, model_name, runtime, **kwargs)
+        except Exception as e:
+            if not fallback:
+                raise
+            logger.error(f"{runtime} load of {model_name} failed ({type(e).__name__}: {e}); "
+                         f"falling back to the torch runtime")
+    return cls(model_name, device="cpu", **kwargs)
+
+
+def load_embedding_model(model_name: str = EMBEDDING_MODEL_NAME, runtime: str = EMBED_RUNTIME,
+                         fallback: bool = True) -> Any:
+    return _load("embed", model_name, runtime, fallback=fallback)
+
+
+def load_cross_encoder(model_name: str = RERANK_MODEL, runtime: str = RERANK_RUNTIME, max_length: int = 512,
+                       fallback: bool = True) -> Any:
+    return _load("rerank", model_name, runtime, fallback=fallback, max_length=max_length)
+
+
+# ---------- parity ----------
+
+PARITY_QUERIES = [
+    "anticipatory bail under section 438 CrPC",
+    "specific performance of an agreement to sell immovable property",
+    "dowry death presumption section 304B IPC",
+    "cheque dishonour notice period section 138 Negotiable Instruments Act",
+]
+
+PARITY_PASSAGES = [
+    "Section 438 of the Code of Criminal Procedure empowers the High Court or Court of Session to grant anticipatory bail.",
+    "Anticipatory bail is a direction to release a person on bail issued even before the person is arrested.",
+    "A suit for specific performance of a contract for sale of immovable property lies under the Specific Relief Act, 1963.",
+    "The vendor's readiness and willingness must be proved to obtain specific performance of an agreement to sell.",
+    "Section 304B IPC: where the death of a woman is caused within seven years of marriage and she was subjected to cruelty for dowry.",
+    "Section 113B of the Evidence Act raises a presumption as to dowry death once cruelty soon before death is shown.",
+    "Under section 138 of the Negotiable Instruments Act, the payee must issue a demand notice within thirty days of dishonour.",
+    "The drawer gets fifteen days from receipt of notice to make payment before a complaint under section 138 can be filed.",
+    "Article 21 of the Constitution guarantees protection of life and personal liberty.",
+    "Order XXXIX Rules 1 and 2 CPC govern the grant of temporary injunctions.",
+    "Adverse possession requires continuous, open and hostile possession for the statutory period.",
+    "The Arbitration and Conciliation Act, 1996 limits judicial intervention in arbitral proceedings.",
+]
+
+
+def topk_overlap(a: Sequence[float], b: Sequence[float], k: int) -> float:
+    """|top-k(a) ∩ top-k(b)| / k for two score vectors over the same items."""
+    top_a = set(np.argsort(-np.asarray(a))[:k])
+    top_b = set(np.argsort(-np.asarray(b))[:k])
+    return len(top_a & top_b) / float(k)
+
+
+def embedding_scores(model: Any, queries: List[str], passages: List[str]) -> np.ndarray:
+    q = np.asarray(model.encode(queries, normalize_embeddings=True))
+    p = np.asarray(model.encode(passages, normalize_embeddings=True))
+    return q @ p.T
+
+
+def rerank_scores(model: Any, queries: List[str], passages: List[str]) -> np.ndarray:
+    return np.asarray([model.predict([(q, p) for p in passages]) for q in queries])
+
+
+def check_parity(runtime: str = "onnx-int8", k: int = 3) -> Dict[str, float]:
+    """Mean top-k overlap of `runtime` vs PyTorch for both models on the built-in legal sample."""
+    report = {}
+    for kind, loader, scorer in (
+        ("embed", load_embedding_model, embedding_scores),
+        ("rerank", load_cross_encoder, rerank_scores),
+    ):
+        ref = scorer(loader(runtime="torch"), PARITY_QUERIES, PARITY_PASSAGES)
+        # No torch fallback here, or a broken export would report perfect parity
+        alt = scorer(loader(runtime=runtime, fallback=False), PARITY_QUERIES, PARITY_PASSAGES)
+        report[f"{kind}_top{k}_overlap"] = float(np.mean([topk_overlap(r, a, k) for r, a in zip(ref, alt)]))
+        report[f"{kind}_max_abs_diff"] = float(np.max(np.abs(ref - alt)))
+    return report
+
+
+if __name__ == "__main__":
+    import sys
+    import json
+
+    logging.basicConfig(level=logging.INFO)
+    if "--export" in sys.argv:
+        load_embedding_model(runtime=EMBED_RUNTIME if EMBED_RUNTIME != "torch" else "onnx-int8", fallback=False)
+        load_cross_encoder(runtime=RERANK_RUNTIME if RERANK_RUNTIME != "torch" else "onnx-int8", fallback=False)
+        print(f"ONNX models ready in {ONNX_MODEL_DIR}")
+    if "--parity" in sys.argv:
+        print(json.dumps(check_parity(), indent=2))
@@ -0,0 +1,130 @@
+"""
+Inference Scheduler — One worker thread per model that batches concurrent calls.
+
+Replaces the global inference locks. Only the worker thread touches the model,
+so PyTorch/ONNX thread pools are never oversubscribed (the reason the locks
+existed). Calls arriving within `window_ms` of each other are coalesced into a
+single encode/predict call instead of waiting on the lock one at a time.
+
+Usage:
+    scheduler = InferenceScheduler("rerank", lambda key, pairs: model.predict(pairs))
+    scores = scheduler.run(pairs)            # blocks; or scheduler.submit(pairs) -> Future
+
+Requests with different `key`s (e.g. normalize_embeddings=True/False) are
+batched separately, since they need different model arguments.
+"""
+
+import time
+import logging
+import threading
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Hashable, List, Sequence
+
+logger = logging.getLogger(__name__)
+
+
+class InferenceScheduler:
+    """Single worker thread owning one model; coalesces concurrent requests into batches."""
+
+    def __init__(
+        self,
+        name: str,
+        run_batch: Callable[[Hashable, List[Any]], Sequence[Any]],
+        window_ms: float = 5.0,
+        max_batch: int = 512,
+    ):
+        self.name = name
+        self.run_batch = run_batch
+        self.window_s = window_ms / 1000.0
+        self.max_batch = max(1, max_batch)
+        self._pending: List[tuple] = []  # (key, items, future)
+        self._cond = threading.Condition()
+        self.requests = 0
+        self.batches = 0
+        self.items = 0
+        self._worker = threading.Thread(target=self._loop, name=f"inference-{name}", daemon=True)
+        self._worker.start()
+
+    def submit(self, items: Sequence[Any], key: Hashable = None) -> Future:
+        """Queue items for the model; the Future resolves to one result per item."""
+        fut: Future = Future()
+        items = list(items)
+        if not items:
+            fut.set_result([])
+            return fut
+        with self._cond:
+            self._pending.append((key, items, fut))
+            self._cond.notify()
+        return fut
+
+    def run(self, items: Sequence[Any], key: Hashable = None) -> List[Any]:
+        return self.submit(items, key).result()
+
+    def _pending_items(self) -> int:
+        return sum(len(items) for _, items, _ in self._pending)
+
+    def _take(self) -> List[tuple]:
+        with self._cond:
+            while not self._pending:
+                self._cond.wait()
+            # Hold the window open for callers fanned out at the same moment
+            deadline = time.monotonic() + self.window_s
+            while self._pending_items() < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(timeout=remaining)
+
+            # Whole requests only: a request is never split across batches
+            taken, count = [], 0
+            while self._pending and (not taken or count + len(self._pending[0][1]) <= self.max_batch):
+                req = self._pending.pop(0)
+                taken.append(req)
+                count += len(req[1])
+            return taken
+
+    def _loop(self):
+        while True:
+            taken = self._take()
+            try:
+                self._run_taken(taken)
+            except Exception as e:
+                # The worker must outlive any one batch, or every later call blocks forever
+                logger.error(f"[{self.name}] scheduler batch handling failed: {e}")
+
+    def _run_taken(self, taken: List[tuple]):
+        # Claim each future; ones cancelled while queued are skipped. Claimed futures
+        # are RUNNING and can no longer be cancelled, so set_result/set_exception are safe.
+        groups: Dict[Hashable, List[tuple]] = {}
+        for req in taken:
+            if req[2].set_running_or_notify_cancel():
+                groups.setdefault(req[0], []).append(req)
+
+        for key, reqs in groups.items():
+            flat = [item for _, items, _ in reqs for item in items]
+            try:
+                results = list(self.run_batch(key, flat))
+            except Exception as e:
+                logger.warning(f"[{self.name}] batch of {len(flat)} failed: {e}")
+                for _, _, fut in reqs:
+                    fut.set_exception(e)
+                continue
+
+            self.batches += 1
+            self.requests += len(reqs)
+            self.items += len(flat)
+            offset = 0
+            for _, items, fut in reqs:
+                fut.set_result(results[offset:offset + len(items)])
+                offset += len(items)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "requests": self.requests,
+            "batches": self.batches,
+            "items": self.items,
+            "avg_requests_per_batch": round(self.requests / self.batches, 2) if self.batches else 0.0,
+            "queued": len(self._pending),
+            "window_ms": self.window_s * 1000.0,
+            "max_batch": self.max_batch,
+        }
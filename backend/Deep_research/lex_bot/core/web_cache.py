@@ -0,0 +1,380 @@
+"""
+Web Cache — Bounded, shareable cache for web search results and scraped pages.
+
+Tavily/Serper calls and trafilatura extraction are the most expensive per-query
+costs, so results are kept in a backend that can outlive one process:
+
+WEB_CACHE_BACKEND:
+    memory  bounded in-process LRU (per worker, lost on restart)
+    sqlite  WAL-mode file at WEB_CACHE_PATH, shared by every worker and service
+            on the host and kept across restarts (default)
+    redis   WEB_CACHE_REDIS_URL, shared across containers; size bounded by the
+            server's maxmemory policy
+
+Values are JSON, zlib-compressed. Every entry has a TTL; memory and sqlite are
+also bounded by WEB_CACHE_MAX_ENTRIES and WEB_CACHE_MAX_MB (least recently
+used first). Keys are hashed and namespaced, so any service using the same
+namespace (e.g. "scrape") shares entries.
+
+Standard library plus optional redis; importable from other services as
+backend.Deep_research.lex_bot.core.web_cache.
+
+Usage:
+    cache = get_web_cache("scrape")
+    text = cache.get(url)
+    cache.set(url, text, ttl=3600)
+    text = await cache.aget(url)      # from coroutines: keeps sqlite/Redis I/O off the loop
+"""
+
+import os
+import json
+import time
+import zlib
+import asyncio
+import sqlite3
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+logger = logging.getLogger(__name__)
+
+WEB_CACHE_BACKEND = os.getenv("WEB_CACHE_BACKEND", "sqlite").lower()
+WEB_CACHE_PATH = os.getenv("WEB_CACHE_PATH", "/tmp/web_cache.sqlite3")
+WEB_CACHE_REDIS_URL = os.getenv("WEB_CACHE_REDIS_URL")
+WEB_CACHE_MAX_ENTRIES = int(os.getenv("WEB_CACHE_MAX_ENTRIES", 5000))
+WEB_CACHE_MAX_BYTES = int(float(os.getenv("WEB_CACHE_MAX_MB", 256)) * 1024 * 1024)
+DEFAULT_TTL_SECONDS = int(os.getenv("WEB_CACHE_TTL_SECONDS", 3600))
+
+_KEY_PREFIX = "web:"
+# sqlite: bounds are enforced every this many writes rather than on each one
+_EVICT_EVERY = 50
+# sqlite: LRU touches from reads are buffered and written in one transaction, so a
+# cache hit never takes the write lock itself
+_TOUCH_BATCH = 64
+_TOUCH_FLUSH_SECONDS = 30.0
+
+try:
+    import redis
+    HAS_REDIS = True
+except ImportError:
+    HAS_REDIS = False
+
+
+# Query parameters that never change page content
+_TRACKING_PREFIXES = ("utm_",)
+_TRACKING_PARAMS = frozenset(("fbclid", "gclid", "mc_cid", "mc_eid", "ref", "ref_src"))
+
+
+def canonical_url(url: str) -> str:
+    """
+    Cache key for a page: lowercase scheme/host, no default port, fragment or
+    tracking parameters, sorted query, no trailing slash. Path case is kept.
+    """
+    parts = urlsplit(url.strip())
+    scheme = (parts.scheme or "http").lower()
+    host = (parts.hostname or "").lower()
+    if host.startswith("www."):
+        host = host[4:]
+    if parts.port and not (scheme, parts.port) in (("http", 80), ("https", 443)):
+        host = f"{host}:{parts.port}"
+    query = sorted(
+        (k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True)
+        if not (k.lower().startswith(_TRACKING_PREFIXES) or k.lower() in _TRACKING_PARAMS)
+    )
+    path = parts.path.rstrip("/") or "/"
+    # http and https variants of a page share one entry
+    return urlunsplit(("https" if scheme in ("http", "https") else scheme, host, path, urlencode(query), ""))
+
+
+def _encode(value: Any) -> bytes:
+    return zlib.compress(json.dumps(value, ensure_ascii=False).encode("utf-8"), 6)
+
+
+def _decode(blob: bytes) -> Any:
+    return json.loads(zlib.decompress(blob).decode("utf-8"))
+
+
+class MemoryBackend:
+    """Thread-safe LRU bounded by entry count and total compressed bytes."""
+
+    name = "memory"
+
+    def __init__(self, max_entries: int = WEB_CACHE_MAX_ENTRIES, max_bytes: int = WEB_CACHE_MAX_BYTES):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._data: "OrderedDict[str, tuple]" = OrderedDict()  # key -> (expires_at, blob)
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            expires_at, blob = entry
+            if expires_at < time.time():
+                self._remove(key)
+                return None
+            self._data.move_to_end(key)
+            return blob
+
+    def set(self, key: str, blob: bytes, ttl: int):
+        if self.max_entries <= 0 or len(blob) > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._data:
+                self._remove(key)
+            self._data[key] = (time.time() + ttl, blob)
+            self._bytes += len(blob)
+            while len(self._data) > self.max_entries or self._bytes > self.max_bytes:
+                self._remove(next(iter(self._data)))
+
+    def _remove(self, key: str):
+        _, blob = self._data.pop(key)
+        self._bytes -= len(blob)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        return {"entries": len(self._data), "bytes": self._bytes}
+
+
+class SQLiteBackend:
+    """
+    One table in a WAL-mode SQLite file. Readers never block each other and
+    concurrent writers from other processes wait up to busy_timeout. Hits only
+    read; their accessed_at updates are batched into the next write, or flushed
+    every _TOUCH_BATCH hits / _TOUCH_FLUSH_SECONDS.
+    """
+
+    name = "sqlite"
+
+    def __init__(self, path: str = WEB_CACHE_PATH, max_entries: int = WEB_CACHE_MAX_ENTRIES,
+                 max_bytes: int = WEB_CACHE_MAX_BYTES):
+        self.path = path
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._writes = 0
+        self._touched: Dict[str, float] = {}
+        self._touch_flushed_at = time.time()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, timeout=5.0, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS web_cache (
+                key TEXT PRIMARY KEY,
+                value BLOB NOT NULL,
+                size INTEGER NOT NULL,
+                expires_at REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_web_cache_accessed ON web_cache (accessed_at)")
+
+    def get(self, key: str) -> Optional[bytes]:
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value FROM web_cache WHERE key = ? AND expires_at > ?", (key, now)
+            ).fetchone()
+            if row is None:
+                return None
+            self._touched[key] = now
+            if len(self._touched) >= _TOUCH_BATCH or now - self._touch_flushed_at >= _TOUCH_FLUSH_SECONDS:
+                try:
+                    self._flush_touches(now)
+                except sqlite3.Error as e:
+                    # Only LRU precision is lost; never fail a hit over it
+                    logger.debug(f"Web cache: touch flush skipped: {e}")
+                    self._touched.clear()
+        return row[0]
+
+    def _flush_touches(self, now: float):
+        """Write buffered accessed_at values in one transaction (caller holds self._lock)."""
+        self._touch_flushed_at = now
+        if not self._touched:
+            return
+        touches = [(ts, key) for key, ts in self._touched.items()]
+        self._touched.clear()
+        self._conn.execute("BEGIN")
+        try:
+            self._conn.executemany("UPDATE web_cache SET accessed_at = ? WHERE key = ?", touches)
+            self._conn.execute("COMMIT")
+        except Exception:
+            self._conn.execute("ROLLBACK")
+            raise
+
+    def set(self, key: str, blob: bytes, ttl: int):
+        if self.max_entries <= 0 or len(blob) > self.max_bytes:
+            return
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO web_cache (key, value, size, expires_at, accessed_at) VALUES (?, ?, ?, ?, ?)",
+                (key, sqlite3.Binary(blob), len(blob), now + ttl, now),
+            )
+            self._writes += 1
+            if self._touched:
+                try:
+                    self._flush_touches(now)
+                except sqlite3.Error as e:
+                    logger.debug(f"Web cache: touch flush skipped: {e}")
+            if self._writes % _EVICT_EVERY == 0:
+                self._evict(now)
+
+    def _evict(self, now: float):
+        self._conn.execute("DELETE FROM web_cache WHERE expires_at <= ?", (now,))
+        count, total = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM web_cache").fetchone()
+        if count <= self.max_entries and total <= self.max_bytes:
+            return
+        # Drop least recently used rows until both bounds hold
+        excess_rows = max(0, count - self.max_entries)
+        excess_bytes = max(0, total - self.max_bytes)
+        dropped_rows, dropped_bytes, victims = 0, 0, []
+        for key, size in self._conn.execute("SELECT key, size FROM web_cache ORDER BY accessed_at"):
+            if dropped_rows >= excess_rows and dropped_bytes >= excess_bytes:
+                break
+            victims.append((key,))
+            dropped_rows += 1
+            dropped_bytes += size
+        self._conn.executemany("DELETE FROM web_cache WHERE key = ?", victims)
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM web_cache")
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            count, total = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM web_cache").fetchone()
+        return {"entries": count, "bytes": total, "path": self.path}
+
+
+class RedisBackend:
+    """Shared across containers; eviction is TTL plus the server's maxmemory policy."""
+
+    name = "redis"
+
+    def __init__(self, url: str = WEB_CACHE_REDIS_URL):
+        # Short timeouts: a slow Redis must never be worse than a cache miss
+        self.redis = redis.Redis.from_url(url, socket_timeout=0.1, socket_connect_timeout=0.3)
+        self.redis.ping()
+
+    def get(self, key: str) -> Optional[bytes]:
+        return self.redis.get(key)
+
+    def set(self, key: str, blob: bytes, ttl: int):
+        self.redis.set(key, blob, ex=max(1, int(ttl)))
+
+    def clear(self):
+        keys = list(self.redis.scan_iter(f"{_KEY_PREFIX}*"))
+        if keys:
+            self.redis.delete(*keys)
+
+    def stats(self) -> Dict[str, Any]:
+        return {}
+
+
+class WebCache:
+    """JSON values under one namespace of a shared backend, with hit/miss counters."""
+
+    def __init__(self, namespace: str, backend, ttl: int = DEFAULT_TTL_SECONDS):
+        self.namespace = namespace
+        self.backend = backend
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+
+    def _key(self, key: str) -> str:
+        digest = hashlib.sha256(key.encode("utf-8")).hexdigest()
+        return f"{_KEY_PREFIX}{self.namespace}:{digest}"
+
+    def get(self, key: str) -> Optional[Any]:
+        try:
+            blob = self.backend.get(self._key(key))
+            value = _decode(blob) if blob is not None else None
+        except Exception as e:
+            logger.warning(f"Web cache ({self.backend.name}) get failed: {e}")
+            value = None
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    def set(self, key: str, value: Any, ttl: Optional[int] = None):
+        try:
+            self.backend.set(self._key(key), _encode(value), ttl or self.ttl)
+        except Exception as e:
+            logger.warning(f"Web cache ({self.backend.name}) set failed: {e}")
+
+    async def aget(self, key: str) -> Optional[Any]:
+        """get() for coroutines: backend I/O (sqlite busy waits, Redis) runs off the event loop."""
+        return await asyncio.to_thread(self.get, key)
+
+    async def aset(self, key: str, value: Any, ttl: Optional[int] = None):
+        await asyncio.to_thread(self.set, key, value, ttl)
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "namespace": self.namespace,
+            "backend": self.backend.name,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / total, 3) if total else 0.0,
+        }
+
+
+_backend = None
+_backend_lock = threading.Lock()
+_caches: Dict[str, WebCache] = {}
+
+
+def _create_backend(path: str = WEB_CACHE_PATH, max_entries: int = WEB_CACHE_MAX_ENTRIES,
+                    max_bytes: int = WEB_CACHE_MAX_BYTES):
+    """Backend selected by WEB_CACHE_BACKEND, falling back redis -> sqlite -> memory."""
+    if WEB_CACHE_BACKEND == "redis":
+        if not WEB_CACHE_REDIS_URL:
+            logger.warning("WEB_CACHE_BACKEND=redis but WEB_CACHE_REDIS_URL is not set; using sqlite")
+        elif not HAS_REDIS:
+            logger.warning("WEB_CACHE_BACKEND=redis but redis package not installed; using sqlite")
+        else:
+            try:
+                backend = RedisBackend()
+                logger.info("Web cache: Redis backend enabled")
+                return backend
+            except Exception as e:
+                logger.warning(f"Web cache: Redis unavailable ({e}), using sqlite")
+    if WEB_CACHE_BACKEND in ("sqlite", "redis"):
+        try:
+            return SQLiteBackend(path, max_entries, max_bytes)
+        except Exception as e:
+            logger.warning(f"Web cache: SQLite at {path} unavailable ({e}), using memory")
+    return MemoryBackend(max_entries, max_bytes)
+
+
+def get_web_cache(namespace: str, ttl: int = DEFAULT_TTL_SECONDS) -> WebCache:
+    """Process-wide WebCache for `namespace`; all namespaces share one backend."""
+    global _backend
+    with _backend_lock:
+        if _backend is None:
+            _backend = _create_backend()
+        if namespace not in _caches:
+            _caches[namespace] = WebCache(namespace, _backend, ttl)
+        return _caches[namespace]
+
+
+def web_cache_stats() -> Dict[str, Any]:
+    return {
+        "backend": _backend.name if _backend else None,
+        "storage": _backend.stats() if _backend else {},
+        "namespaces": [c.stats() for c in _caches.values()],
+    }
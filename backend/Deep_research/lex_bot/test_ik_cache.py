@@ -0,0 +1,58 @@
+"""
+Indian Kanoon API cache: stale-while-revalidate and single-flight misses.
+
+    pytest lex_bot/test_ik_cache.py      (from backend/Deep_research)
+"""
+import time
+import threading
+
+from lex_bot.core.ik_cache import IKCache, search_key
+from lex_bot.core.web_cache import MemoryBackend
+
+
+def test_concurrent_misses_share_one_upstream_call():
+    cache = IKCache("ik_test", MemoryBackend(), ttl=60)
+    calls = []
+
+    def fetch():
+        calls.append(1)
+        time.sleep(0.2)
+        return {"docs": [{"tid": 1}]}
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.get_or_fetch("q", fetch))) for _ in range(5)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert len(calls) == 1
+    assert results == [{"docs": [{"tid": 1}]}] * 5
+    assert cache.stats()["coalesced"] == 4
+
+
+def test_stale_entry_served_while_refreshing():
+    cache = IKCache("ik_test", MemoryBackend(), ttl=0, stale_ttl=60)
+    cache.get_or_fetch("doc", lambda: {"doc": "v1"})
+
+    refreshed = threading.Event()
+
+    def refresh():
+        refreshed.set()
+        return {"doc": "v2"}
+
+    assert cache.get_or_fetch("doc", refresh) == {"doc": "v1"}
+    assert refreshed.wait(2)
+    deadline = time.time() + 2
+    while cache.cache.get("doc")["v"] != {"doc": "v2"} and time.time() < deadline:
+        time.sleep(0.01)
+    assert cache.cache.get("doc")["v"] == {"doc": "v2"}
+    assert cache.stats()["stale_hits"] == 1
+
+
+def test_errors_are_not_cached():
+    cache = IKCache("ik_test", MemoryBackend(), ttl=60)
+    assert cache.get_or_fetch("q", lambda: {"errmsg": "quota"}) == {"errmsg": "quota"}
+    assert cache.get_or_fetch("q", lambda: {"docs": []}) == {"docs": []}
+    assert cache.stats()["upstream_calls"] == 2
+    assert search_key("Article  21 ANDD Privacy") == search_key("article 21 ANDD privacy")
@@ -0,0 +1,34 @@
+"""
+ONNX / int8 parity: the quantized runtimes must rank like PyTorch.
+
+    pytest lex_bot/test_inference_parity.py      (from backend/Deep_research)
+
+Loads (and on first run exports) both models, so it is skipped unless
+RUN_PARITY_TESTS=1 and onnxruntime / optimum are installed.
+"""
+import os
+
+import pytest
+
+if os.getenv("RUN_PARITY_TESTS") != "1":
+    pytest.skip("set RUN_PARITY_TESTS=1 to run model parity tests", allow_module_level=True)
+
+pytest.importorskip("sentence_transformers")
+pytest.importorskip("onnxruntime")
+pytest.importorskip("optimum")
+
+from lex_bot.core.inference_backend import check_parity, topk_overlap  # noqa: E402
+
+# Mean top-3 overlap over PARITY_QUERIES; int8 may swap near-ties, fp32 ONNX should not
+MIN_OVERLAP = {"onnx": 1.0, "onnx-int8": 0.8}
+
+
+def test_topk_overlap():
+    assert topk_overlap([0.9, 0.1, 0.5, 0.7], [0.8, 0.2, 0.6, 0.1], k=2) == 0.5
+
+
+@pytest.mark.parametrize("runtime", ["onnx", "onnx-int8"])
+def test_runtime_matches_torch_ranking(runtime):
+    report = check_parity(runtime=runtime, k=3)
+    assert report["embed_top3_overlap"] >= MIN_OVERLAP[runtime], report
+    assert report["rerank_top3_overlap"] >= MIN_OVERLAP[runtime], report
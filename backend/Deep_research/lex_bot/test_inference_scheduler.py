@@ -0,0 +1,80 @@
+"""
+InferenceScheduler: concurrent calls are coalesced and results routed back per caller.
+
+    pytest lex_bot/test_inference_scheduler.py      (from backend/Deep_research)
+"""
+import threading
+
+import pytest
+
+from lex_bot.core.inference_scheduler import InferenceScheduler
+
+
+def test_concurrent_calls_share_one_batch():
+    calls = []
+
+    def run_batch(key, items):
+        calls.append((key, list(items)))
+        return [x * 10 for x in items]
+
+    scheduler = InferenceScheduler("test", run_batch, window_ms=50)
+    results = {}
+    barrier = threading.Barrier(4)
+
+    def worker(i):
+        barrier.wait()
+        results[i] = scheduler.run([i, i + 100])
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert results == {i: [i * 10, (i + 100) * 10] for i in range(4)}
+    assert len(calls) == 1 and len(calls[0][1]) == 8
+    assert scheduler.stats()["avg_requests_per_batch"] == 4
+
+
+def test_keys_batch_separately_and_errors_propagate():
+    def run_batch(key, items):
+        if key == "bad":
+            raise ValueError("boom")
+        return [(key, x) for x in items]
+
+    scheduler = InferenceScheduler("test", run_batch, window_ms=1)
+    assert scheduler.run(["a"], key=True) == [(True, "a")]
+    assert scheduler.run([]) == []
+    with pytest.raises(ValueError):
+        scheduler.run(["x"], key="bad")
+
+
+def test_max_batch_never_splits_a_request():
+    sizes = []
+    scheduler = InferenceScheduler("test", lambda _k, items: sizes.append(len(items)) or items,
+                                   window_ms=20, max_batch=3)
+    futures = [scheduler.submit([1, 2]) for _ in range(3)]
+    assert [f.result() for f in futures] == [[1, 2]] * 3
+    assert sizes == [2, 2, 2]
+
+
+def test_cancelled_request_is_skipped_and_worker_survives():
+    started, release = threading.Event(), threading.Event()
+    calls = []
+
+    def run_batch(key, items):
+        calls.append(list(items))
+        started.set()
+        release.wait(2)
+        return [x * 10 for x in items]
+
+    scheduler = InferenceScheduler("test", run_batch, window_ms=1, max_batch=1)
+    first = scheduler.submit([1])
+    assert started.wait(2)
+    cancelled = scheduler.submit([2])   # queued behind the running batch
+    assert cancelled.cancel()
+    release.set()
+
+    assert first.result(2) == [10]
+    assert scheduler.submit([3]).result(2) == [30]
+    assert [2] not in calls
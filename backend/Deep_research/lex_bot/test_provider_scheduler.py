@@ -0,0 +1,121 @@
+"""
+Provider scheduler: hedging past p90, early return on enough URLs, deadline, EWMA ordering.
+
+    pytest lex_bot/test_provider_scheduler.py      (from backend/Deep_research)
+"""
+import time
+
+from lex_bot.tools import provider_scheduler
+from lex_bot.tools.provider_scheduler import ProviderScheduler
+
+
+def _provider(delay, urls, fail=False):
+    def fn(query, max_results, domains, timeout):
+        time.sleep(delay)
+        if fail:
+            raise RuntimeError("provider down")
+        return [{"url": u, "title": u} for u in urls]
+    return fn
+
+
+def test_hedge_returns_backup_when_primary_is_slow():
+    scheduler = ProviderScheduler({
+        "slow": _provider(2.0, ["a", "b"]),
+        "fast": _provider(0.05, ["c", "d"]),
+    }, hedge_floor_s=0.1)
+    scheduler.stats["slow"]._recent.extend([0.1] * 10)  # p90 = 100ms
+
+    start = time.monotonic()
+    results = scheduler.search("q", 5, deadline_s=5, min_urls=2)
+    assert time.monotonic() - start < 1.0
+    assert [r["url"] for r in results] == ["c", "d"]
+    assert results[0]["source"] == "fast"
+    assert scheduler.hedges == 1
+
+
+def test_failure_triggers_next_provider_and_deadline_caps_wait():
+    scheduler = ProviderScheduler({
+        "down": _provider(0.01, [], fail=True),
+        "hung": _provider(3.0, ["x"]),
+    })
+    start = time.monotonic()
+    assert scheduler.search("q", 5, deadline_s=0.5, min_urls=1) == []
+    assert time.monotonic() - start < 1.0
+    assert scheduler.deadline_hits == 1
+
+
+def test_ewma_orders_by_latency_and_errors():
+    scheduler = ProviderScheduler({"a": _provider(0, []), "b": _provider(0, []), "c": _provider(0, [])})
+    for _ in range(5):
+        scheduler.stats["a"].record(1.5, ok=True)
+        scheduler.stats["b"].record(0.5, ok=True)
+        scheduler.stats["c"].record(0.4, ok=False)
+    assert scheduler.ranked() == ["b", "a", "c"]
+
+
+def test_dedupes_urls_across_providers():
+    scheduler = ProviderScheduler({"p1": _provider(0.01, ["a", "b"]), "p2": _provider(0.01, ["b", "c"])})
+    results = scheduler.search("q", 5, deadline_s=2, min_urls=3, fanout=2)
+    assert sorted(r["url"] for r in results) == ["a", "b", "c"]
+
+
+def test_primary_provider_runs_even_when_the_first_fills_min_urls():
+    calls = []
+
+    def tavily(query, max_results, domains, timeout):
+        calls.append("tavily")
+        time.sleep(0.2)
+        return [{"url": "a", "title": "a", "snippet": "full page text " * 50}]
+
+    providers = {"ddg": _provider(0.01, ["a", "b", "c", "d", "e"]), "tavily": tavily}
+
+    # Without a primary, DDG fills min_urls before the hedge and Tavily is never called
+    results = ProviderScheduler(providers, hedge_floor_s=1.0).search("q", 5, deadline_s=5, min_urls=5)
+    assert calls == []
+    assert all(r["source"] == "ddg" for r in results)
+
+    results = ProviderScheduler(providers, hedge_floor_s=1.0, primary=("ddg", "tavily")).search(
+        "q", 5, deadline_s=5, min_urls=5)
+    assert calls == ["tavily"]
+    assert len(results) == 5
+    assert results[0]["source"] == "tavily"
+
+
+def test_waiting_on_a_primary_after_min_urls_does_not_spin(monkeypatch):
+    real_wait = provider_scheduler.wait
+    wakeups = []
+
+    def counting_wait(*args, **kwargs):
+        wakeups.append(kwargs.get("timeout"))
+        return real_wait(*args, **kwargs)
+
+    monkeypatch.setattr(provider_scheduler, "wait", counting_wait)
+    scheduler = ProviderScheduler({
+        "ddg": _provider(0.05, ["a", "b", "c", "d", "e"]),
+        "tavily": _provider(0.6, ["a"]),
+        "serper": _provider(0.01, ["f"]),
+    }, hedge_floor_s=0.1, primary=("ddg", "tavily"))
+    scheduler.stats["tavily"]._recent.extend([0.1] * 10)  # hedge due at 100ms, long before Tavily answers
+
+    results = scheduler.search("q", 5, deadline_s=5, min_urls=5)
+    assert len(results) == 5
+    assert scheduler.hedges == 0
+    assert len(wakeups) < 10
+
+
+def test_calls_queued_past_their_deadline_are_skipped():
+    calls = []
+
+    def provider(query, max_results, domains, timeout):
+        calls.append(timeout)
+        time.sleep(0.3)
+        return [{"url": query}]
+
+    scheduler = ProviderScheduler({"p": provider}, max_workers=1)
+    first = scheduler.search("a", 5, deadline_s=0.1, min_urls=1)   # abandoned, still holds the only worker
+    second = scheduler.search("b", 5, deadline_s=0.1, min_urls=1)  # queued behind it until its deadline
+    time.sleep(0.4)
+    assert first == [] and second == []
+    assert len(calls) == 1
+    assert scheduler.expired == 1
+    assert scheduler.stats["p"].calls == 1
@@ -0,0 +1,63 @@
+"""
+Reranker: score cache (repeated pairs never reach the cross-encoder twice) and prefilter stage.
+
+    pytest lex_bot/test_rerank_cache.py      (from backend/Deep_research)
+"""
+from lex_bot.core.inference_scheduler import InferenceScheduler
+from lex_bot.tools import reranker
+
+
+def test_only_unseen_pairs_are_scored(monkeypatch):
+    scored = []
+
+    def predict(_key, pairs):
+        scored.extend(pairs)
+        return [float(len(p[1])) for p in pairs]
+
+    monkeypatch.setattr(reranker, "get_rerank_scheduler", lambda: InferenceScheduler("test", predict, window_ms=1))
+    monkeypatch.setattr(reranker, "score_cache", reranker.RerankScoreCache(maxsize=100))
+
+    docs = [{"text": "bail under section 438"}, {"text": "specific performance"}, {"text": "bail under section 438"}]
+    first = reranker.rerank_documents("Anticipatory bail", [dict(d) for d in docs], top_n=3)
+    assert len(scored) == 2  # duplicate passage scored once
+    assert [d["raw_rerank_score"] for d in first] == [len("> : bail under section 438")] * 2 + [len("> : specific performance")]
+
+    reranker.rerank_documents("  anticipatory   BAIL ", [dict(d) for d in docs] + [{"text": "new chunk"}], top_n=4)
+    assert [p[1] for p in scored[2:]] == ["> : new chunk"]
+    assert reranker.score_cache.stats()["hits"] == 3
+
+
+def test_lru_eviction():
+    cache = reranker.RerankScoreCache(maxsize=2)
+    cache.put(("q", "a"), 1.0)
+    cache.put(("q", "b"), 2.0)
+    assert cache.get(("q", "a")) == 1.0
+    cache.put(("q", "c"), 3.0)
+    assert cache.get(("q", "b")) is None
+    assert cache.get(("q", "a")) == 1.0
+
+
+def test_lexical_prefilter_keeps_best_matches_in_order():
+    texts = ["article 21 liberty", "section 438 anticipatory bail", "bail conditions", "adverse possession"]
+    assert reranker.prefilter_candidates("anticipatory bail", texts, top_m=2, mode="lexical") == [1, 2]
+    assert reranker.prefilter_candidates("anticipatory bail", texts, top_m=2, mode="off") == [0, 1, 2, 3]
+
+
+def test_prefilter_never_drops_cached_pairs(monkeypatch):
+    scored = []
+
+    def predict(_key, pairs):
+        scored.extend(pairs)
+        return [1.0] * len(pairs)
+
+    monkeypatch.setattr(reranker, "get_rerank_scheduler", lambda: InferenceScheduler("test", predict, window_ms=1))
+    monkeypatch.setattr(reranker, "score_cache", reranker.RerankScoreCache(maxsize=100))
+    query = "anticipatory bail"
+    cached = {"text": "adverse possession"}  # no lexical overlap with the query
+    reranker.score_cache.put((reranker.score_cache.query_key(query),
+                              reranker.score_cache.passage_key(reranker._build_text_for_rerank(cached))), 9.0)
+
+    docs = [cached, {"text": "section 438 anticipatory bail"}, {"text": "bail conditions"}, {"text": "article 21"}]
+    results = reranker.rerank_documents(query, [dict(d) for d in docs], top_n=2, prefilter="lexical", prefilter_top_m=2)
+    assert results[0]["text"] == "adverse possession"
+    assert [p[1] for p in scored] == ["> : section 438 anticipatory bail"]
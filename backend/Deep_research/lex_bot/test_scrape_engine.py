@@ -0,0 +1,72 @@
+"""
+Scrape engine: one background loop and keep-alive pool shared by every caller.
+
+    pytest lex_bot/test_scrape_engine.py      (from backend/Deep_research)
+"""
+import asyncio
+import threading
+import http.server
+import socketserver
+
+import pytest
+
+pytest.importorskip("httpx")
+
+from lex_bot.tools.scrape_engine import ScrapeEngine  # noqa: E402
+
+
+class _Handler(http.server.BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive
+    peers = set()
+
+    def do_GET(self):
+        _Handler.peers.add(self.client_address)
+        body = b"<html><body><p>judgment</p></body></html>"
+        ctype = "text/html; charset=utf-8"
+        if self.path == "/big":
+            body = b"<p>" + b"x" * 50_000 + b"</p>"
+        elif self.path == "/pdf":
+            body, ctype = b"%PDF-1.4", "application/pdf"
+        self.send_response(200)
+        self.send_header("Content-Type", ctype)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def test_requests_reuse_one_connection_from_sync_and_async_callers():
+    server = socketserver.ThreadingTCPServer(("127.0.0.1", 0), _Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f"http://127.0.0.1:{server.server_address[1]}"
+    engine = ScrapeEngine()
+    try:
+        for i in range(3):
+            assert engine.run(engine.get(f"{base}/doc/{i}")).status_code == 200
+
+        async def from_other_loop():
+            return (await engine.wrap(engine.get(f"{base}/doc/async"))).status_code
+
+        assert asyncio.run(from_other_loop()) == 200
+        assert len(_Handler.peers) == 1
+        assert engine.stats()["requests"] == 4
+    finally:
+        engine.close()
+        server.shutdown()
+
+
+def test_fetch_html_caps_bytes_and_filters_content_type():
+    server = socketserver.ThreadingTCPServer(("127.0.0.1", 0), _Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f"http://127.0.0.1:{server.server_address[1]}"
+    engine = ScrapeEngine()
+    try:
+        text, raw = engine.run(engine.fetch_html(f"{base}/big", max_bytes=4096))
+        assert len(raw) == 4096 and text.startswith("<p>xxx")
+        assert engine.run(engine.fetch_html(f"{base}/pdf")) is None
+        assert engine.stats()["truncated"] == 1 and engine.stats()["skipped_type"] == 1
+    finally:
+        engine.close()
+        server.shutdown()
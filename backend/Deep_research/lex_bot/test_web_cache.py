@@ -0,0 +1,72 @@
+"""
+Web cache backends: TTL expiry, LRU size bounds, and sharing through the SQLite file.
+
+    pytest lex_bot/test_web_cache.py      (from backend/Deep_research)
+"""
+import time
+import asyncio
+
+from lex_bot.core.web_cache import MemoryBackend, SQLiteBackend, WebCache, _encode, canonical_url
+
+
+def test_memory_backend_evicts_lru_by_count_and_bytes():
+    backend = MemoryBackend(max_entries=2, max_bytes=10_000)
+    cache = WebCache("t", backend)
+    cache.set("a", "A")
+    cache.set("b", "B")
+    assert cache.get("a") == "A"
+    cache.set("c", "C")
+    assert cache.get("b") is None and cache.get("a") == "A"
+
+    small = MemoryBackend(max_entries=100, max_bytes=len(_encode("x" * 50)) + 5)
+    WebCache("t", small).set("k1", "x" * 50)
+    WebCache("t", small).set("k2", "y" * 50)
+    assert small.stats()["entries"] == 1
+
+
+def test_ttl_expiry():
+    cache = WebCache("t", MemoryBackend())
+    cache.set("q", ["context", [{"url": "u"}]], ttl=1)
+    assert cache.get("q") == ["context", [{"url": "u"}]]
+    time.sleep(1.1)
+    assert cache.get("q") is None
+    assert cache.stats()["hits"] == 1
+
+
+def test_sqlite_shared_between_instances_and_bounded(tmp_path):
+    path = str(tmp_path / "cache.sqlite3")
+    writer = WebCache("scrape", SQLiteBackend(path, max_entries=10))
+    reader = WebCache("scrape", SQLiteBackend(path, max_entries=10))
+    writer.set("https://indiankanoon.org/doc/1", "judgment text " * 100)
+    assert reader.get("https://indiankanoon.org/doc/1") == "judgment text " * 100
+    assert WebCache("other", SQLiteBackend(path)).get("https://indiankanoon.org/doc/1") is None
+
+    for i in range(99):  # bounds are enforced every _EVICT_EVERY (50) writes
+        writer.set(f"url{i}", f"page {i}")
+    assert writer.backend.stats()["entries"] <= 10
+    assert reader.get("url98") == "page 98"
+
+
+def test_canonical_url_collapses_variants():
+    key = canonical_url("https://indiankanoon.org/doc/123/")
+    assert canonical_url("http://www.IndianKanoon.org:80/doc/123?utm_source=x#para5") == key
+    assert canonical_url("https://indiankanoon.org/doc/123?b=2&a=1") == canonical_url("https://indiankanoon.org/doc/123?a=1&b=2")
+    assert canonical_url("https://indiankanoon.org/doc/123?reference=7") != key
+
+
+def test_sqlite_hits_buffer_lru_touches_until_next_write(tmp_path):
+    backend = SQLiteBackend(str(tmp_path / "cache.sqlite3"))
+    cache = WebCache("scrape", backend)
+    cache.set("a", "x")
+    key = cache._key("a")
+    written_at = backend._conn.execute("SELECT accessed_at FROM web_cache WHERE key = ?", (key,)).fetchone()[0]
+
+    time.sleep(0.01)
+    assert cache.get("a") == "x"
+    assert key in backend._touched
+    assert backend._conn.execute("SELECT accessed_at FROM web_cache WHERE key = ?", (key,)).fetchone()[0] == written_at
+
+    cache.set("b", "y")
+    assert not backend._touched
+    assert backend._conn.execute("SELECT accessed_at FROM web_cache WHERE key = ?", (key,)).fetchone()[0] > written_at
+    assert asyncio.run(cache.aget("b")) == "y"
@@ -1,13 +1,82 @@
 import os
 import logging
 from typing import List, Dict, Optional, Tuple
-from ..config import DATABASE_URL, EMBEDDING_MODEL_NAME, DB_SEARCH_LIMIT_PRE
+from ..config import (
+    DATABASE_URL, EMBEDDING_MODEL_NAME, DB_SEARCH_LIMIT_PRE, DB_SEARCH_MODE, DB_SEARCH_BRANCH_K,
+    DB_SEARCH_RRF_K, DB_HNSW_EF_SEARCH,
+)
 from .web_search import web_search_tool
 from ..core.embeddings import get_embedding_model
 
 # Configure logging
 logger = logging.getLogger(__name__)
 
+# Top-k from the tsvector (GIN) and pgvector (HNSW) indexes, fused by reciprocal rank.
+# Each branch is a plain ORDER BY ... LIMIT so both indexes are usable; passages that
+# share a parent are collapsed to their best-ranked child before the final LIMIT.
+HYBRID_SEARCH_SQL = """
+WITH q AS (
+    SELECT websearch_to_tsquery('english', :qtext) AS qtsv
+),
+vec AS (
+    SELECT id, distance, row_number() OVER (ORDER BY distance) AS rnk
+    FROM (
+        SELECT p.id, p.embedding <=> CAST(:qemb AS vector) AS distance
+        FROM passages p
+        ORDER BY p.embedding <=> CAST(:qemb AS vector)
+        LIMIT :branch_k
+    ) nearest
+),
+lex AS (
+    SELECT id, lex, row_number() OVER (ORDER BY lex DESC) AS rnk
+    FROM (
+        SELECT p.id, ts_rank(p.search_vector, q.qtsv) AS lex
+        FROM passages p, q
+        WHERE p.search_vector @@ q.qtsv
+        ORDER BY lex DESC
+        LIMIT :branch_k
+    ) matched
+),
+fused AS (
+    SELECT
+        COALESCE(v.id, l.id) AS id,
+        COALESCE(1.0 / (:rrf_k + v.rnk), 0) + COALESCE(1.0 / (:rrf_k + l.rnk), 0) AS rrf,
+        v.distance, l.lex, v.rnk AS vector_rank, l.rnk AS lex_rank
+    FROM vec v
+    FULL OUTER JOIN lex l ON l.id = v.id
+),
+per_parent AS (
+    SELECT DISTINCT ON (p.doc_id, COALESCE(md5(p.parent_text), p.id::text))
+        p.id, p.doc_id, p.heading, p.text, p.parent_text, p.year, p.category,
+        f.rrf, f.distance, f.lex, f.vector_rank, f.lex_rank
+    FROM fused f
+    JOIN passages p ON p.id = f.id
+    ORDER BY p.doc_id, COALESCE(md5(p.parent_text), p.id::text), f.rrf DESC
+)
+SELECT pp.*, r.title
+FROM per_parent pp
+JOIN docs_raw r ON r.id = pp.doc_id
+ORDER BY pp.rrf DESC
+LIMIT :pre_k
+"""
+
+# Previous behavior: nearest passages only, lexical rank computed but not used for ordering
+VECTOR_SEARCH_SQL = """
+WITH q AS (
+    SELECT 
+        websearch_to_tsquery('english', :qtext) AS qtsv,
+        CAST(:qemb AS vector) AS qemb
+)
+SELECT 
+    p.id, p.doc_id, p.heading, p.text, p.parent_text, p.year, p.category, r.title,
+    ts_rank(p.search_vector, (SELECT qtsv FROM q)) AS lex,
+    (p.embedding <=> (SELECT qemb FROM q)) AS distance
+FROM passages p
+JOIN docs_raw r ON r.id = p.doc_id
+ORDER BY p.embedding <=> (SELECT qemb FROM q)
+LIMIT :pre_k
+"""
+
 class SearchTool:
     def __init__(self):
         self.engine = None
@@ -55,25 +124,18 @@ class SearchTool:
             logger.warning("No embedding generated, falling back to web search")
             return []
         
-        query_sql = sql("""
-        WITH q AS (
-            SELECT 
-                websearch_to_tsquery('english', :qtext) AS qtsv,
-                CAST(:qemb AS vector) AS qemb
-        )
-        SELECT 
-            p.id, p.doc_id, p.heading, p.text, p.parent_text, p.year, p.category, r.title,
-            ts_rank(p.search_vector, (SELECT qtsv FROM q)) AS lex,
-            (p.embedding <=> (SELECT qemb FROM q)) AS distance
-        FROM passages p
-        JOIN docs_raw r ON r.id = p.doc_id
-        ORDER BY p.embedding <=> (SELECT qemb FROM q)
-        LIMIT :pre_k
-        """)
+        hybrid = DB_SEARCH_MODE == "hybrid"
+        query_sql = sql(HYBRID_SEARCH_SQL if hybrid else VECTOR_SEARCH_SQL)
+        params = {'qtext': query, 'qemb': str(q_emb), 'pre_k': DB_SEARCH_LIMIT_PRE,
+                  'branch_k': DB_SEARCH_BRANCH_K, 'rrf_k': DB_SEARCH_RRF_K}
+        # ef_search below the LIMIT silently truncates HNSW results
+        ef_search = max(DB_HNSW_EF_SEARCH, DB_SEARCH_BRANCH_K if hybrid else DB_SEARCH_LIMIT_PRE)
 
         try:
             with Session(self.engine) as ses:
-                rows = ses.execute(query_sql, {'qtext': query, 'qemb': str(q_emb), 'pre_k': DB_SEARCH_LIMIT_PRE}).mappings().all()
+                # Transaction-local, so pooled connections keep their defaults
+                ses.execute(sql("SELECT set_config('hnsw.ef_search', :ef, true)"), {'ef': str(ef_search)})
+                rows = ses.execute(query_sql, params).mappings().all()
 
             if not rows:
                 return []
@@ -86,7 +148,11 @@ class SearchTool:
                     "text": r['parent_text'] if r['parent_text'] else r['text'],
                     "search_hit": r['text'],
                     "url": "local_db",
-                    "source": "Database"
+                    "source": "Database",
+                    # Raw first-stage scores (None when the passage came from only one branch)
+                    "vector_score": 1.0 - float(r['distance']) if r['distance'] is not None else None,
+                    "lex_score": float(r['lex']) if r['lex'] is not None else None,
+                    "rrf_score": float(r['rrf']) if hybrid else None,
                 })
             return results
             
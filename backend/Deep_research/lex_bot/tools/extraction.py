@@ -0,0 +1,79 @@
+"""
+Extraction — trafilatura in a bounded process pool.
+
+trafilatura is pure-Python lxml work that holds the GIL for most of a parse.
+Run through asyncio.to_thread on the scrape engine loop, one large judgment
+page stalled every other in-flight scrape. Parsing now happens in a small
+process pool (SCRAPE_EXTRACT_WORKERS). Workers use the "spawn" start method
+so they never inherit the parent's threads or locks. If the pool breaks, for
+example because a worker was OOM-killed, it is rebuilt and that page is
+parsed in a thread instead.
+
+This module is imported by the pool workers, so keep its imports light.
+"""
+
+import asyncio
+import logging
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Dict, Optional
+
+import trafilatura
+
+from lex_bot.config import SCRAPE_EXTRACT_WORKERS
+
+logger = logging.getLogger(__name__)
+
+
+def extract_text(html: str) -> Optional[str]:
+    """Main text of a page without boilerplate (runs inside a pool worker)."""
+    return trafilatura.extract(html, favor_precision=True)
+
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+_stats = {"pool": 0, "thread": 0, "pool_restarts": 0}
+
+
+def _get_pool() -> Optional[ProcessPoolExecutor]:
+    global _pool
+    if SCRAPE_EXTRACT_WORKERS <= 0:
+        return None
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ProcessPoolExecutor(
+                    max_workers=SCRAPE_EXTRACT_WORKERS,
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+    return _pool
+
+
+def _reset_pool(broken: ProcessPoolExecutor):
+    global _pool
+    with _pool_lock:
+        if _pool is broken:
+            _pool = None
+            _stats["pool_restarts"] += 1
+    broken.shutdown(wait=False, cancel_futures=True)
+
+
+async def extract_async(html: str) -> Optional[str]:
+    """Extract off the event loop: in the process pool, or a thread as fallback."""
+    pool = _get_pool()
+    if pool is not None:
+        try:
+            text = await asyncio.get_running_loop().run_in_executor(pool, extract_text, html)
+            _stats["pool"] += 1
+            return text
+        except BrokenProcessPool:
+            logger.warning("Extraction pool broke; restarting it and parsing this page in a thread")
+            _reset_pool(pool)
+    _stats["thread"] += 1
+    return await asyncio.to_thread(extract_text, html)
+
+
+def extraction_stats() -> Dict[str, Any]:
+    return {"workers": SCRAPE_EXTRACT_WORKERS, **_stats}
@@ -5,28 +5,26 @@ Replaces the HTML scraper (indian_kanoon.py) with the official REST API.
 API docs: https://api.indiankanoon.org/
 
 Token: read from IKApi env var.
+
+Raw API responses are cached in core/ik_cache.py, which is persistent and
+shared with Drafter and Case_search.
 """
 
 import os
-import time
 import logging
-import threading
 from typing import List, Dict, Any, Optional
 
 import requests
 
 import re as _re
 
+from ..core.ik_cache import get_ik_cache, search_key
+
 logger = logging.getLogger(__name__)
 
 _API_BASE = "https://api.indiankanoon.org"
 _TOKEN = os.getenv("IKApi", "").strip()
 
-# In-process cache: (query, max_results) -> (timestamp, results)
-_cache: Dict[str, tuple] = {}
-_cache_lock = threading.Lock()
-_CACHE_TTL = 43200  # 12 hours — statutes and case law don't change often
-
 
 def _clean(text: str) -> str:
     """Strip HTML tags from IK headline snippets."""
@@ -41,19 +39,27 @@ def _headers() -> Dict[str, str]:
     }
 
 
-def _cached(key: str):
-    with _cache_lock:
-        entry = _cache.get(key)
-    if entry:
-        ts, data = entry
-        if time.time() - ts < _CACHE_TTL:
-            return data
-    return None
+def _post(path: str, data: Optional[Dict[str, Any]], timeout: float) -> Dict[str, Any]:
+    resp = requests.post(f"{_API_BASE}{path}", headers=_headers(), data=data, timeout=timeout)
+    resp.raise_for_status()
+    return resp.json()
 
 
-def _store(key: str, data):
-    with _cache_lock:
-        _cache[key] = (time.time(), data)
+def _to_results(data: Dict[str, Any], max_results: int) -> List[Dict[str, Any]]:
+    results = []
+    for doc in data.get("docs", [])[:max_results]:
+        tid = doc.get("tid") or doc.get("docid")
+        results.append({
+            "title": doc.get("title", "Unknown"),
+            "snippet": _clean(doc.get("headline", "")),
+            "url": f"https://indiankanoon.org/doc/{tid}/",
+            "docid": str(tid),
+            "doctype": doc.get("doctype", ""),
+            "publishdate": doc.get("publishdate", ""),
+            "citation": doc.get("citation", ""),
+            "source": "IndianKanoon",
+        })
+    return results
 
 
 def search(query: str, max_results: int = 8, pagenum: int = 0) -> List[Dict[str, Any]]:
@@ -67,41 +73,16 @@ def search(query: str, max_results: int = 8, pagenum: int = 0) -> List[Dict[str,
         logger.warning("IKApi token not set — Indian Kanoon API unavailable")
         return []
 
-    cache_key = f"search:{query.lower().strip()}:{max_results}:{pagenum}"
-    cached = _cached(cache_key)
-    if cached is not None:
-        logger.info(f"⚡ IK cache HIT: {query[:50]}")
-        return cached
-
     try:
-        resp = requests.post(
-            f"{_API_BASE}/search/",
-            headers=_headers(),
-            data={"formInput": query, "pagenum": pagenum},
-            timeout=10,
+        data = get_ik_cache("search").get_or_fetch(
+            search_key(query, pagenum),
+            lambda: _post("/search/", {"formInput": query, "pagenum": pagenum}, timeout=10),
         )
-        resp.raise_for_status()
-        data = resp.json()
     except Exception as e:
         logger.error(f"IK search failed: {e}")
         return []
 
-    docs = data.get("docs", [])
-    results = []
-    for doc in docs[:max_results]:
-        tid = doc.get("tid") or doc.get("docid")
-        results.append({
-            "title": doc.get("title", "Unknown"),
-            "snippet": _clean(doc.get("headline", "")),
-            "url": f"https://indiankanoon.org/doc/{tid}/",
-            "docid": str(tid),
-            "doctype": doc.get("doctype", ""),
-            "publishdate": doc.get("publishdate", ""),
-            "citation": doc.get("citation", ""),
-            "source": "IndianKanoon",
-        })
-
-    _store(cache_key, results)
+    results = _to_results(data, max_results)
     logger.info(f"IK search: '{query[:50]}' → {len(results)} results")
     return results
 
@@ -114,27 +95,35 @@ def get_doc(docid: str) -> Optional[str]:
     if not _TOKEN:
         return None
 
-    cache_key = f"doc:{docid}"
-    cached = _cached(cache_key)
-    if cached is not None:
-        return cached
-
     try:
-        resp = requests.post(
-            f"{_API_BASE}/doc/{docid}/",
-            headers=_headers(),
-            timeout=15,
+        data = get_ik_cache("doc").get_or_fetch(
+            str(docid), lambda: _post(f"/doc/{docid}/", None, timeout=15)
         )
-        resp.raise_for_status()
-        data = resp.json()
-        text = data.get("doc", "") or data.get("text", "")
-        text = _clean(text)
     except Exception as e:
         logger.error(f"IK get_doc {docid} failed: {e}")
         return None
+    if "errmsg" in data:
+        logger.error(f"IK get_doc {docid} failed: {data['errmsg']}")
+        return None
+
+    return _clean(data.get("doc", "") or data.get("text", ""))
+
+
+def cited_by(docid: str, max_results: int = 10) -> List[Dict[str, Any]]:
+    """Judgments citing `docid`, in the same shape as search()."""
+    if not _TOKEN:
+        return []
+
+    try:
+        data = get_ik_cache("citedby").get_or_fetch(
+            str(docid),
+            lambda: _post("/search/", {"formInput": f"citedby:{docid}", "pagenum": 0}, timeout=10),
+        )
+    except Exception as e:
+        logger.error(f"IK citedby {docid} failed: {e}")
+        return []
 
-    _store(cache_key, text)
-    return text
+    return _to_results(data, max_results)
 
 
 def search_to_context(query: str, max_results: int = 8) -> tuple:
@@ -0,0 +1,209 @@
+"""
+Provider Scheduler — Hedged, deadline-aware fan-out over web search providers.
+
+WebSearchTool used to wait for DDG and Tavily to both finish, and only then
+try Serper and SerpAPI one after another, each with a flat 10 s timeout. Web
+search sits on the critical path of the law, case and research agents, so
+the slowest provider set the tail.
+
+Per query:
+  1. Providers are ordered by an EWMA of latency plus a penalty weighted by
+     an EWMA of failures (errors or empty results).
+  2. `primary` providers (DuckDuckGo and Tavily in WebSearchTool) always start
+     immediately, together with the best-ranked others up to `fanout`. Each
+     further provider is launched as a hedge when the newest in-flight one
+     passes its own p90 latency, or at once if one comes back empty or fails.
+  3. The call returns once `min_urls` unique URLs have arrived and every
+     primary provider has answered, or at the deadline with whatever is in
+     hand. Waiting on primaries keeps Tavily's raw_content (which lets the
+     caller skip scraping) from losing the race to a fast, snippet-only DDG.
+     Calls still running keep going in the background only to feed the
+     latency statistics.
+
+Usage:
+    scheduler = ProviderScheduler({"ddg": ddg_fn, "tavily": tavily_fn, "serper": serper_fn},
+                                  primary=("ddg", "tavily"))
+    results = scheduler.search(query, max_results=5, deadline_s=8.0, min_urls=5)
+"""
+
+import time
+import logging
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+from lex_bot.core.web_cache import canonical_url
+
+logger = logging.getLogger(__name__)
+
+EWMA_ALPHA = 0.2
+PRIOR_LATENCY_S = 2.0       # assumed latency before a provider has any samples
+LATENCY_WINDOW = 50         # recent samples used for the p90 hedge delay
+FAILURE_PENALTY_S = 5.0     # ordering cost of a failed/empty call: the query has to wait for a backup
+
+
+class ProviderStats:
+    """Latency/error EWMA and a sliding p90 for one provider."""
+
+    def __init__(self):
+        self.latency_ewma: Optional[float] = None
+        self.error_ewma = 0.0
+        self.calls = 0
+        self.failures = 0
+        self._recent = deque(maxlen=LATENCY_WINDOW)
+        self._lock = threading.Lock()
+
+    def record(self, latency_s: float, ok: bool):
+        with self._lock:
+            self.calls += 1
+            if not ok:
+                self.failures += 1
+            self._recent.append(latency_s)
+            if self.latency_ewma is None:
+                self.latency_ewma = latency_s
+            else:
+                self.latency_ewma += EWMA_ALPHA * (latency_s - self.latency_ewma)
+            self.error_ewma += EWMA_ALPHA * ((0.0 if ok else 1.0) - self.error_ewma)
+
+    def p90(self) -> float:
+        with self._lock:
+            if len(self._recent) < 5:
+                return PRIOR_LATENCY_S
+            ordered = sorted(self._recent)
+        return ordered[int(0.9 * (len(ordered) - 1))]
+
+    def score(self) -> float:
+        """Expected seconds to a useful answer; lower runs first."""
+        latency = self.latency_ewma if self.latency_ewma is not None else PRIOR_LATENCY_S
+        return latency + self.error_ewma * FAILURE_PENALTY_S
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "calls": self.calls,
+            "failures": self.failures,
+            "latency_ewma_ms": round(self.latency_ewma * 1000, 1) if self.latency_ewma is not None else None,
+            "error_ewma": round(self.error_ewma, 3),
+            "p90_ms": round(self.p90() * 1000, 1),
+        }
+
+
+class ProviderScheduler:
+    """
+    Runs search providers `fn(query, max_results, domains, timeout) -> [{"url", ...}]`
+    with hedging and a per-query deadline.
+    """
+
+    def __init__(self, providers: Dict[str, Callable[..., List[Dict]]], hedge_floor_s: float = 0.3,
+                 max_workers: int = 32, primary: Sequence[str] = ()):
+        self.providers = providers
+        self.hedge_floor_s = hedge_floor_s
+        self.primary = [name for name in primary if name in providers]
+        self.stats = {name: ProviderStats() for name in providers}
+        # Calls outlive an abandoned search by up to their timeout (the time left to its deadline),
+        # so the pool is sized for several concurrent searches' worth of them
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="web-provider")
+        self.searches = 0
+        self.hedges = 0
+        self.deadline_hits = 0
+        self.expired = 0
+
+    def ranked(self) -> List[str]:
+        # Stable sort: registration order breaks ties (and orders cold providers)
+        return sorted(self.providers, key=lambda name: self.stats[name].score())
+
+    def _launch_order(self) -> List[str]:
+        ranked = self.ranked()
+        return [n for n in ranked if n in self.primary] + [n for n in ranked if n not in self.primary]
+
+    def _call(self, name: str, query: str, max_results: int, domains: Optional[List[str]], deadline: float) -> List[Dict]:
+        start = time.monotonic()
+        if start >= deadline:
+            # Queued behind other searches' calls until this search gave up; don't spend a slot on it
+            self.expired += 1
+            return []
+        try:
+            results = self.providers[name](query, max_results, domains, max(0.5, deadline - start)) or []
+        except Exception as e:
+            logger.error(f"{name} search failed: {e}")
+            results = []
+        self.stats[name].record(time.monotonic() - start, ok=bool(results))
+        return results
+
+    def search(self, query: str, max_results: int, domains: Optional[List[str]] = None,
+               deadline_s: float = 8.0, min_urls: int = 5, fanout: int = 1) -> List[Dict]:
+        """
+        Results unique by canonical URL, in arrival order; a duplicate with a longer
+        snippet replaces the earlier entry. 'source' defaults to the provider name.
+        """
+        self.searches += 1
+        start = time.monotonic()
+        deadline = start + deadline_s
+        order = self._launch_order()
+        first_wave = max(fanout, len(self.primary))
+        pending: Dict[Any, str] = {}
+        next_idx = 0
+        next_launch_at = start
+        results: List[Dict] = []
+        seen: Dict[str, int] = {}  # canonical URL -> index in results
+
+        while True:
+            now = time.monotonic()
+            # Launch: first wave, a hedge past the newest provider's p90, or a replacement for a failure.
+            # No hedges once there are enough URLs and only primaries are being waited on.
+            while next_idx < len(order) and now < deadline and (
+                next_idx < first_wave or (len(seen) < min_urls and (now >= next_launch_at or not pending))
+            ):
+                name = order[next_idx]
+                if next_idx >= first_wave:
+                    self.hedges += 1
+                    logger.info(f"Hedging web search to {name} after {(now - start) * 1000:.0f}ms")
+                next_idx += 1
+                fut = self._pool.submit(self._call, name, query, max_results, domains, deadline)
+                pending[fut] = name
+                next_launch_at = now + max(self.hedge_floor_s, self.stats[name].p90())
+
+            if not pending:
+                break
+            wake = deadline
+            if next_idx < len(order) and len(seen) < min_urls:
+                wake = min(wake, next_launch_at)  # only while a hedge could still launch
+            done, _ = wait(list(pending), timeout=max(0.0, wake - time.monotonic()), return_when=FIRST_COMPLETED)
+
+            for fut in done:
+                name = pending.pop(fut)
+                provider_results = fut.result()
+                if not provider_results:
+                    next_launch_at = time.monotonic()  # no point waiting out a p90 for a failed provider
+                for r in provider_results:
+                    url = r.get("url")
+                    if not url:
+                        continue
+                    key = canonical_url(url)
+                    if key not in seen:
+                        seen[key] = len(results)
+                        results.append({"source": name, **r})
+                    elif len(r.get("snippet") or "") > len(results[seen[key]].get("snippet") or ""):
+                        # Same page from another provider with more text (e.g. Tavily raw_content)
+                        results[seen[key]] = {"source": name, **r}
+
+            if len(seen) >= min_urls and not any(name in self.primary for name in pending.values()):
+                break
+            if time.monotonic() >= deadline:
+                self.deadline_hits += 1
+                logger.warning(f"Web search deadline ({deadline_s}s) hit with {len(seen)} URLs; "
+                               f"still waiting on {sorted(pending.values())}")
+                break
+
+        return results
+
+    def stats_dict(self) -> Dict[str, Any]:
+        return {
+            "searches": self.searches,
+            "hedges": self.hedges,
+            "deadline_hits": self.deadline_hits,
+            "expired": self.expired,
+            "primary": self.primary,
+            "order": self._launch_order(),
+            "providers": {name: s.as_dict() for name, s in self.stats.items()},
+        }
@@ -0,0 +1,137 @@
+"""
+Rerank Eval - recall@k of the prefilter cascade against full cross-encoder reranking.
+
+The reference ranking is what rerank_documents produced before the cascade:
+every candidate scored by the cross-encoder. For each prefilter mode and top-M
+budget, recall@k = |cascade top-k ∩ reference top-k| / k, averaged over a
+fixed query set, next to per-stage timings and the number of pairs scored.
+
+    python -m lex_bot.tools.rerank_eval                        # bundled IPC/BNS sections as candidates
+    python -m lex_bot.tools.rerank_eval --source db            # SearchTool hybrid DB candidates
+    python -m lex_bot.tools.rerank_eval --k 10 --top-m 20 40 60 --modes lexical embedding
+
+Run from backend/Deep_research. The score cache is disabled while evaluating
+so every configuration pays its real cross-encoder cost.
+"""
+
+import os
+import json
+import argparse
+import statistics
+from typing import Dict, List
+
+from lex_bot.tools import reranker
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'data')
+
+# Fixed query set; keep it stable so numbers are comparable across runs
+EVAL_QUERIES = [
+    "punishment for murder",
+    "difference between culpable homicide and murder",
+    "dowry death within seven years of marriage",
+    "cheating and dishonestly inducing delivery of property",
+    "criminal breach of trust by a public servant",
+    "punishment for theft",
+    "criminal intimidation threat to cause death",
+    "abetment of suicide",
+    "voluntarily causing grievous hurt with dangerous weapons",
+    "kidnapping from lawful guardianship",
+    "defamation of a person by spoken words",
+    "cruelty by husband or relatives of husband",
+    "attempt to murder",
+    "robbery and dacoity",
+    "offences committed outside India",
+    "causing death by negligence rash driving",
+]
+
+
+def load_section_candidates() -> List[Dict]:
+    """Every bundled IPC / BNS section as a rerank candidate."""
+    candidates = []
+    for code, files in (("IPC", ("ipc_batch_1.json", "ipc_batch_2.json")), ("BNS", ("bns_sections.json",))):
+        for name in files:
+            with open(os.path.join(DATA_DIR, name), 'r', encoding='utf-8') as f:
+                sections = json.load(f)
+            for num, s in sections.items():
+                candidates.append({
+                    "title": f"{code} Section {num}",
+                    "heading": s.get("title", ""),
+                    "text": f"{s.get('description', '')} Punishment: {s.get('punishment', 'NA')}",
+                })
+    return candidates
+
+
+def _top_ids(results: List[Dict], k: int) -> set:
+    return {reranker._build_text_for_rerank(r) for r in results[:k]}
+
+
+def evaluate(queries: List[str], source: str, k: int, top_ms: List[int], modes: List[str]) -> List[Dict]:
+    if reranker.get_rerank_scheduler() is None:
+        raise RuntimeError("Cross-encoder unavailable; install sentence-transformers to evaluate reranking")
+    reranker.score_cache = reranker.RerankScoreCache(maxsize=0)
+
+    if source == "db":
+        from lex_bot.tools.db_search import search_tool
+        candidate_sets = {q: search_tool._hybrid_db_search(q) for q in queries}
+    else:
+        sections = load_section_candidates()
+        candidate_sets = {q: sections for q in queries}
+    candidate_sets = {q: c for q, c in candidate_sets.items() if len(c) > k}
+    if not candidate_sets:
+        raise RuntimeError(f"No query returned more than k={k} candidates from source={source}")
+
+    def run(query, mode, top_m):
+        timings: Dict = {}
+        docs = [dict(c) for c in candidate_sets[query]]
+        results = reranker.rerank_documents(query, docs, top_n=k, prefilter=mode,
+                                            prefilter_top_m=top_m, timings=timings)
+        return results, timings
+
+    reference = {q: run(q, "off", None) for q in candidate_sets}
+    rows = [_summarize("off", None, [(1.0, reference[q][1]) for q in candidate_sets])]
+    for mode in modes:
+        for top_m in top_ms:
+            per_query = []
+            for q in candidate_sets:
+                results, timings = run(q, mode, top_m)
+                recall = len(_top_ids(results, k) & _top_ids(reference[q][0], k)) / float(k)
+                per_query.append((recall, timings))
+            rows.append(_summarize(mode, top_m, per_query))
+    return rows
+
+
+def _summarize(mode: str, top_m, per_query) -> Dict:
+    timings = [t for _, t in per_query]
+    return {
+        "mode": mode,
+        "top_m": top_m,
+        "queries": len(per_query),
+        "recall_at_k": round(statistics.mean(r for r, _ in per_query), 3),
+        "min_recall_at_k": round(min(r for r, _ in per_query), 3),
+        "avg_candidates": round(statistics.mean(t["candidates"] for t in timings), 1),
+        "avg_cross_encoded": round(statistics.mean(t["cross_encoded"] for t in timings), 1),
+        "avg_prefilter_ms": round(statistics.mean(t["prefilter_ms"] for t in timings), 2),
+        "avg_cross_encoder_ms": round(statistics.mean(t["cross_encoder_ms"] for t in timings), 2),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="recall@k of prefilter + cross-encoder vs cross-encoder only")
+    parser.add_argument("--source", choices=("sections", "db"), default="sections")
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--top-m", type=int, nargs="+", default=[20, 40, 60])
+    parser.add_argument("--modes", nargs="+", default=["lexical", "embedding"], choices=reranker.PREFILTER_MODES[1:])
+    parser.add_argument("--json", action="store_true", help="print rows as JSON")
+    args = parser.parse_args()
+
+    rows = evaluate(EVAL_QUERIES, args.source, args.k, args.top_m, args.modes)
+    if args.json:
+        print(json.dumps(rows, indent=2))
+    else:
+        header = f"{'mode':<10}{'top_m':>6}{'recall@' + str(args.k):>11}{'min':>7}{'cands':>8}{'scored':>8}{'pre ms':>9}{'ce ms':>9}"
+        print(header)
+        print("-" * len(header))
+        for r in rows:
+            print(f"{r['mode']:<10}{str(r['top_m'] or '-'):>6}{r['recall_at_k']:>11.3f}{r['min_recall_at_k']:>7.2f}"
+                  f"{r['avg_candidates']:>8.0f}{r['avg_cross_encoded']:>8.0f}"
+                  f"{r['avg_prefilter_ms']:>9.2f}{r['avg_cross_encoder_ms']:>9.2f}")
@@ -1,12 +1,21 @@
 import numpy as np
 import math
+import re
+import time
+import hashlib
 import threading
-from typing import List, Dict, Optional
-from ..config import RERANK_MODEL
+from collections import OrderedDict
+from typing import List, Dict, Optional, Tuple
+from ..config import (
+    RERANK_MODEL, RERANK_RUNTIME, INFERENCE_BATCH_WINDOW_MS, RERANK_MAX_BATCH, RERANK_CACHE_SIZE,
+    RERANK_PREFILTER, RERANK_PREFILTER_TOP_M,
+)
+from ..core.inference_scheduler import InferenceScheduler
 
 # Safe Import
 _reranker = None
-_inference_lock = threading.Lock()
+_scheduler = None
+_scheduler_lock = threading.Lock()
 HAS_SENTENCE_TRANSFORMERS = False
 
 try:
@@ -15,6 +24,69 @@ try:
 except ImportError:
     print("[WARN] Sentence Transformers not found/broken. Reranking disabled.")
 
+class RerankScoreCache:
+    """
+    Bounded LRU of raw cross-encoder scores keyed by (normalized query hash, passage hash).
+
+    The manager reranks contexts the agents already reranked, and document_agent
+    rescores every chunk of an uploaded file on each turn; only unseen pairs need the model.
+    """
+
+    def __init__(self, maxsize: int = RERANK_CACHE_SIZE):
+        self.maxsize = maxsize
+        self._data: "OrderedDict[Tuple[str, str], float]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def query_key(query: str) -> str:
+        normalized = re.sub(r"\s+", " ", query.strip().lower())
+        return hashlib.sha1(normalized.encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def passage_key(text: str) -> str:
+        return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+    def get(self, key: Tuple[str, str]) -> Optional[float]:
+        with self._lock:
+            score = self._data.get(key)
+            if score is None:
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return score
+
+    def __contains__(self, key: Tuple[str, str]) -> bool:
+        return key in self._data
+
+    def put(self, key: Tuple[str, str], score: float):
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._data[key] = score
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> Dict:
+        total = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / total, 3) if total else 0.0,
+        }
+
+
+score_cache = RerankScoreCache()
+
 def get_reranker():
     global _reranker
     if not HAS_SENTENCE_TRANSFORMERS:
@@ -22,15 +94,33 @@ def get_reranker():
         
     if _reranker is None:
         try:
-            print(f"[RERANK] Loading Reranker: {RERANK_MODEL}...")
-            # FORCE CPU to avoid OOM on weak GPUs / limited VRAM envs
-            _reranker = CrossEncoder(RERANK_MODEL, device='cpu', max_length=512)
+            from ..core.inference_backend import load_cross_encoder
+            print(f"[RERANK] Loading Reranker: {RERANK_MODEL} ({RERANK_RUNTIME})...")
+            # FORCE CPU to avoid OOM on weak GPUs / limited VRAM envs; RERANK_RUNTIME may select ONNX int8
+            _reranker = load_cross_encoder(RERANK_MODEL, RERANK_RUNTIME, max_length=512)
         except Exception as e:
             print(f"[ERROR] Failed to load Reranker model: {e}")
             return None
             
     return _reranker
 
+def get_rerank_scheduler() -> Optional[InferenceScheduler]:
+    """Single worker thread that owns the cross-encoder and batches concurrent predict() calls."""
+    global _scheduler
+    rr = get_reranker()
+    if rr is None:
+        return None
+    if _scheduler is None:
+        with _scheduler_lock:
+            if _scheduler is None:
+                _scheduler = InferenceScheduler(
+                    "rerank",
+                    lambda _key, pairs: rr.predict(pairs),
+                    window_ms=INFERENCE_BATCH_WINDOW_MS,
+                    max_batch=RERANK_MAX_BATCH,
+                )
+    return _scheduler
+
 def _build_text_for_rerank(c: Dict) -> str:
     title = c.get("title") or ""
     heading = c.get("heading") or ""
@@ -40,16 +130,93 @@ def _build_text_for_rerank(c: Dict) -> str:
 def _sigmoid(x: float) -> float:
     return 1 / (1 + math.exp(-x))
 
-def rerank_documents(query: str, candidates: List[Dict], top_n: int = 10, threshold: Optional[float] = None) -> List[Dict]:
+# ---------- stage 1: cheap prefilter ----------
+
+PREFILTER_MODES = ("off", "lexical", "embedding")
+_STOPWORDS = frozenset(
+    "a an and are as at be by for from has have in is it of on or that the this to was were what when "
+    "which who whether with under can does do my i".split()
+)
+
+# Cumulative per-stage counters for /diag/inference
+_stage_stats = {
+    "calls": 0, "candidates": 0, "prefiltered_out": 0, "pairs_scored": 0,
+    "prefilter_ms": 0.0, "cross_encoder_ms": 0.0,
+}
+
+def _terms(text: str) -> List[str]:
+    return [t for t in re.findall(r"[a-z0-9]+", text.lower()) if t not in _STOPWORDS]
+
+def _lexical_scores(query: str, texts: List[str]) -> List[float]:
+    """IDF-weighted query-term coverage, with IDF taken over the candidate set itself."""
+    q_terms = set(_terms(query))
+    if not q_terms:
+        return [0.0] * len(texts)
+    doc_terms = [set(_terms(t)) & q_terms for t in texts]
+    n = len(texts)
+    idf = {t: math.log((n + 1) / (sum(t in d for d in doc_terms) + 0.5)) for t in q_terms}
+    return [sum(idf[t] for t in d) for d in doc_terms]
+
+def _embedding_scores(query: str, texts: List[str]) -> Optional[List[float]]:
+    """Bi-encoder cosine via the shared embedding model; None if it is unavailable."""
+    from ..core.embeddings import encode_texts
+    vecs = encode_texts([query] + texts)
+    if len(vecs) != len(texts) + 1:
+        return None
+    return (vecs[1:] @ vecs[0]).tolist()
+
+def prefilter_candidates(query: str, texts: List[str], top_m: int, mode: str = RERANK_PREFILTER) -> List[int]:
+    """
+    Indices of the top_m texts by a cheap score, in original order.
+    Returns every index when the mode is off or there is nothing to cut.
+    """
+    if mode not in PREFILTER_MODES:
+        raise ValueError(f"Unknown RERANK_PREFILTER {mode!r}; expected one of {PREFILTER_MODES}")
+    if mode == "off" or len(texts) <= top_m:
+        return list(range(len(texts)))
+
+    scores = _embedding_scores(query, texts) if mode == "embedding" else None
+    if scores is None:
+        scores = _lexical_scores(query, texts)
+    # Stable sort: ties keep the upstream (search engine) order
+    keep = sorted(range(len(texts)), key=lambda i: -scores[i])[:top_m]
+    return sorted(keep)
+
+def rerank_stats() -> Dict:
+    calls = _stage_stats["calls"]
+    return {
+        **_stage_stats,
+        "prefilter": RERANK_PREFILTER,
+        "prefilter_top_m": RERANK_PREFILTER_TOP_M,
+        "avg_prefilter_ms": round(_stage_stats["prefilter_ms"] / calls, 2) if calls else 0.0,
+        "avg_cross_encoder_ms": round(_stage_stats["cross_encoder_ms"] / calls, 2) if calls else 0.0,
+    }
+
+
+# ---------- stage 2: cross-encoder ----------
+
+def rerank_documents(
+    query: str,
+    candidates: List[Dict],
+    top_n: int = 10,
+    threshold: Optional[float] = None,
+    prefilter: Optional[str] = None,
+    prefilter_top_m: Optional[int] = None,
+    timings: Optional[Dict] = None,
+) -> List[Dict]:
     """
     Robust Reranking.
+
+    Two stages: `prefilter` (default RERANK_PREFILTER) keeps the best
+    `prefilter_top_m` candidates by a cheap score (pairs already in the score
+    cache always stay), then only those go through the cross-encoder. Pass a dict as `timings` to get per-stage milliseconds.
     """
     if not candidates:
         return []
 
-    rr = get_reranker()
+    scheduler = get_rerank_scheduler()
     
-    if rr is None:
+    if scheduler is None:
         # Fallback: Just return top N based on whatever order they came in (usually search engine rank)
         # Assign dummy scores
         for c in candidates:
@@ -58,19 +225,54 @@ def rerank_documents(query: str, candidates: List[Dict], top_n: int = 10, thresh
         return candidates[:top_n]
     
     try:
-        # Prepare pairs for cross-encoder
-        pairs = [(query, _build_text_for_rerank(c)) for c in candidates]
-        
-        # Predict with a global lock to prevent PyTorch OpenMP thread thrashing
-        # When LangGraph runs 4 agents in parallel, concurrent CPU inference destroys performance
-        with _inference_lock:
-            raw_scores = rr.predict(pairs)
-        
-        # Handle single/list output
-        if not isinstance(raw_scores, (list, np.ndarray)):
-            raw_scores = [raw_scores]
-            
-        scores_list = raw_scores.tolist() if hasattr(raw_scores, "tolist") else raw_scores
+        t0 = time.perf_counter()
+        texts = [_build_text_for_rerank(c) for c in candidates]
+        qkey = score_cache.query_key(query)
+        keys = [(qkey, score_cache.passage_key(t)) for t in texts]
+        n_in = len(candidates)
+
+        # Pairs with a cached score cost nothing and are always kept; the prefilter
+        # only cuts the uncached ones, to whatever budget the cached ones leave
+        top_m = max(prefilter_top_m or RERANK_PREFILTER_TOP_M, top_n)
+        uncached = [i for i, k in enumerate(keys) if k not in score_cache]
+        budget = max(top_m - (len(keys) - len(uncached)), 0)
+        if len(uncached) > budget:
+            picked = prefilter_candidates(query, [texts[i] for i in uncached], budget, prefilter or RERANK_PREFILTER)
+            dropped = set(uncached) - {uncached[j] for j in picked}
+            keep = [i for i in range(len(keys)) if i not in dropped]
+            candidates = [candidates[i] for i in keep]
+            texts = [texts[i] for i in keep]
+            keys = [keys[i] for i in keep]
+        t1 = time.perf_counter()
+
+        # Previously scored pairs come from the cache
+        scores_list = [score_cache.get(k) for k in keys]
+
+        # Unseen pairs only, once each (the same chunk can appear in several contexts)
+        missing: Dict[Tuple[str, str], str] = {}
+        for k, t, s in zip(keys, texts, scores_list):
+            if s is None and k not in missing:
+                missing[k] = t
+
+        if missing:
+            # Only the scheduler's worker thread runs the model, so parallel LangGraph agents
+            # never thrash PyTorch's OpenMP pool; their pairs are scored in one predict() call
+            raw_scores = scheduler.run([(query, t) for t in missing.values()])
+            fresh = dict(zip(missing.keys(), (float(s) for s in raw_scores)))
+            for k, s in fresh.items():
+                score_cache.put(k, s)
+            scores_list = [fresh[k] if s is None else s for k, s in zip(keys, scores_list)]
+        t2 = time.perf_counter()
+
+        stage_ms = {"prefilter_ms": (t1 - t0) * 1000, "cross_encoder_ms": (t2 - t1) * 1000}
+        _stage_stats["calls"] += 1
+        _stage_stats["candidates"] += n_in
+        _stage_stats["prefiltered_out"] += n_in - len(candidates)
+        _stage_stats["pairs_scored"] += len(missing)
+        for name, ms in stage_ms.items():
+            _stage_stats[name] += ms
+        if timings is not None:
+            timings.update(stage_ms, candidates=n_in, cross_encoded=len(missing))
 
         # Normalize and Assign
         for c, s in zip(candidates, scores_list):
@@ -0,0 +1,184 @@
+"""
+Scrape Engine — One long-lived event loop and pooled HTTP client for scraping.
+
+WebSearchTool.scrape_urls used to call asyncio.run() per call (spinning up a
+thread to do so when a loop was already running) and built a new
+httpx.AsyncClient each time, so every query paid fresh DNS lookups and TLS
+handshakes to the same legal sites.
+
+The engine is a daemon thread running its own event loop. That loop owns one
+httpx.AsyncClient (HTTP/2 when `h2` is installed) whose keep-alive pool is
+reused by every scrape, so lookups and handshakes happen once per pooled
+connection rather than once per query. SCRAPE_MAX_PER_HOST caps concurrent
+requests to a single host.
+
+fetch_html() streams a page instead of buffering it: non-HTML content types
+are dropped after the headers, and bodies stop at SCRAPE_MAX_BYTES so a
+multi-megabyte judgment cannot balloon the worker.
+
+Usage (from any thread, with or without a running loop):
+    engine = get_scrape_engine()
+    resp = engine.run(engine.get(url))            # blocking
+    fut = engine.submit(some_coroutine())         # concurrent.futures.Future
+"""
+
+import asyncio
+import logging
+import threading
+from concurrent.futures import Future
+from typing import Any, Coroutine, Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+import httpx
+
+from lex_bot.config import (
+    SCRAPE_MAX_CONNECTIONS, SCRAPE_MAX_KEEPALIVE, SCRAPE_KEEPALIVE_EXPIRY,
+    SCRAPE_MAX_PER_HOST, SCRAPE_TIMEOUT_SECONDS, SCRAPE_MAX_BYTES, SCRAPE_CONTENT_TYPES,
+)
+
+logger = logging.getLogger(__name__)
+
+try:
+    import h2  # noqa: F401 - httpx enables HTTP/2 only when h2 is importable
+    HAS_HTTP2 = True
+except ImportError:
+    HAS_HTTP2 = False
+
+USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36"
+
+
+class ScrapeEngine:
+    """Background event loop thread owning a pooled, keep-alive HTTP client."""
+
+    def __init__(self):
+        self._loop = asyncio.new_event_loop()
+        self._client: Optional[httpx.AsyncClient] = None
+        self._host_slots: Dict[str, asyncio.Semaphore] = {}  # only touched on the engine loop
+        self._started = threading.Event()
+        self.requests = 0
+        self.errors = 0
+        self.truncated = 0
+        self.skipped_type = 0
+        self._thread = threading.Thread(target=self._run, name="scrape-engine", daemon=True)
+        self._thread.start()
+        self._started.wait()
+
+    def _run(self):
+        asyncio.set_event_loop(self._loop)
+        self._client = httpx.AsyncClient(
+            http2=HAS_HTTP2,
+            limits=httpx.Limits(
+                max_connections=SCRAPE_MAX_CONNECTIONS,
+                max_keepalive_connections=SCRAPE_MAX_KEEPALIVE,
+                keepalive_expiry=SCRAPE_KEEPALIVE_EXPIRY,
+            ),
+            timeout=httpx.Timeout(SCRAPE_TIMEOUT_SECONDS),
+            follow_redirects=True,
+            headers={"User-Agent": USER_AGENT},
+        )
+        logger.info(f"Scrape engine started (http2={HAS_HTTP2}, max_connections={SCRAPE_MAX_CONNECTIONS})")
+        self._started.set()
+        self._loop.run_forever()
+
+    # ---------- thread-safe API ----------
+
+    def submit(self, coro: Coroutine) -> Future:
+        """Schedule a coroutine on the engine loop; safe to call from any thread."""
+        return asyncio.run_coroutine_threadsafe(coro, self._loop)
+
+    def run(self, coro: Coroutine, timeout: Optional[float] = None) -> Any:
+        """Run a coroutine on the engine loop and block the calling thread for its result."""
+        if threading.current_thread() is self._thread:
+            coro.close()
+            raise RuntimeError("ScrapeEngine.run() called from the engine loop; await the coroutine instead")
+        return self.submit(coro).result(timeout)
+
+    async def wrap(self, coro: Coroutine) -> Any:
+        """Await a coroutine on the engine loop from a different event loop (e.g. FastAPI's)."""
+        return await asyncio.wrap_future(self.submit(coro))
+
+    # ---------- coroutines (run on the engine loop) ----------
+
+    def _host_slot(self, url: str) -> asyncio.Semaphore:
+        host = urlsplit(url).hostname or ""
+        slot = self._host_slots.get(host)
+        if slot is None:
+            slot = self._host_slots[host] = asyncio.Semaphore(SCRAPE_MAX_PER_HOST)
+        return slot
+
+    async def get(self, url: str, **kwargs) -> httpx.Response:
+        async with self._host_slot(url):
+            self.requests += 1
+            try:
+                return await self._client.get(url, **kwargs)
+            except Exception:
+                self.errors += 1
+                raise
+
+    async def fetch_html(self, url: str, max_bytes: int = SCRAPE_MAX_BYTES,
+                         content_types: List[str] = SCRAPE_CONTENT_TYPES) -> Optional[Tuple[str, bytes]]:
+        """
+        Stream a page and return (decoded text, raw bytes), or None for a non-200
+        response or a content type outside `content_types`. The body is cut off
+        at `max_bytes`; the partial page is still returned.
+        """
+        async with self._host_slot(url):
+            self.requests += 1
+            try:
+                async with self._client.stream("GET", url) as resp:
+                    if resp.status_code != 200:
+                        return None
+                    ctype = resp.headers.get("content-type", "").split(";")[0].strip().lower()
+                    if ctype and content_types and ctype not in content_types:
+                        self.skipped_type += 1
+                        logger.info(f"Skipping {url[:80]}: content-type {ctype}")
+                        return None
+                    chunks, size = [], 0
+                    async for chunk in resp.aiter_bytes():
+                        chunks.append(chunk)
+                        size += len(chunk)
+                        if size >= max_bytes:
+                            self.truncated += 1
+                            logger.info(f"Truncated {url[:80]} at {max_bytes} bytes")
+                            break
+                    raw = b"".join(chunks)[:max_bytes]
+                    return raw.decode(resp.encoding or "utf-8", errors="replace"), raw
+            except Exception:
+                self.errors += 1
+                raise
+
+    def close(self):
+        if self._loop.is_closed():
+            return
+        if self._client is not None:
+            self.run(self._client.aclose())
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join(timeout=5)
+        self._loop.close()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "http2": HAS_HTTP2,
+            "requests": self.requests,
+            "errors": self.errors,
+            "truncated": self.truncated,
+            "skipped_type": self.skipped_type,
+            "hosts": len(self._host_slots),
+            "max_connections": SCRAPE_MAX_CONNECTIONS,
+            "max_per_host": SCRAPE_MAX_PER_HOST,
+            "max_bytes": SCRAPE_MAX_BYTES,
+        }
+
+
+_engine: Optional[ScrapeEngine] = None
+_engine_lock = threading.Lock()
+
+
+def get_scrape_engine() -> ScrapeEngine:
+    """Process-wide ScrapeEngine, started on first use."""
+    global _engine
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                _engine = ScrapeEngine()
+    return _engine
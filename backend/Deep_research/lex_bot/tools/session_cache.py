@@ -143,9 +143,8 @@ class SessionCache:
         
         # Generate embeddings and add to index
         try:
-            from lex_bot.core.embeddings import _inference_lock
-            with _inference_lock:
-                embeddings = model.encode(new_texts, normalize_embeddings=True)
+            from lex_bot.core.embeddings import encode_texts
+            embeddings = encode_texts(new_texts)
             session["index"].add(np.array(embeddings, dtype=np.float32))
             session["documents"].extend(new_docs)
             logger.info(f"Added {added_count} documents to session {session_id}")
@@ -183,12 +182,11 @@ class SessionCache:
             return []
         
         # Encode query
-        from lex_bot.core.embeddings import get_embedding_model
-        model = get_embedding_model()
-        if not model:
+        from lex_bot.core.embeddings import get_embedding_model, encode_texts
+        if not get_embedding_model():
             return []
             
-        query_embedding = model.encode([query], normalize_embeddings=True)
+        query_embedding = encode_texts([query])
         
         # Search
         k = min(top_k, len(session["documents"]))
@@ -1,16 +1,22 @@
 import logging
+import hashlib
 import requests
 import asyncio
-import httpx
-from concurrent.futures import ThreadPoolExecutor, as_completed
 from typing import List, Dict, Tuple, Optional
-import trafilatura
+from urllib.parse import urlsplit
 from tavily import TavilyClient
 from ddgs import DDGS
 from lex_bot.config import (
     TAVILY_API_KEY, SERPER_API_KEY, GOOGLE_SERP_API_KEY,
-    FIRECRAWL_API_KEY, WEB_SEARCH_MAX_RESULTS, PREFERRED_DOMAINS
+    FIRECRAWL_API_KEY, WEB_SEARCH_MAX_RESULTS, PREFERRED_DOMAINS, WEB_CACHE_TTL_SECONDS,
+    WEB_SEARCH_DEADLINE_SECONDS, WEB_SEARCH_MIN_URLS, WEB_SEARCH_FANOUT, WEB_SEARCH_HEDGE_FLOOR_SECONDS,
+    WEB_SEARCH_PRIMARY,
+    SCRAPE_SKIP_DOMAINS,
 )
+from lex_bot.core.web_cache import get_web_cache, canonical_url
+from lex_bot.tools.scrape_engine import get_scrape_engine
+from lex_bot.tools.extraction import extract_async
+from lex_bot.tools.provider_scheduler import ProviderScheduler
 
 # Configure logging
 logger = logging.getLogger(__name__)
@@ -28,13 +34,23 @@ class WebSearchTool:
             except:
                 logger.warning("Could not initialize Firecrawl.")
                 
-        import threading
-        self._search_lock = threading.Lock()
-        self._search_cache = {}
-        self._scrape_lock = threading.Lock()
-        self._scrape_cache = {}
+        # Shared across workers/services (see core/web_cache.py); "scrape" entries are also used by Enhance_bot
+        self._search_cache = get_web_cache("lexbot_search", ttl=WEB_CACHE_TTL_SECONDS)
+        self._scrape_cache = get_web_cache("scrape", ttl=WEB_CACHE_TTL_SECONDS)  # keyed by canonical_url()
+        self._extract_cache = get_web_cache("extract", ttl=WEB_CACHE_TTL_SECONDS)  # keyed by sha256 of the HTML
 
-    def _ddgs_search(self, query: str, max_results: int, domains: List[str] = None) -> List[Dict]:
+        # Providers with credentials, in default order; the scheduler reorders them by observed latency/errors
+        providers = {"DuckDuckGo": self._ddgs_search}
+        if self.tavily_client:
+            providers["Tavily"] = self._tavily_search
+        if self.serper_key:
+            providers["Serper"] = self._serper_search
+        if self.google_serp_key:
+            providers["Google SERP"] = self._google_serp_search
+        self.scheduler = ProviderScheduler(providers, hedge_floor_s=WEB_SEARCH_HEDGE_FLOOR_SECONDS,
+                                           primary=WEB_SEARCH_PRIMARY)
+
+    def _ddgs_search(self, query: str, max_results: int, domains: List[str] = None, timeout: float = 10) -> List[Dict]:
         try:
             target_domains = domains if domains else PREFERRED_DOMAINS
             # Create site: operators
@@ -42,7 +58,7 @@ class WebSearchTool:
             full_query = f"{query} ({domain_filter})"
             
             res = []
-            with DDGS(timeout=10) as ddgs:
+            with DDGS(timeout=max(1, int(timeout))) as ddgs:
                 results = ddgs.text(full_query, max_results=max_results)
                 for r in results:
                     res.append({
@@ -55,7 +71,7 @@ class WebSearchTool:
             logger.error(f"DDG Failed: {e}")
             return []
 
-    def _tavily_search(self, query: str, max_results: int, domains: List[str] = None) -> List[Dict]:
+    def _tavily_search(self, query: str, max_results: int, domains: List[str] = None, timeout: float = 10) -> List[Dict]:
         if not self.tavily_client:
             return []
         try:
@@ -72,7 +88,8 @@ class WebSearchTool:
                 search_depth="advanced",
                 max_results=max_results,
                 include_domains=target_domains,
-                include_raw_content=True
+                include_raw_content=True,
+                timeout=max(1, int(timeout)),
             )
             res = []
             for r in response.get('results', []):
@@ -88,7 +105,7 @@ class WebSearchTool:
             logger.error(f"Tavily Failed: {e}")
             return []
 
-    def _serper_search(self, query: str, max_results: int, domains: List[str] = None) -> List[Dict]:
+    def _serper_search(self, query: str, max_results: int, domains: List[str] = None, timeout: float = 10) -> List[Dict]:
         """Serper.dev search fallback"""
         if not self.serper_key:
             return []
@@ -105,7 +122,7 @@ class WebSearchTool:
                 "https://google.serper.dev/search",
                 headers=headers,
                 json=payload,
-                timeout=10
+                timeout=timeout
             )
             response.raise_for_status()
             data = response.json()
@@ -122,7 +139,7 @@ class WebSearchTool:
             logger.error(f"Serper Failed: {e}")
             return []
 
-    def _google_serp_search(self, query: str, max_results: int, domains: List[str] = None) -> List[Dict]:
+    def _google_serp_search(self, query: str, max_results: int, domains: List[str] = None, timeout: float = 10) -> List[Dict]:
         """Google SERP API fallback (SerpAPI or similar)"""
         if not self.google_serp_key:
             return []
@@ -137,7 +154,7 @@ class WebSearchTool:
             response = requests.get(
                 "https://serpapi.com/search",
                 params=params,
-                timeout=10
+                timeout=timeout
             )
             response.raise_for_status()
             data = response.json()
@@ -154,45 +171,38 @@ class WebSearchTool:
             logger.error(f"Google SERP Failed: {e}")
             return []
 
-    async def _async_scrape_single(self, url: str, client: httpx.AsyncClient) -> str:
-        """Scrape a single URL concurrently with caching."""
-        import time
-        from lex_bot.config import WEB_CACHE_TTL_SECONDS
-        
+    async def _async_scrape_single(self, url: str) -> str:
+        """Scrape a single URL concurrently with caching (runs on the scrape engine loop)."""
         # --- SCRAPE CACHE ---
-        cache_key = url.strip().lower()
-        with self._scrape_lock:
-            if cache_key in self._scrape_cache:
-                timestamp, cached_content = self._scrape_cache[cache_key]
-                if time.time() - timestamp < WEB_CACHE_TTL_SECONDS:
-                    logger.info(f"⚡ Scrape Cache HIT: {url[:50]}...")
-                    return cached_content
-                else:
-                    del self._scrape_cache[cache_key]
+        cache_key = canonical_url(url)
+        cached_content = await self._scrape_cache.aget(cache_key)
+        if cached_content:
+            logger.info(f"⚡ Scrape Cache HIT: {url[:50]}...")
+            return cached_content
         # --------------------
         
         content = ""
-        html_content = ""
+        page = None
         
-        # 1. Download HTML using async HTTPX client
+        # 1. Stream HTML over the engine's pooled client (byte-capped, HTML content types only)
         try:
-            headers = {"User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36"}
-            resp = await client.get(url, headers=headers, timeout=10.0, follow_redirects=True)
-            if resp.status_code == 200:
-                html_content = resp.text
+            page = await get_scrape_engine().fetch_html(url)
         except Exception as e:
             logger.error(f"Async download failed for {url}: {e}")
             
-        # 2. Extract using CPU-bound parser in a thread to prevent blocking
-        if html_content:
-            try:
-                extracted_text = await asyncio.to_thread(
-                    trafilatura.extract, html_content, favor_precision=True
-                )
-                if extracted_text:
-                    content = f"\n\n{extracted_text}\n\n"
-            except Exception as e:
-                logger.error(f"Parsing failed for {url}: {e}")
+        # 2. Extract in the process pool; identical bodies behind different URLs are parsed once
+        if page:
+            html_content, raw = page
+            content_key = hashlib.sha256(raw).hexdigest()
+            extracted_text = await self._extract_cache.aget(content_key)
+            if extracted_text is None:
+                try:
+                    extracted_text = await extract_async(html_content) or ""
+                    await self._extract_cache.aset(content_key, extracted_text)
+                except Exception as e:
+                    logger.error(f"Parsing failed for {url}: {e}")
+            if extracted_text:
+                content = f"\n\n{extracted_text}\n\n"
         
         # 3. Firecrawl Fallback
         if not content and self.firecrawl:
@@ -209,105 +219,61 @@ class WebSearchTool:
         
         # --- SAVE TO CACHE ---
         if content:
-            with self._scrape_lock:
-                self._scrape_cache[cache_key] = (time.time(), content)
+            await self._scrape_cache.aset(cache_key, content)
         
         return content
 
     async def _async_scrape_urls(self, urls: List[str]) -> str:
-        limits = httpx.Limits(max_keepalive_connections=5, max_connections=10)
-        async with httpx.AsyncClient(limits=limits, follow_redirects=True, timeout=10.0) as client:
-            tasks = [self._async_scrape_single(u, client) for u in set(urls) if u]
-            results = await asyncio.gather(*tasks)
-            return "".join(results)
+        # One scrape per canonical URL (http/https, www., tracking params collapse together)
+        by_key = {}
+        for u in urls:
+            if u:
+                by_key.setdefault(canonical_url(u), u)
+        results = await asyncio.gather(*[self._async_scrape_single(u) for u in by_key.values()])
+        return "".join(results)
 
     def scrape_urls(self, urls: List[str]) -> str:
+        """Blocking scrape; safe from any thread, including ones with a running event loop."""
         if not urls:
             return ""
-        try:
-            return asyncio.run(self._async_scrape_urls(urls))
-        except RuntimeError:
-            loop = asyncio.get_event_loop()
-            if loop.is_running():
-                from concurrent.futures import ThreadPoolExecutor
-                with ThreadPoolExecutor(max_workers=1) as executor:
-                    return executor.submit(asyncio.run, self._async_scrape_urls(urls)).result()
-            else:
-                return loop.run_until_complete(self._async_scrape_urls(urls))
+        return get_scrape_engine().run(self._async_scrape_urls(urls))
+
+    async def ascrape_urls(self, urls: List[str]) -> str:
+        """Awaitable scrape for async callers; the work still runs on the engine loop."""
+        if not urls:
+            return ""
+        engine = get_scrape_engine()
+        return await engine.wrap(self._async_scrape_urls(urls))
+
+    @staticmethod
+    def _skip_domain(url: str) -> bool:
+        host = (urlsplit(url).hostname or "").lower()
+        return any(host == d or host.endswith("." + d) for d in SCRAPE_SKIP_DOMAINS)
 
     def run(self, query: str, domains: List[str] = None) -> Tuple[str, List[Dict]]:
         """
         Executes "Omni-Search" Strategy with Caching:
         1. Check Cache first.
-        2. If miss, run Omni-Search (DDG + Tavily -> Fallbacks).
+        2. If miss, run hedged provider search (tools/provider_scheduler.py).
         3. Save to Cache.
         """
-        import time
-        from lex_bot.config import WEB_CACHE_TTL_SECONDS
-
         # --- CACHE LOOKUP ---
         cache_key = f"{query.strip().lower()}:{','.join(sorted(domains)) if domains else 'all'}"
         
-        with self._search_lock:
-            if cache_key in self._search_cache:
-                timestamp, cached_context, cached_results = self._search_cache[cache_key]
-                if time.time() - timestamp < WEB_CACHE_TTL_SECONDS:
-                    logger.info(f"⚡ Cache HIT for query: '{query}'")
-                    return cached_context, cached_results
-                else:
-                    del self._search_cache[cache_key]
+        cached = self._search_cache.get(cache_key)
+        if cached:
+            logger.info(f"⚡ Cache HIT for query: '{query}'")
+            cached_context, cached_results = cached
+            return cached_context, cached_results
         # --------------------
 
-        all_results = []
-        
-        # Parallel Execution of Primary Providers
-        with ThreadPoolExecutor(max_workers=2) as executor:
-            future_ddg = executor.submit(self._ddgs_search, query, WEB_SEARCH_MAX_RESULTS, domains)
-            
-            # Only run Tavily if key exists
-            future_tavily = None
-            if self.tavily_client:
-                future_tavily = executor.submit(self._tavily_search, query, WEB_SEARCH_MAX_RESULTS, domains)
-            
-            # Collect DDG
-            try:
-                ddg_res = future_ddg.result()
-                if ddg_res:
-                    # Mark source
-                    for r in ddg_res: r['source'] = 'DuckDuckGo'
-                    all_results.extend(ddg_res)
-            except Exception as e:
-                logger.error(f"DDG Parallel Failed: {e}")
-
-            # Collect Tavily
-            if future_tavily:
-                try:
-                    tav_res = future_tavily.result()
-                    if tav_res:
-                        # Mark source
-                        for r in tav_res: r['source'] = 'Tavily'
-                        all_results.extend(tav_res)
-                except Exception as e:
-                    logger.error(f"Tavily Parallel Failed: {e}")
-
-        # Deduplicate by URL
-        seen_urls = set()
-        unique_results = []
-        for r in all_results:
-            u = r.get('url')
-            if u and u not in seen_urls:
-                seen_urls.add(u)
-                unique_results.append(r)
-        
-        # Fallback Chain (if parallel search completely failed)
+        # Hedged fan-out: fastest provider first, backups launched past its p90, stop at enough URLs
+        unique_results = self.scheduler.search(
+            query, WEB_SEARCH_MAX_RESULTS, domains,
+            deadline_s=WEB_SEARCH_DEADLINE_SECONDS, min_urls=WEB_SEARCH_MIN_URLS, fanout=WEB_SEARCH_FANOUT,
+        )
         if not unique_results:
-            print("⚠️ Primary parallel search failed. Engaging fallbacks...")
-            # Try Serper
-            results = self._serper_search(query, WEB_SEARCH_MAX_RESULTS, domains)
-            if not results:
-                # Try Google SERP
-                results = self._google_serp_search(query, WEB_SEARCH_MAX_RESULTS, domains)
-            unique_results = results
+            logger.warning("⚠️ All web search providers failed or timed out.")
 
         # === Smart Scraping (Step 9a): Tavily-first, scrape-only-if-insufficient ===
         # Classify results by content richness
@@ -331,18 +297,28 @@ class WebSearchTool:
         # Build context from rich results first (no scraping needed)
         rich_context = "\n\n".join([r.get('text', r.get('snippet', '')) for r in rich_results])
         
+        # Full page text from Tavily raw_content is stored as that page's scrape, so a later thin
+        # hit for the same page (from any provider or service) never downloads or parses it
+        covered = set()
+        for r in rich_results:
+            if r.get('url') and r.get('source') == "Tavily":
+                covered.add(canonical_url(r['url']))
+                self._scrape_cache.set(canonical_url(r['url']), f"\n\n{r['text']}\n\n")
+        
         # Scrape ONLY thin results that need more content (preserves fallback scraping)
         scraped_context = ""
         if thin_results:
-            scrape_urls = [r['url'] for r in thin_results if r.get('url')][:5]  # Max 5 thin URLs
+            scrape_urls = [
+                r['url'] for r in thin_results
+                if r.get('url') and canonical_url(r['url']) not in covered and not self._skip_domain(r['url'])
+            ][:5]  # Max 5 thin URLs
             if scrape_urls:
                 scraped_context = self.scrape_urls(scrape_urls)
         
         full_context = rich_context + scraped_context
         
         # --- SAVE TO CACHE ---
-        with self._search_lock:
-            self._search_cache[cache_key] = (time.time(), full_context, unique_results)
+        self._search_cache.set(cache_key, [full_context, unique_results])
         
         return full_context, unique_results
 
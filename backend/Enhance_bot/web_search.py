@@ -20,6 +20,14 @@ PREFERRED_DOMAINS = [d.strip() for d in PREFERRED_DOMAINS_STR.split(",") if d.st
 # Configure logging
 logger = logging.getLogger(__name__)
 
+try:
+    # Same cache lex_bot uses; importable in the main image (PYTHONPATH=/app), not in the standalone one
+    from backend.Deep_research.lex_bot.core.web_cache import get_web_cache, canonical_url
+    HAS_WEB_CACHE = True
+except ImportError:
+    HAS_WEB_CACHE = False
+    logger.warning("Shared web cache not importable; web search results will not be cached")
+
 class WebSearchTool:
     def __init__(self):
         self.tavily_client = TavilyClient(api_key=TAVILY_API_KEY) if TAVILY_API_KEY else None
@@ -31,6 +39,10 @@ class WebSearchTool:
             except:
                 logger.warning("Could not initialize Firecrawl.")
 
+        # Scraped pages are shared with lex_bot ("scrape"); search results depend on this tool's strategy
+        self._search_cache = get_web_cache("enhance_search") if HAS_WEB_CACHE else None
+        self._scrape_cache = get_web_cache("scrape") if HAS_WEB_CACHE else None
+
     def _ddgs_search(self, query: str, max_results: int, domains: List[str] = None) -> List[Dict]:
         try:
             target_domains = domains if domains else PREFERRED_DOMAINS
@@ -83,6 +95,18 @@ class WebSearchTool:
             return []
 
     def _scrape_single(self, url: str) -> str:
+        if not self._scrape_cache:
+            return self._fetch_and_extract(url)
+        cache_key = canonical_url(url)  # same key lex_bot uses for the shared "scrape" namespace
+        cached = self._scrape_cache.get(cache_key)
+        if cached:
+            return cached
+        content = self._fetch_and_extract(url)
+        if content:
+            self._scrape_cache.set(cache_key, content)
+        return content
+
+    def _fetch_and_extract(self, url: str) -> str:
         # 1. Trafilatura
         try:
             downloaded = trafilatura.fetch_url(url)
@@ -125,6 +149,13 @@ class WebSearchTool:
         2. If DDG empty -> Tavily
         3. Scrape URLs -> Context
         """
+        cache_key = f"{query.strip().lower()}:{','.join(sorted(domains)) if domains else 'all'}"
+        if self._search_cache:
+            cached = self._search_cache.get(cache_key)
+            if cached:
+                cached_context, cached_results = cached
+                return cached_context, cached_results
+
         results = self._ddgs_search(query, WEB_SEARCH_MAX_RESULTS, domains)
         
         if not results:
@@ -136,6 +167,9 @@ class WebSearchTool:
         
         # Scrape
         full_context = self.scrape_urls(urls)
+
+        if self._search_cache and (full_context or results):
+            self._search_cache.set(cache_key, [full_context, results])
         
         return full_context, results
 
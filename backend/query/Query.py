@@ -1,9 +1,8 @@
 from fastapi import FastAPI, HTTPException
-from fastapi.responses import HTMLResponse
+from fastapi.responses import HTMLResponse, Response
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
 from typing import Optional, List
-from main_file import s3_client
 import os
 import sys
 from pathlib import Path
@@ -13,17 +12,28 @@ from parse_s3_uri import parse_s3_uri
 load_dotenv()
 
 from QueryParsing import normalize_query
-from main_file import get_best_template, download_from_s3
+from main_file import get_best_template_async, download_from_s3, embedding_stats, result_cache, template_cache
 
 from contextlib import asynccontextmanager
 import sql
+import metrics
+import ann_index
+
+metrics.register_stats("db_async_pool", sql.async_pool_stats,
+                       counters=("requests_num", "requests_queued", "requests_wait_ms", "requests_errors"))
+metrics.register_stats("template_index", sql.template_index_stats,
+                       counters=("served", "refreshes", "refresh_errors"))
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    # Startup: Start tunnel and connection pool
+    # Startup: Start tunnel and connection pools
     sql.start_tunnel_and_pool()
+    await sql.start_async_pool()
+    sql.start_template_index()
     yield
-    # Shutdown: Stop tunnel and connection pool
+    # Shutdown: Stop connection pools and tunnel
+    sql.stop_template_index()
+    await sql.stop_async_pool()
     sql.stop_tunnel_and_pool()
 
 app = FastAPI(title="Legal Query Service", lifespan=lifespan)
@@ -95,6 +105,52 @@ async def diagnostics():
             "traceback": traceback.format_exc()
        }
 
+@app.get("/diag/pool")
+async def pool_diagnostics():
+    """Connection pool metrics: size, availability, acquire wait and queue depth."""
+    return {
+        "async_driver": sql.HAS_ASYNC_DRIVER,
+        "async_pool": sql.async_pool_stats(),
+        "threaded_pool_max": int(os.getenv("DB_POOL_SIZE", 5)) if sql.connection_pool else 0,
+    }
+
+@app.get("/diag/embeddings")
+async def embedding_diagnostics():
+    """Query-embedding cache hit/miss counters and encode batch sizes."""
+    return embedding_stats()
+
+@app.get("/diag/cache")
+async def cache_diagnostics():
+    """Search result cache, S3 template cache and in-process template index."""
+    return {
+        "results": result_cache.stats(),
+        "templates": template_cache.stats(),
+        "template_index": sql.template_index_stats(),
+    }
+
+@app.get("/diag/ann")
+async def ann_diagnostics():
+    """EXPLAIN self-check: does the vector search use the ANN index?"""
+    def _check():
+        conn = sql.get_db_connection()
+        try:
+            return ann_index.check_index_usage(conn)
+        finally:
+            sql.release_db_connection(conn)
+    try:
+        report = await asyncio.to_thread(_check)
+    except Exception as e:
+        return {"ok": False, "error": str(e)}
+    report["ef_search"] = ann_index.HNSW_EF_SEARCH
+    report["ivfflat_probes"] = ann_index.IVFFLAT_PROBES
+    return report
+
+@app.get("/metrics")
+async def prometheus_metrics():
+    """Prometheus scrape endpoint: stage latency histograms, pool wait, search paths, cache gauges."""
+    body, content_type = metrics.render_latest()
+    return Response(content=body, media_type=content_type)
+
 # ==================== Main Query Endpoints ====================
 
 from fastapi.responses import StreamingResponse
@@ -111,12 +167,8 @@ async def search_template(request: QueryRequest):
         try:
             print(f"[search] query: {request.user_query} | lang: {request.language}")
             
-            # Run search in background thread
-            loop = asyncio.get_running_loop()
-            future = loop.run_in_executor(
-                None,
-                lambda: get_best_template(request.user_query)
-            )
+            # Run search as a task on the event loop (async DB pool, no executor slot held)
+            future = asyncio.create_task(get_best_template_async(request.user_query))
             
             # Send keep-alive whitespace every 2 seconds
             while not future.done():
@@ -144,6 +196,12 @@ async def search_template(request: QueryRequest):
             else:
                 yield json.dumps(result)
                 
+        except sql.PoolSaturated as e:
+            print(f"[search] database busy: {e}")
+            yield json.dumps({"error": "Search is busy, please retry", "retryable": True, "alternatives": []})
+        except sql.SearchUnavailable as e:
+            print(f"[search] database unavailable: {e}")
+            yield json.dumps({"error": "Search is temporarily unavailable, please retry", "retryable": True, "alternatives": []})
         except Exception as e:
             print(f"[search] error: {e}\n{traceback.format_exc()}")
             yield json.dumps({"error": str(e)})
@@ -172,7 +230,7 @@ async def download_template(request: BaseModel):
             raise HTTPException(status_code=400, detail="s3_path required")
         
         print(f"[download-template] s3_path: {s3_path}")
-        local_path = download_from_s3(s3_path)
+        local_path = await asyncio.to_thread(download_from_s3, s3_path)
         
         return {
             "ok": True,
@@ -186,6 +244,14 @@ async def download_template(request: BaseModel):
         print(f"[download-template] error: {e}\n{traceback.format_exc()}")
         raise HTTPException(status_code=500, detail=f"Download error: {str(e)}")
 
+def _iter_file(f, chunk_size=64 * 1024):
+    try:
+        while chunk := f.read(chunk_size):
+            yield chunk
+    finally:
+        f.close()
+
+
 @app.post("/download-template-html", response_class=HTMLResponse)
 async def download_template_html(payload: dict):
     s3_path = payload.get("s3_path")
@@ -194,16 +260,15 @@ async def download_template_html(payload: dict):
 
     try:
         bucket, key = parse_s3_uri(s3_path)
-        obj = s3_client.get_object(Bucket=bucket, Key=key)
-
-        # Read the raw bytes
-        html_bytes = obj["Body"].read()
-
-        # Decode to UTF-8 text (HTML)
-        html_text = html_bytes.decode("utf-8", errors="replace")
-
-        # Return raw HTML to frontend
-        return HTMLResponse(content=html_text)
+        # Local cached copy (revalidated against S3 with If-None-Match), streamed from disk
+        local_path = await asyncio.to_thread(template_cache.fetch, bucket, key)
+        # Open before responding: if LRU eviction unlinks the file mid-stream the open handle stays readable
+        f = await asyncio.to_thread(open, local_path, "rb")
+        return StreamingResponse(
+            _iter_file(f),
+            media_type="text/html; charset=utf-8",
+            headers={"Content-Length": str(os.fstat(f.fileno()).st_size)},
+        )
 
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
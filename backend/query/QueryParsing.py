@@ -4,21 +4,30 @@ import json, os, re
 from dotenv import load_dotenv
 load_dotenv()
 
+from keyword_extractor import KeywordExtractor
+
 genai.configure(api_key=os.getenv("GOOGLE_API_KEY"))
 model = GenerativeModel("gemini-2.5-flash")
 
+# "auto": local extractor, Gemini only below LOCAL_PARSE_CONFIDENCE
+# "local": never call Gemini   "gemini": always call Gemini
+QUERY_PARSER = os.getenv("QUERY_PARSER", "auto").lower()
+LOCAL_PARSE_CONFIDENCE = float(os.getenv("LOCAL_PARSE_CONFIDENCE", 0.6))
+
+extractor = KeywordExtractor.load()
+
 def local_normalize_query(user_query: str):
-    """Fallback local extraction if Gemini is unavailable/slow."""
-    # Basic stop words to remove for keyword extraction
-    stop_words = {"find", "me", "a", "an", "the", "contract", "related", "to", "in", "india", "request", "need", "document", "agreement"}
-    words = re.findall(r'\w+', user_query.lower())
-    keywords = [w for w in words if w not in stop_words and len(w) > 2]
-    return {
-        "search_terms": keywords,
-        "language": "en"
-    }
+    """Offline keyword extraction (stopwords + mined phrases + BM25); see keyword_extractor.py."""
+    return extractor.extract(user_query)
 
 def normalize_query(user_query: str):
+    if QUERY_PARSER != "gemini":
+        local = local_normalize_query(user_query)
+        if QUERY_PARSER == "local" or (local["search_terms"] and local["confidence"] >= LOCAL_PARSE_CONFIDENCE):
+            return local
+    return gemini_normalize_query(user_query)
+
+def gemini_normalize_query(user_query: str):
     prompt = f"""
 Convert this Indian legal drafting request into a structured search hint JSON.
 
@@ -0,0 +1,188 @@
+"""
+ann_index.py - Vector (ANN) index management for documents.embedding.
+
+- Builds HNSW (m, ef_construction) or IVFFlat (lists) indexes with explicit settings
+- Rebuilds without blocking searches: CREATE INDEX CONCURRENTLY under a temp name, then swap
+- Query-time knobs (hnsw.ef_search, ivfflat.probes) as connection options or per transaction
+- EXPLAIN self-check that the vector search actually uses the index
+
+    python ann_index.py --show
+    python ann_index.py --build hnsw --m 16 --ef-construction 64
+    python ann_index.py --build ivfflat --lists 300
+    python ann_index.py --check
+"""
+import os
+import json
+import math
+import logging
+import argparse
+
+logger = logging.getLogger(__name__)
+
+INDEX_NAME = "idx_docs_embedding"
+ANN_INDEX_TYPE = os.getenv("ANN_INDEX_TYPE", "hnsw").lower()
+HNSW_M = int(os.getenv("HNSW_M", 16))
+HNSW_EF_CONSTRUCTION = int(os.getenv("HNSW_EF_CONSTRUCTION", 64))
+# Candidate list size per search; must be >= the vector LIMIT (25) to return a full page
+HNSW_EF_SEARCH = int(os.getenv("HNSW_EF_SEARCH", 40))
+IVFFLAT_LISTS = int(os.getenv("IVFFLAT_LISTS", 0))  # 0 = derive from row count
+IVFFLAT_PROBES = int(os.getenv("IVFFLAT_PROBES", 10))
+# Raised for the duration of a build only
+INDEX_BUILD_MAINTENANCE_WORK_MEM = os.getenv("INDEX_BUILD_MAINTENANCE_WORK_MEM", "512MB")
+
+# Same shape as sql.VECTOR_SEARCH_SQL: nearest-first so the planner can walk the index
+_EXPLAIN_SQL = """
+    EXPLAIN (FORMAT JSON)
+    SELECT doc_id FROM documents
+    ORDER BY embedding <=> %s::vector
+    LIMIT 25
+"""
+
+
+def connection_options():
+    """libpq -c options applying the default query-time ANN settings to every pooled connection."""
+    return f"-c hnsw.ef_search={HNSW_EF_SEARCH} -c ivfflat.probes={IVFFLAT_PROBES}"
+
+
+def ivfflat_lists(row_count):
+    """pgvector guidance: rows/1000 up to 1M rows, sqrt(rows) above."""
+    if IVFFLAT_LISTS:
+        return IVFFLAT_LISTS
+    if row_count <= 1_000_000:
+        return max(10, row_count // 1000)
+    return int(math.sqrt(row_count))
+
+
+def index_ddl(kind=ANN_INDEX_TYPE, name=INDEX_NAME, m=HNSW_M, ef_construction=HNSW_EF_CONSTRUCTION,
+              lists=None, concurrently=False, if_not_exists=False):
+    conc = "CONCURRENTLY " if concurrently else ""
+    ine = "IF NOT EXISTS " if if_not_exists else ""
+    if kind == "hnsw":
+        return (f"CREATE INDEX {conc}{ine}{name} ON documents USING hnsw (embedding vector_cosine_ops) "
+                f"WITH (m = {int(m)}, ef_construction = {int(ef_construction)})")
+    if kind == "ivfflat":
+        return (f"CREATE INDEX {conc}{ine}{name} ON documents USING ivfflat (embedding vector_cosine_ops) "
+                f"WITH (lists = {int(lists or IVFFLAT_LISTS or 100)})")
+    raise ValueError(f"Unknown ANN index type: {kind}")
+
+
+def ensure_index(cur):
+    """Create the configured index if none exists (used by backfill_embeddings.ensure_schema)."""
+    lists = None
+    if ANN_INDEX_TYPE == "ivfflat":
+        cur.execute("SELECT count(*) FROM documents WHERE embedding IS NOT NULL")
+        lists = ivfflat_lists(cur.fetchone()[0])
+    cur.execute(index_ddl(lists=lists, if_not_exists=True))
+
+
+def describe_index(cur):
+    """Current definition and size of the vector index, or None."""
+    cur.execute("""
+        SELECT indexdef, pg_size_pretty(pg_relation_size(format('%%I.%%I', schemaname, indexname)::regclass))
+        FROM pg_indexes WHERE tablename = 'documents' AND indexname = %s
+    """, (INDEX_NAME,))
+    row = cur.fetchone()
+    if not row:
+        return None
+    return {"name": INDEX_NAME, "definition": row[0], "size": row[1]}
+
+
+def build_index(conn, kind=ANN_INDEX_TYPE, m=HNSW_M, ef_construction=HNSW_EF_CONSTRUCTION, lists=None):
+    """
+    (Re)build the vector index with explicit parameters. The new index is built
+    CONCURRENTLY next to the old one and swapped in, so searches keep using the
+    old index until the new one is valid. Requires an autocommit connection.
+    """
+    conn.autocommit = True
+    tmp_name = f"{INDEX_NAME}_new"
+    with conn.cursor() as cur:
+        if kind == "ivfflat" and not lists:
+            cur.execute("SELECT count(*) FROM documents WHERE embedding IS NOT NULL")
+            lists = ivfflat_lists(cur.fetchone()[0])
+
+        cur.execute("SET maintenance_work_mem = %s", (INDEX_BUILD_MAINTENANCE_WORK_MEM,))
+        cur.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {tmp_name}")  # leftover from an aborted build
+        ddl = index_ddl(kind, tmp_name, m, ef_construction, lists, concurrently=True)
+        logger.info(f"Building ANN index: {ddl}")
+        cur.execute(ddl)
+
+        cur.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {INDEX_NAME}")
+        cur.execute(f"ALTER INDEX {tmp_name} RENAME TO {INDEX_NAME}")
+        cur.execute("ANALYZE documents")
+        return describe_index(cur)
+
+
+def _plan_nodes(node):
+    yield node
+    for child in node.get("Plans", []):
+        yield from _plan_nodes(child)
+
+
+def check_index_usage(conn, embedding=None):
+    """
+    EXPLAIN the vector search and report whether it scans the ANN index.
+    Uses a stored embedding as the probe vector when none is given.
+    On tiny tables the planner may legitimately prefer a sequential scan.
+    """
+    with conn.cursor() as cur:
+        if embedding is None:
+            cur.execute("SELECT embedding::text FROM documents WHERE embedding IS NOT NULL LIMIT 1")
+            row = cur.fetchone()
+            if not row:
+                return {"ok": False, "reason": "no embedded documents"}
+            embedding = row[0]
+        elif not isinstance(embedding, str):
+            embedding = "[" + ",".join(str(float(x)) for x in embedding) + "]"
+
+        cur.execute(_EXPLAIN_SQL, (embedding,))
+        plan = cur.fetchone()[0]
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        nodes = list(_plan_nodes(plan[0]["Plan"]))
+        index_scans = [n.get("Index Name") for n in nodes if n.get("Index Name")]
+
+        cur.execute("SELECT reltuples::bigint FROM pg_class WHERE relname = 'documents'")
+        est_rows = cur.fetchone()[0]
+        index = describe_index(cur)
+
+    result = {
+        "ok": INDEX_NAME in index_scans,
+        "index": index,
+        "node_types": [n["Node Type"] for n in nodes],
+        "estimated_rows": est_rows,
+    }
+    if not result["ok"]:
+        result["reason"] = "index missing" if index is None else "planner chose a sequential scan"
+    return result
+
+
+if __name__ == "__main__":
+    import psycopg2
+    from dotenv import load_dotenv
+
+    load_dotenv()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+
+    parser = argparse.ArgumentParser(description="Manage the documents.embedding ANN index")
+    parser.add_argument("--build", choices=["hnsw", "ivfflat"], help="(re)build the index with this method")
+    parser.add_argument("--m", type=int, default=HNSW_M)
+    parser.add_argument("--ef-construction", type=int, default=HNSW_EF_CONSTRUCTION)
+    parser.add_argument("--lists", type=int, default=None, help="IVFFlat lists (default: derived from row count)")
+    parser.add_argument("--check", action="store_true", help="EXPLAIN the vector search and verify index use")
+    parser.add_argument("--show", action="store_true", help="print the current index definition")
+    args = parser.parse_args()
+
+    conn = psycopg2.connect(os.getenv("POSTGRES_DSN"))
+    try:
+        if args.build:
+            print(json.dumps(build_index(conn, args.build, args.m, args.ef_construction, args.lists), indent=2))
+        if args.show or not (args.build or args.check):
+            with conn.cursor() as cur:
+                print(json.dumps(describe_index(cur), indent=2))
+        if args.check:
+            report = check_index_usage(conn)
+            print(json.dumps(report, indent=2))
+            if not report["ok"]:
+                raise SystemExit(1)
+    finally:
+        conn.close()
@@ -1,8 +1,23 @@
+"""
+backfill_embeddings.py - Ensure the vector schema and (re)compute document embeddings.
+
+Rows are read with keyset pagination on doc_id (never the whole table at once),
+encoded in batches (optionally on a multi-process pool), and written back with
+COPY into a temp staging table followed by a single UPDATE ... FROM per page.
+
+    python backfill_embeddings.py                 # only rows with embedding IS NULL
+    python backfill_embeddings.py --all           # re-embed everything (EMBED_MODEL changed)
+    python backfill_embeddings.py --workers 4 --batch-size 128 --page-size 2000
+"""
 import os
+import io
+import time
+import argparse
 import psycopg2
-from psycopg2.extras import execute_batch
-from sentence_transformers import SentenceTransformer
+from embedding_client import load_embedding_model
 from dotenv import load_dotenv, find_dotenv
+from result_cache import invalidate_result_cache
+from ann_index import ensure_index
 
 # Robust load
 env_file = find_dotenv()
@@ -11,70 +26,154 @@ if env_file:
 else:
     load_dotenv()
 
-# Force IPv4 if localhost is failing
-dsn = os.getenv("POSTGRES_DSN")
-if not dsn:
-    print( "Error: POSTGRES_DSN not found in .env")
-    exit(1)
 
-if "localhost" in dsn:
-    print(" 'localhost' found in DSN. Forcing '127.0.0.1' to avoid IPv6 issues.")
-    dsn = dsn.replace("localhost", "127.0.0.1")
+def get_dsn():
+    # Force IPv4 if localhost is failing
+    dsn = os.getenv("POSTGRES_DSN")
+    if not dsn:
+        print( "Error: POSTGRES_DSN not found in .env")
+        exit(1)
 
-print(f"Connecting to DB...")
-try:
-    conn = psycopg2.connect(dsn)
-    conn.autocommit = True
-    cur = conn.cursor()
+    if "localhost" in dsn:
+        print(" 'localhost' found in DSN. Forcing '127.0.0.1' to avoid IPv6 issues.")
+        dsn = dsn.replace("localhost", "127.0.0.1")
+    return dsn
 
-    # 1. Setup Schema
+
+def ensure_schema(cur):
     print("1. Ensuring Schema (Vector Extension & Columns)...")
     try:
         cur.execute("CREATE EXTENSION IF NOT EXISTS vector;")
         cur.execute("ALTER TABLE documents ADD COLUMN IF NOT EXISTS embedding vector(384);")
         cur.execute("""
-            ALTER TABLE documents 
-            ADD COLUMN IF NOT EXISTS search_vector tsvector 
+            ALTER TABLE documents
+            ADD COLUMN IF NOT EXISTS search_vector tsvector
             GENERATED ALWAYS AS (
                 to_tsvector('english', coalesce(canonical_title,'') || ' ' || coalesce(snippet,''))
             ) STORED;
         """)
-        cur.execute("CREATE INDEX IF NOT EXISTS idx_docs_embedding ON documents USING hnsw (embedding vector_cosine_ops);")
+        # HNSW/IVFFlat with explicit build parameters; rebuild with ann_index.py --build
+        ensure_index(cur)
         cur.execute("CREATE INDEX IF NOT EXISTS idx_docs_search_vector ON documents USING GIN (search_vector);")
         print("Schema OK.")
     except Exception as e:
         print(f"Schema update warning (might already exist): {e}")
 
-    # 2. Backfill Embeddings
+
+def iter_pages(cur, page_size, reembed_all):
+    """Keyset pagination on doc_id: each page is one indexed range scan."""
+    where = "" if reembed_all else "AND embedding IS NULL"
+    last_id = None
+    while True:
+        if last_id is None:
+            cur.execute(f"""
+                SELECT doc_id, title, snippet FROM documents
+                WHERE true {where}
+                ORDER BY doc_id LIMIT %s
+            """, (page_size,))
+        else:
+            cur.execute(f"""
+                SELECT doc_id, title, snippet FROM documents
+                WHERE doc_id > %s {where}
+                ORDER BY doc_id LIMIT %s
+            """, (last_id, page_size))
+        rows = cur.fetchall()
+        if not rows:
+            return
+        yield rows
+        last_id = rows[-1][0]
+
+
+def write_page(cur, doc_ids, vectors):
+    """COPY the page into the staging table and apply it with one UPDATE."""
+    buf = io.StringIO()
+    for doc_id, vec in zip(doc_ids, vectors):
+        buf.write(f"{doc_id}\t[{','.join(f'{x:.7g}' for x in vec)}]\n")
+    buf.seek(0)
+    cur.execute("TRUNCATE embedding_staging")
+    cur.copy_expert("COPY embedding_staging (doc_id, embedding) FROM STDIN", buf)
+    cur.execute("""
+        UPDATE documents d SET embedding = s.embedding
+        FROM embedding_staging s
+        WHERE d.doc_id = s.doc_id
+    """)
+    return cur.rowcount
+
+
+def backfill(conn, model, reembed_all=False, batch_size=64, page_size=1000, workers=1):
     print("2. Backfilling Embeddings...")
-    embed_model_name = os.getenv("EMBED_MODEL", "sentence-transformers/all-MiniLM-L6-v2")
-    model = SentenceTransformer(embed_model_name)
-    
-    cur.execute("SELECT doc_id, title, snippet FROM documents WHERE embedding IS NULL")
-    rows = cur.fetchall()
-    print(f"Found {len(rows)} documents needing embeddings.")
-
-    batch_size = 50
-    updates = []
-    
-    for doc_id, title, snippet in rows:
-        text = f"{title or ''} {snippet or ''}".strip()
-        if text:
-            emb = model.encode(text).tolist()
-            updates.append((emb, doc_id))
-        
-        if len(updates) >= batch_size:
-            execute_batch(cur, "UPDATE documents SET embedding = %s::vector WHERE doc_id = %s", updates)
-            print(f"Updated {len(updates)} docs...")
-            updates = []
-            
-    if updates:
-        execute_batch(cur, "UPDATE documents SET embedding = %s::vector WHERE doc_id = %s", updates)
-        print(f"Updated remaining {len(updates)} docs.")
-
-    print("Backfill Complete.")
-    cur.close()
-    conn.close()
-
-except Exception as e:
-    print(f"Critical DB Error: {e}")
+    read_cur = conn.cursor()
+    write_cur = conn.cursor()
+
+    read_cur.execute(f"SELECT count(*) FROM documents {'' if reembed_all else 'WHERE embedding IS NULL'}")
+    total = read_cur.fetchone()[0]
+    print(f"Found {total} documents needing embeddings.")
+    if not total:
+        return 0
+
+    write_cur.execute("CREATE TEMP TABLE IF NOT EXISTS embedding_staging (doc_id uuid PRIMARY KEY, embedding vector)")
+
+    # The shared embedding server batches on its side; the process pool only applies to a local model
+    local_pool = workers > 1 and hasattr(model, "start_multi_process_pool")
+    pool = model.start_multi_process_pool(target_devices=["cpu"] * workers) if local_pool else None
+    done = 0
+    started = time.time()
+    try:
+        for rows in iter_pages(read_cur, page_size, reembed_all):
+            page = [(doc_id, f"{title or ''} {snippet or ''}".strip()) for doc_id, title, snippet in rows]
+            page = [(doc_id, text) for doc_id, text in page if text]
+            if not page:
+                continue
+            doc_ids = [doc_id for doc_id, _ in page]
+            texts = [text for _, text in page]
+
+            if pool:
+                vectors = model.encode_multi_process(texts, pool, batch_size=batch_size)
+            else:
+                vectors = model.encode(texts, batch_size=batch_size)
+
+            done += write_page(write_cur, doc_ids, vectors)
+            elapsed = max(time.time() - started, 1e-6)
+            print(f"Updated {done}/{total} docs ({done / elapsed:.1f} rows/s)")
+    finally:
+        if pool:
+            model.stop_multi_process_pool(pool)
+        read_cur.close()
+        write_cur.close()
+
+    elapsed = max(time.time() - started, 1e-6)
+    print(f"Backfill Complete: {done} rows in {elapsed:.1f}s ({done / elapsed:.1f} rows/s)")
+    return done
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Backfill document embeddings")
+    parser.add_argument("--all", action="store_true", help="re-embed every document, not just missing ones")
+    parser.add_argument("--batch-size", type=int, default=int(os.getenv("BACKFILL_BATCH_SIZE", 64)))
+    parser.add_argument("--page-size", type=int, default=int(os.getenv("BACKFILL_PAGE_SIZE", 1000)))
+    parser.add_argument("--workers", type=int, default=int(os.getenv("BACKFILL_WORKERS", 1)),
+                        help="encode processes (SentenceTransformer multi-process pool)")
+    args = parser.parse_args()
+
+    print(f"Connecting to DB...")
+    try:
+        conn = psycopg2.connect(get_dsn())
+        conn.autocommit = True
+        with conn.cursor() as cur:
+            ensure_schema(cur)
+
+        embed_model_name = os.getenv("EMBED_MODEL", "sentence-transformers/all-MiniLM-L6-v2")
+        model = load_embedding_model(embed_model_name)
+
+        updated = backfill(conn, model, reembed_all=args.all, batch_size=args.batch_size,
+                           page_size=args.page_size, workers=args.workers)
+        if updated:
+            invalidate_result_cache()
+        conn.close()
+
+    except Exception as e:
+        print(f"Critical DB Error: {e}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,169 @@
+"""
+embedding_client.py - SentenceTransformer stand-in backed by embedding_server.py.
+
+Services in the same container share one model process instead of each
+loading all-MiniLM-L6-v2 (and its PyTorch thread pools) themselves.
+RemoteEmbedder.encode() takes the same arguments and returns the same
+NumPy shapes as SentenceTransformer.encode(), so call sites switch with:
+
+    model = load_embedding_model(EMBEDDING_MODEL_NAME)
+
+EMBED_BACKEND=local (default) loads SentenceTransformer in-process as before.
+EMBED_BACKEND=remote uses the server at EMBED_SERVER_URL, which is either
+unix:///path/to.sock or http://host:port. If the server is not up within
+EMBED_SERVER_WAIT_SECONDS, the model is loaded locally instead, unless
+EMBED_SERVER_FALLBACK=false. A server that is up but still loading its model
+is waited on for up to EMBED_SERVER_LOAD_SECONDS.
+
+Standard library plus NumPy only; importable as embedding_client (backend/query)
+or backend.query.embedding_client (lex_bot).
+"""
+import os
+import json
+import time
+import socket
+import logging
+import threading
+import http.client
+from urllib.parse import urlparse
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+EMBED_BACKEND = os.getenv("EMBED_BACKEND", "local").lower()
+EMBED_SERVER_URL = os.getenv("EMBED_SERVER_URL", "unix:///tmp/embedding_server.sock")
+EMBED_SERVER_TIMEOUT = float(os.getenv("EMBED_SERVER_TIMEOUT", 30))
+EMBED_SERVER_WAIT_SECONDS = float(os.getenv("EMBED_SERVER_WAIT_SECONDS", 30))
+# Once the server answers, how long to wait for its model to finish loading (cold containers are slow)
+EMBED_SERVER_LOAD_SECONDS = float(os.getenv("EMBED_SERVER_LOAD_SECONDS", 300))
+EMBED_SERVER_FALLBACK = os.getenv("EMBED_SERVER_FALLBACK", "true").lower() in ("1", "true", "yes")
+# Texts per HTTP request; bulk callers (ingest, backfill) are split into chunks of this size
+EMBED_CLIENT_CHUNK = int(os.getenv("EMBED_CLIENT_CHUNK", 256))
+
+
+class _UnixHTTPConnection(http.client.HTTPConnection):
+    def __init__(self, path, timeout):
+        super().__init__("localhost", timeout=timeout)
+        self._socket_path = path
+
+    def connect(self):
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(self.timeout)
+        sock.connect(self._socket_path)
+        self.sock = sock
+
+
+class RemoteEmbedder:
+    """Duck-typed SentenceTransformer: encode() and get_sentence_embedding_dimension()."""
+
+    def __init__(self, url=EMBED_SERVER_URL, timeout=EMBED_SERVER_TIMEOUT):
+        self.url = url
+        self.timeout = timeout
+        parsed = urlparse(url)
+        if parsed.scheme == "unix":
+            self._socket_path = parsed.path
+            self._host = None
+        else:
+            self._socket_path = None
+            self._host, self._port = parsed.hostname, parsed.port or 80
+        self._local = threading.local()  # one keep-alive connection per thread
+        self._dim = None
+        self.model_name = None
+
+    def _new_connection(self):
+        if self._socket_path:
+            return _UnixHTTPConnection(self._socket_path, self.timeout)
+        return http.client.HTTPConnection(self._host, self._port, timeout=self.timeout)
+
+    def _request(self, method, path, body=None, headers=None):
+        for attempt in (1, 2):
+            conn = getattr(self._local, "conn", None)
+            if conn is None:
+                conn = self._local.conn = self._new_connection()
+            try:
+                conn.request(method, path, body=body, headers=headers or {})
+                resp = conn.getresponse()
+                data = resp.read()
+            except (ConnectionError, http.client.HTTPException, OSError):
+                # Stale keep-alive socket (server restarted): reconnect once
+                conn.close()
+                self._local.conn = None
+                if attempt == 2:
+                    raise
+                continue
+            if resp.status != 200:
+                raise RuntimeError(f"Embedding server {method} {path} -> {resp.status}: {data[:200]!r}")
+            return resp, data
+
+    def health(self):
+        _, data = self._request("GET", "/health")
+        info = json.loads(data)
+        self._dim = info.get("dim")
+        self.model_name = info.get("model")
+        return info
+
+    def get_sentence_embedding_dimension(self):
+        if self._dim is None:
+            self.health()
+        return self._dim
+
+    def _encode_chunk(self, texts, normalize):
+        body = json.dumps({"texts": texts, "normalize": normalize}).encode("utf-8")
+        resp, data = self._request("POST", "/embed", body=body, headers={
+            "Content-Type": "application/json",
+            "Accept": "application/octet-stream",
+        })
+        dim = int(resp.getheader("X-Embedding-Dim"))
+        return np.frombuffer(data, dtype=np.float32).reshape(len(texts), dim)
+
+    def encode(self, sentences, batch_size=32, normalize_embeddings=False, convert_to_numpy=True,
+               show_progress_bar=False, **kwargs):
+        # batch_size is accepted for signature compatibility; the server batches across callers
+        single = isinstance(sentences, str)
+        texts = [sentences] if single else list(sentences)
+        if not texts:
+            return np.zeros((0, self.get_sentence_embedding_dimension()), dtype=np.float32)
+
+        chunks = [self._encode_chunk(texts[i:i + EMBED_CLIENT_CHUNK], normalize_embeddings)
+                  for i in range(0, len(texts), EMBED_CLIENT_CHUNK)]
+        out = chunks[0] if len(chunks) == 1 else np.vstack(chunks)
+        return out[0] if single else out
+
+
+def load_embedding_model(model_name, device=None):
+    """SentenceTransformer(model_name), or a RemoteEmbedder when EMBED_BACKEND=remote."""
+    if EMBED_BACKEND == "remote":
+        client = RemoteEmbedder()
+        start = time.monotonic()
+        deadline = start + EMBED_SERVER_WAIT_SECONDS
+        while True:
+            try:
+                info = client.health()
+            except Exception as e:
+                info, error = None, e
+            if info is not None:
+                if info.get("ok", True):
+                    if info.get("model") != model_name:
+                        logger.warning(f"Embedding server runs {info.get('model')}, caller expects {model_name}")
+                    logger.info(f"Using shared embedding server at {client.url} ({info.get('model')})")
+                    return client
+                if info.get("loading"):
+                    # Up and loading: wait for its model rather than loading a second copy here
+                    error = TimeoutError(f"model still loading after {time.monotonic() - start:.0f}s")
+                    deadline = max(deadline, start + EMBED_SERVER_LOAD_SECONDS)
+                else:
+                    error = RuntimeError(f"model failed to load: {info.get('error')}")
+                    deadline = 0
+            if time.monotonic() >= deadline:
+                if not EMBED_SERVER_FALLBACK:
+                    raise error
+                # Loud on purpose: this service now holds its own copy of the model
+                logger.error(f"Embedding server at {client.url} unavailable ({error}); loading model locally")
+                break
+            time.sleep(0.5)
+
+    from sentence_transformers import SentenceTransformer
+    if device:
+        return SentenceTransformer(model_name, device=device)
+    return SentenceTransformer(model_name)
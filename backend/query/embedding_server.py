@@ -0,0 +1,130 @@
+"""
+embedding_server.py - Shared SentenceTransformer for every service in the container.
+
+One process owns the model and a fixed number of PyTorch threads. Texts from
+concurrent requests (query, lex_bot, ingest, backfill) are coalesced by
+query_embeddings.EncodeBatcher into batched encode calls.
+
+    python embedding_server.py      # binds EMBED_SERVER_URL (unix:///tmp/embedding_server.sock)
+
+POST /embed   {"texts": [...], "normalize": false}
+              Accept: application/octet-stream -> raw float32 rows, X-Embedding-Dim header
+              otherwise                        -> {"embeddings": [[...]], "dim": 384}
+GET  /health  model name, dimension and batching stats; "ok": false while the model
+              is still loading (the socket is bound first so clients can wait on it)
+
+Clients: embedding_client.RemoteEmbedder / load_embedding_model.
+"""
+import os
+import asyncio
+import logging
+from typing import List
+from contextlib import asynccontextmanager
+from urllib.parse import urlparse
+
+import numpy as np
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import Response
+from pydantic import BaseModel
+from dotenv import load_dotenv
+
+from query_embeddings import EncodeBatcher
+from embedding_client import EMBED_SERVER_URL
+
+load_dotenv()
+
+logging.basicConfig(level=os.getenv("LOG_LEVEL", "INFO").upper(), format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+EMBEDDING_MODEL_NAME = os.getenv("EMBED_MODEL", "sentence-transformers/all-MiniLM-L6-v2")
+# Intra-op threads for the one shared model; other services no longer compete with their own pools
+EMBED_SERVER_THREADS = int(os.getenv("EMBED_SERVER_THREADS", 2))
+EMBED_SERVER_BATCH_WINDOW_MS = float(os.getenv("EMBED_SERVER_BATCH_WINDOW_MS", 5))
+EMBED_SERVER_MAX_BATCH = int(os.getenv("EMBED_SERVER_MAX_BATCH", 64))
+
+model = None
+batcher = None
+load_error = None
+
+
+class EmbedRequest(BaseModel):
+    texts: List[str]
+    normalize: bool = False
+
+
+def load_model():
+    global model, batcher
+    import torch
+    from sentence_transformers import SentenceTransformer
+
+    torch.set_num_threads(EMBED_SERVER_THREADS)
+    logger.info(f"Loading embedding model: {EMBEDDING_MODEL_NAME} ({EMBED_SERVER_THREADS} threads)")
+    model = SentenceTransformer(EMBEDDING_MODEL_NAME, device="cpu")
+    model.encode("warmup")
+    batcher = EncodeBatcher(model, window_ms=EMBED_SERVER_BATCH_WINDOW_MS, max_batch=EMBED_SERVER_MAX_BATCH)
+    logger.info("Embedding model loaded")
+
+
+def _load_in_background():
+    global load_error
+    try:
+        load_model()
+    except Exception as e:
+        load_error = str(e)
+        logger.exception("Embedding model failed to load")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Load after uvicorn binds the socket: a cold load can outlast the clients' connect wait
+    task = asyncio.ensure_future(asyncio.to_thread(_load_in_background))
+    yield
+    task.cancel()
+
+
+app = FastAPI(title="Embedding Server", lifespan=lifespan)
+
+
+@app.get("/health")
+async def health():
+    return {
+        "ok": batcher is not None,
+        "loading": batcher is None and load_error is None,
+        "error": load_error,
+        "model": EMBEDDING_MODEL_NAME,
+        "dim": model.get_sentence_embedding_dimension() if model else None,
+        "threads": EMBED_SERVER_THREADS,
+        "batcher": batcher.stats() if batcher else None,
+    }
+
+
+@app.post("/embed")
+async def embed(payload: EmbedRequest, request: Request):
+    if batcher is None:
+        raise HTTPException(status_code=503, detail=load_error or "Embedding model is loading")
+    futures = [asyncio.wrap_future(batcher.submit(t)) for t in payload.texts]
+    vectors = np.asarray(await asyncio.gather(*futures), dtype=np.float32)
+    if not len(vectors):
+        vectors = np.zeros((0, model.get_sentence_embedding_dimension()), dtype=np.float32)
+    if payload.normalize and len(vectors):
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        vectors /= norms
+
+    dim = vectors.shape[1]
+    if "application/octet-stream" in request.headers.get("accept", ""):
+        return Response(content=vectors.tobytes(), media_type="application/octet-stream",
+                        headers={"X-Embedding-Dim": str(dim)})
+    return {"embeddings": vectors.tolist(), "dim": dim}
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    parsed = urlparse(EMBED_SERVER_URL)
+    if parsed.scheme == "unix":
+        if os.path.exists(parsed.path):
+            os.remove(parsed.path)  # stale socket from a previous run
+        uvicorn.run(app, uds=parsed.path)
+    else:
+        uvicorn.run(app, host=parsed.hostname or "127.0.0.1", port=parsed.port or 8017)
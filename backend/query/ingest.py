@@ -8,12 +8,19 @@ ingest_local_only.py
 - Uses ONLY local files found in UPLOAD_FOLDER (prefers html). Does NOT download from download_url.
 - Uploads the chosen local file to S3 (if found)
 - Inserts/updates a row in Postgres documents table with s3_path and metadata
-- Writes updated JSON to scraped_data_with_s3.json (UTF-8)
+- Writes updated records to scraped_data_with_s3.jsonl (UTF-8)
+
+Records are streamed in batches of INGEST_BATCH_SIZE: S3 uploads run on a
+thread pool while the batch is embedded with one model.encode call, then the
+batch is upserted with execute_values. A checkpoint file (INGEST_CHECKPOINT)
+records progress so a crashed run resumes where it stopped.
 """
 import os
 import json
 import uuid
 import re
+import time
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from datetime import datetime
 from dotenv import load_dotenv
@@ -21,13 +28,15 @@ from tqdm import tqdm
 import boto3
 import psycopg2
 from psycopg2.extras import execute_values
-from sentence_transformers import SentenceTransformer
+from embedding_client import load_embedding_model
+from result_cache import invalidate_result_cache
+from keyword_extractor import KeywordExtractor, KEYWORD_VOCAB_PATH
 
 # Load Model (Global) - efficiently loaded only once
 # Load Model (Global) - efficiently loaded only once
 EMBEDDING_MODEL_NAME = os.getenv("EMBED_MODEL", "sentence-transformers/all-MiniLM-L6-v2")
 print(f"Loading embedding model: {EMBEDDING_MODEL_NAME}...")
-model = SentenceTransformer(EMBEDDING_MODEL_NAME)
+model = load_embedding_model(EMBEDDING_MODEL_NAME)
 
 
 load_dotenv()
@@ -42,6 +51,10 @@ POSTGRES_DSN = os.getenv("POSTGRES_DSN")
 UPLOAD_FOLDER = Path(os.getenv("UPLOAD_FOLDER", "./downloaded_files"))
 INPUT_JSON = os.getenv("INPUT_JSON", "scraped_data.jsonl")
 INTERACTIVE = os.getenv("INTERACTIVE", "true").lower() in ("1","true","yes")
+OUTPUT_JSONL = os.getenv("OUTPUT_JSONL", "scraped_data_with_s3.jsonl")
+INGEST_BATCH_SIZE = int(os.getenv("INGEST_BATCH_SIZE", 64))
+INGEST_UPLOAD_WORKERS = int(os.getenv("INGEST_UPLOAD_WORKERS", 8))
+INGEST_CHECKPOINT = Path(os.getenv("INGEST_CHECKPOINT", "ingest_checkpoint.json"))
 
 # required env check
 # required env check
@@ -96,20 +109,40 @@ def create_table_if_not_exists():
         conn.commit()
 
 def read_input(path):
+    return list(iter_input(path))
+
+def iter_input(path):
+    """
+    Yield records lazily. JSONL is streamed line by line; a JSON array/object
+    (first non-blank char '[' or '{' spanning the file) has to be parsed whole.
+    """
     p = Path(path)
     if not p.exists():
         raise FileNotFoundError(path)
-    text = p.read_text(encoding="utf-8")
-    try:
-        data = json.loads(text)
-        if isinstance(data, list): return data
-        if isinstance(data, dict): return [data]
-    except json.JSONDecodeError:
-        out = []
-        for line in text.splitlines():
-            if line.strip():
-                out.append(json.loads(line))
-        return out
+    with p.open(encoding="utf-8") as f:
+        head = f.read(1)
+        while head and head.isspace():
+            head = f.read(1)
+        f.seek(0)
+        if head == "[":
+            data = json.load(f)
+            yield from data
+            return
+        parsed_any = False
+        for line in f:
+            if not line.strip():
+                continue
+            try:
+                rec = json.loads(line)
+            except json.JSONDecodeError:
+                if parsed_any:
+                    raise
+                # a single pretty-printed JSON object
+                f.seek(0)
+                yield json.load(f)
+                return
+            parsed_any = True
+            yield rec
 
 def normalize_name_for_match(name: str) -> str:
     """Lowercase, remove spaces/dashes/underscores and strip known extensions."""
@@ -118,13 +151,26 @@ def normalize_name_for_match(name: str) -> str:
     s = re.sub(r'[\s\-_]+', '', s)
     return s
 
+_local_index = None
+
+def _local_file_index():
+    """normalized name -> first matching file in UPLOAD_FOLDER (built once, not per record)."""
+    global _local_index
+    if _local_index is None:
+        UPLOAD_FOLDER.mkdir(parents=True, exist_ok=True)
+        _local_index = {}
+        for fname in os.listdir(UPLOAD_FOLDER):
+            fpath = UPLOAD_FOLDER / fname
+            if fpath.is_file():
+                _local_index.setdefault(normalize_name_for_match(fname), fpath)
+    return _local_index
+
 def find_local_file_by_name(orig_base: str) -> Path:
     """
     Look for a local file in UPLOAD_FOLDER that matches orig_base (normalized).
     Preference order: .html/.htm first, then any matching common ext.
     Returns Path or None.
     """
-    UPLOAD_FOLDER.mkdir(parents=True, exist_ok=True)
     target_norm = normalize_name_for_match(orig_base)
 
     # 1) prefer explicit html/htm file
@@ -133,14 +179,10 @@ def find_local_file_by_name(orig_base: str) -> Path:
         if candidate.exists():
             return candidate
 
-    # 2) scan folder for normalized matches
-    for fname in os.listdir(UPLOAD_FOLDER):
-        fpath = UPLOAD_FOLDER / fname
-        if not fpath.is_file():
-            continue
-        # normalized compare
-        if normalize_name_for_match(fname) == target_norm:
-            return fpath
+    # 2) normalized match against the folder index
+    fpath = _local_file_index().get(target_norm)
+    if fpath:
+        return fpath
 
     # 3) try common ext variants appended to orig_base
     for ext in COMMON_EXTS:
@@ -180,7 +222,24 @@ def s3_upload(local_path: Path, doc_id: str):
     https_url = f"https://{S3_BUCKET}.s3.{S3_REGION}.amazonaws.com/{key}"
     return s3_uri, https_url
 
-def upsert_documents(records):
+def embed_records(records):
+    """One batched encode call for all records; None for records with no text."""
+    texts = [f"{r.get('title') or ''} {r.get('snippet') or ''}".strip() for r in records]
+    idx = [i for i, t in enumerate(texts) if t]
+    embeddings = [None] * len(records)
+    if idx:
+        vectors = model.encode([texts[i] for i in idx], batch_size=INGEST_BATCH_SIZE)
+        for i, vec in zip(idx, vectors):
+            embeddings[i] = vec.tolist()
+    return embeddings
+
+def upsert_documents(records, embeddings=None):
+    if embeddings is None:
+        embeddings = embed_records(records)
+    # ON CONFLICT can't touch the same row twice in one statement: keep the last record per doc_id
+    latest = {}
+    for r, emb in zip(records, embeddings):
+        latest[r.get("doc_id")] = (r, emb)
     with conn.cursor() as cur:
         sql = """
         INSERT INTO documents (
@@ -202,13 +261,11 @@ def upsert_documents(records):
             s3_path = EXCLUDED.s3_path,
             snippet = EXCLUDED.snippet,
             tags = EXCLUDED.tags,
-            snippet = EXCLUDED.snippet,
-            tags = EXCLUDED.tags,
             embedding = EXCLUDED.embedding,
             updated_at = now();
         """
         values = []
-        for r in records:
+        for r, embedding in latest.values():
             tags = r.get("tags")
             if isinstance(tags, list):
                 tags_arr = tags
@@ -217,10 +274,6 @@ def upsert_documents(records):
             else:
                 tags_arr = None
 
-            # Generate Embedding
-            text_to_embed = f"{r.get('title') or ''} {r.get('snippet') or ''}".strip()
-            embedding = model.encode(text_to_embed).tolist() if text_to_embed else None
-
             values.append((
                 r.get("doc_id"),
                 r.get("title"),
@@ -240,7 +293,7 @@ def upsert_documents(records):
                 r.get("created_at") or datetime.utcnow(),
                 r.get("updated_at") or datetime.utcnow()
             ))
-        execute_values(cur, sql, values)
+        execute_values(cur, sql, values, page_size=len(values) or 1)
         conn.commit()
 
 def prompt_missing(rec):
@@ -272,43 +325,112 @@ def prompt_missing(rec):
         rec["doc_id"] = str(uuid.uuid4())
     return rec
 
+def upload_record(rec):
+    """Find the local file for rec and upload it to S3; sets s3_path (None if no file/failed)."""
+    local_file = ensure_local_file(rec)
+    if not local_file:
+        # No local file found — DO NOT download. Keep metadata row, s3_path = None
+        print(f"[NO-LOCAL] No local file for '{rec.get('title')}' (doc_id={rec.get('doc_id')}). Skipping upload.")
+        rec["s3_path"] = None
+        return rec
+
+    # local file found — upload to S3
+    try:
+        s3_uri, public_url = s3_upload(local_file, rec["doc_id"])
+        rec["s3_path"] = s3_uri
+        rec["s3_public_url"] = public_url
+        rec["created_at"] = rec.get("scrape_timestamp") or datetime.utcnow().isoformat()
+        print(f"[UPLOADED] {local_file.name} -> {s3_uri}")
+    except Exception as e:
+        print(f"[UPLOAD-ERR] Failed to upload {local_file}: {e}")
+        rec["s3_path"] = None
+    return rec
+
+def load_checkpoint():
+    """Number of input records already ingested for INPUT_JSON (0 if none)."""
+    if not INGEST_CHECKPOINT.exists():
+        return 0
+    try:
+        cp = json.loads(INGEST_CHECKPOINT.read_text(encoding="utf-8"))
+    except json.JSONDecodeError:
+        return 0
+    if cp.get("input") != str(Path(INPUT_JSON).resolve()):
+        return 0
+    return int(cp.get("processed", 0))
+
+def save_checkpoint(processed):
+    tmp = INGEST_CHECKPOINT.with_suffix(".tmp")
+    tmp.write_text(json.dumps({
+        "input": str(Path(INPUT_JSON).resolve()),
+        "processed": processed,
+        "updated_at": datetime.utcnow().isoformat(),
+    }), encoding="utf-8")
+    tmp.replace(INGEST_CHECKPOINT)
+
+def iter_batches(records, size):
+    batch = []
+    for rec in records:
+        batch.append(rec)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
 def main():
     print("==> Ensure your .env is configured and RDS is reachable.")
     create_table_if_not_exists()
-    data = read_input(INPUT_JSON)
-    print(f"Loaded {len(data)} record(s) from {INPUT_JSON}")
-    updated = []
-    for rec in tqdm(data):
-        rec = prompt_missing(rec)
-        local_file = ensure_local_file(rec)
-        if not local_file:
-            # No local file found — DO NOT download. Keep metadata row, s3_path = None
-            print(f"[NO-LOCAL] No local file for '{rec.get('title')}' (doc_id={rec.get('doc_id')}). Skipping upload.")
-            rec["s3_path"] = None
-            updated.append(rec)
-            continue
-
-        # local file found — upload to S3
-        try:
-            s3_uri, public_url = s3_upload(local_file, rec["doc_id"])
-            rec["s3_path"] = s3_uri
-            rec["s3_public_url"] = public_url
-            rec["created_at"] = rec.get("scrape_timestamp") or datetime.utcnow().isoformat()
-            print(f"[UPLOADED] {local_file.name} -> {s3_uri}")
-            updated.append(rec)
-        except Exception as e:
-            print(f"[UPLOAD-ERR] Failed to upload {local_file}: {e}")
-            rec["s3_path"] = None
-            updated.append(rec)
-
-    # upsert into postgres
-    upsert_documents(updated)
-
-    # write updated json with utf-8
-    out_path = Path("scraped_data_with_s3.json")
-    with out_path.open("w", encoding="utf-8") as f:
-        json.dump(updated, f, indent=2, ensure_ascii=False)
-    print(f" Done. Wrote {len(updated)} records to DB and {out_path}")
+
+    skip = load_checkpoint()
+    if skip:
+        print(f"Resuming {INPUT_JSON} after {skip} already-ingested record(s) ({INGEST_CHECKPOINT})")
+    records = iter_input(INPUT_JSON)
+    for _ in range(skip):
+        next(records, None)
+
+    processed = skip
+    written = 0
+    started = time.time()
+    out_path = Path(OUTPUT_JSONL)
+    with ThreadPoolExecutor(max_workers=INGEST_UPLOAD_WORKERS) as pool, \
+            out_path.open("a" if skip else "w", encoding="utf-8") as out, \
+            tqdm(initial=skip, unit="rec") as bar:
+        for batch in iter_batches(records, INGEST_BATCH_SIZE):
+            # prompting is interactive, so keep it sequential
+            batch = [prompt_missing(rec) for rec in batch]
+
+            # uploads run on the pool while this thread embeds the batch
+            uploads = pool.map(upload_record, batch)
+            embeddings = embed_records(batch)
+            batch = list(uploads)
+
+            # upsert into postgres
+            upsert_documents(batch, embeddings)
+
+            for rec in batch:
+                out.write(json.dumps(rec, ensure_ascii=False, default=str) + "\n")
+            out.flush()
+
+            processed += len(batch)
+            written += len(batch)
+            save_checkpoint(processed)
+            bar.update(len(batch))
+
+    elapsed = max(time.time() - started, 1e-6)
+    print(f"Ingested {written} record(s) in {elapsed:.1f}s ({written / elapsed:.1f} rec/s)")
+
+    # New/changed templates: drop cached /search results in running query services
+    invalidate_result_cache()
+
+    # refresh the phrase/term vocabulary used by the local query parser
+    try:
+        KeywordExtractor.from_db(conn).save()
+        print(f"Refreshed keyword vocabulary at {KEYWORD_VOCAB_PATH}")
+    except Exception as e:
+        print(f"[VOCAB-ERR] Could not refresh keyword vocabulary: {e}")
+
+    INGEST_CHECKPOINT.unlink(missing_ok=True)
+    print(f" Done. Wrote {processed} records to DB and {out_path}")
 
 if __name__=="__main__":
     main()
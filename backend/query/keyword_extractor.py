@@ -0,0 +1,171 @@
+"""
+keyword_extractor.py - Offline keyword extraction for template search queries.
+
+Replaces the Gemini round trip in QueryParsing.normalize_query for the common case:
+1. Legal-domain stopword removal
+2. Greedy longest-match against a phrase dictionary mined from
+   documents.canonical_title / tags ("rental agreement", "power of attorney")
+3. BM25 IDF weighting of the remaining terms against the same corpus
+
+The vocabulary is a small JSON snapshot so the service starts without a DB hit.
+Rebuild it after ingesting new templates:
+
+    python keyword_extractor.py --build
+"""
+import os
+import re
+import json
+import math
+import logging
+from collections import Counter
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+KEYWORD_VOCAB_PATH = Path(os.getenv("KEYWORD_VOCAB_PATH", Path(__file__).parent / "keyword_vocab.json"))
+MAX_TERMS = 8
+MAX_PHRASE_LEN = 5
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+LEGAL_STOPWORDS = {
+    # request phrasing
+    "find", "need", "want", "looking", "search", "get", "give", "show", "send", "provide",
+    "draft", "drafting", "prepare", "make", "create", "write", "generate", "please", "kindly",
+    "format", "formats", "template", "templates", "sample", "samples", "specimen", "model",
+    "document", "documents", "doc", "copy", "pdf", "word", "example", "related", "regarding",
+    "relating", "about", "request", "help", "can", "could", "would", "should", "will", "shall",
+    # generic english
+    "a", "an", "the", "of", "for", "to", "in", "on", "at", "by", "with", "and", "or", "from",
+    "into", "as", "is", "are", "be", "it", "its", "this", "that", "these", "those", "me", "my",
+    "i", "we", "our", "us", "you", "your", "some", "any", "all", "which", "who", "what", "where",
+    "how", "new", "good", "proper", "simple", "standard", "basic", "legal",
+    # jurisdiction filler
+    "india", "indian",
+}
+
+
+def tokenize(text):
+    return _TOKEN_RE.findall((text or "").lower())
+
+
+class KeywordExtractor:
+    """BM25-weighted keyword selection with a mined phrase dictionary."""
+
+    k1 = 1.2
+
+    def __init__(self, phrases=None, df=None, n_docs=0):
+        self.phrases = set(phrases or [])
+        self.df = dict(df or {})
+        self.n_docs = n_docs
+
+    # ---------- vocabulary ----------
+
+    @classmethod
+    def from_rows(cls, rows):
+        """Build from (canonical_title, tags, snippet) rows."""
+        phrases = set()
+        df = Counter()
+        n_docs = 0
+        for title, tags, snippet in rows:
+            n_docs += 1
+            for phrase in [title] + list(tags or []):
+                toks = tokenize(phrase)
+                if 2 <= len(toks) <= MAX_PHRASE_LEN:
+                    phrases.add(" ".join(toks))
+            terms = set(tokenize(title)) | set(tokenize(" ".join(tags or []))) | set(tokenize(snippet))
+            df.update(terms - LEGAL_STOPWORDS)
+        return cls(phrases, df, n_docs)
+
+    @classmethod
+    def from_db(cls, conn):
+        with conn.cursor() as cur:
+            cur.execute("SELECT canonical_title, tags, snippet FROM documents")
+            return cls.from_rows(cur.fetchall())
+
+    @classmethod
+    def load(cls, path=KEYWORD_VOCAB_PATH):
+        path = Path(path)
+        if not path.exists():
+            logger.warning(f"Keyword vocabulary not found at {path}. Local parsing will defer to Gemini.")
+            return cls()
+        data = json.loads(path.read_text(encoding="utf-8"))
+        return cls(data.get("phrases"), data.get("df"), data.get("n_docs", 0))
+
+    def save(self, path=KEYWORD_VOCAB_PATH):
+        data = {"n_docs": self.n_docs, "phrases": sorted(self.phrases), "df": self.df}
+        Path(path).write_text(json.dumps(data, ensure_ascii=False), encoding="utf-8")
+
+    # ---------- scoring ----------
+
+    def idf(self, term):
+        df = self.df.get(term, 0)
+        return math.log((self.n_docs - df + 0.5) / (df + 0.5) + 1.0)
+
+    def _bm25(self, term, tf):
+        return self.idf(term) * (tf * (self.k1 + 1)) / (tf + self.k1)
+
+    def extract(self, user_query):
+        """
+        Returns {"search_terms": [...], "language": "en", "confidence": 0..1}.
+        Confidence is the share of content tokens covered by a known phrase or
+        corpus term; unknown tokens (typos, off-domain words) lower it.
+        """
+        tokens = tokenize(user_query)
+        matched = []
+        covered = set()
+
+        # 1. Longest phrase match first (phrases may contain stopwords, e.g. "power of attorney")
+        i = 0
+        while i < len(tokens):
+            for n in range(min(MAX_PHRASE_LEN, len(tokens) - i), 1, -1):
+                cand = " ".join(tokens[i:i + n])
+                if cand in self.phrases:
+                    matched.append(cand)
+                    covered.update(range(i, i + n))
+                    i += n
+                    break
+            else:
+                i += 1
+
+        # 2. Remaining content tokens, BM25-weighted
+        content = [(idx, t) for idx, t in enumerate(tokens) if t not in LEGAL_STOPWORDS and len(t) > 1]
+        tf = Counter(t for idx, t in content if idx not in covered)
+        weighted = sorted(tf, key=lambda t: self._bm25(t, tf[t]), reverse=True)
+
+        terms = matched + [t for t in weighted if t not in matched]
+
+        known = sum(1 for idx, t in content if idx in covered or self.df.get(t))
+        confidence = known / len(content) if content else 0.0
+        if matched:
+            confidence = min(1.0, confidence + 0.2)
+        if not self.n_docs:
+            confidence = 0.0
+
+        return {
+            "search_terms": terms[:MAX_TERMS],
+            "language": "en",
+            "confidence": round(confidence, 3),
+        }
+
+
+if __name__ == "__main__":
+    import sys
+
+    if "--build" in sys.argv:
+        import psycopg2
+        from dotenv import load_dotenv
+
+        load_dotenv()
+        conn = psycopg2.connect(os.getenv("POSTGRES_DSN"))
+        try:
+            extractor = KeywordExtractor.from_db(conn)
+        finally:
+            conn.close()
+        extractor.save()
+        print(f"Wrote {len(extractor.phrases)} phrases / {len(extractor.df)} terms from "
+              f"{extractor.n_docs} documents to {KEYWORD_VOCAB_PATH}")
+    else:
+        extractor = KeywordExtractor.load()
+        for q in sys.argv[1:] or ["Find contracts related to intellectual property rights in India."]:
+            print(q, "->", extractor.extract(q))
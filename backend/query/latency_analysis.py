@@ -7,6 +7,9 @@ from fastapi.testclient import TestClient
 # Ensure we can import modules from the current directory
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
+from benchmark import DEFAULT_QUERIES
+from metrics import path_counts
+
 try:
     from Query import app
 except ImportError as e:
@@ -15,21 +18,7 @@ except ImportError as e:
 
 
 
-queries = [
-    # Simple Queries
-    {"type": "simple", "query": "Rental agreement"},
-    {"type": "simple", "query": "Loan acknowledgement"},
-    {"type": "simple", "query": "Employment contract"},
-    {"type": "simple", "query": "Non-disclosure agreement"},
-    {"type": "simple", "query": "Partnership deed"},
-    
-    # Complex Queries
-    {"type": "complex", "query": "Agreement for repayment of friendly loan with interest and security"},
-    {"type": "complex", "query": "Lease deed for commercial property with lock-in period and maintenance clauses"},
-    {"type": "complex", "query": "Consultancy agreement for IT services with intellectual property assignment"},
-    {"type": "complex", "query": "Sale deed for residential flat including car parking and undivided share of land"},
-    {"type": "complex", "query": "Franchise agreement for retail outlet with territorial exclusivity and royalty terms"}
-]
+queries = DEFAULT_QUERIES
 
 def run_analysis():
     print(f"{'Type':<10} | {'Query':<60} | {'Latency (ms)':<12} | {'Path':<10} | {'Top Match':<40} | {'Score':<8}")
@@ -48,16 +37,20 @@ def run_analysis():
             q_type = item["type"]
             
             start_time = time.perf_counter()
-            # Capture stdout to see Fast-Path vs Slow-Path logs
+            # Path taken = which query_search_path_total counters moved during this request;
+            # stdout is still captured for the Gemini parser's fallback print
             import io
             from contextlib import redirect_stdout
+            before = path_counts()
             f = io.StringIO()
             with redirect_stdout(f):
                 response = client.post("/search", json={"user_query": q, "language": "en"})
             output = f.getvalue()
             end_time = time.perf_counter()
             
-            path = "FAST" if "Fast-Path SUCCESS" in output else "SLOW"
+            after = path_counts()
+            taken = [p for p in after if after[p] > before.get(p, 0)]
+            path = "+".join(p.upper() for p in taken) or "UNKNOWN"
             if "Parser error" in output: path += " (FALLBACK)"
             
             latency_ms = (end_time - start_time) * 1000
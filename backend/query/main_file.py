@@ -5,25 +5,34 @@ CHANGES:
 2. Uses sql_v2 for cleaner tunnel handling
 """
 from QueryParsing import normalize_query
-from scoring import score_match 
-from sql import search_documents
-from sentence_transformers import SentenceTransformer
+from scoring import score_matches
+from sql import search_documents, search_documents_async, SearchUnavailable
+from query_embeddings import EmbeddingCache, EncodeBatcher, normalize_query_key
+from result_cache import ResultCache
+from template_cache import TemplateCache
+from metrics import LatencyTracker, count_path, register_stats
+from embedding_client import RemoteEmbedder, load_embedding_model
 
 import os
+import time
+import asyncio
 import re
-from difflib import SequenceMatcher
+import logging
 from urllib.parse import urlparse
 from dotenv import load_dotenv
 import boto3
 
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
 # Load Model
 # Load Model
 EMBEDDING_MODEL_NAME = os.getenv("EMBED_MODEL", "sentence-transformers/all-MiniLM-L6-v2")
 print(f"Loading embedding model: {EMBEDDING_MODEL_NAME}...")
 try:
-    model = SentenceTransformer(EMBEDDING_MODEL_NAME)
+    # SentenceTransformer, or the shared embedding server when EMBED_BACKEND=remote
+    model = load_embedding_model(EMBEDDING_MODEL_NAME)
     # Sanity check
     model.encode("warmup")
     print("✅ Embedding model loaded successfully.")
@@ -31,33 +40,52 @@ except Exception as e:
     print(f"⚠️ Failed to load model from {EMBEDDING_MODEL_NAME}: {e}")
     print("🔄 Attempting fallback download from HuggingFace...")
     try:
-        model = SentenceTransformer("sentence-transformers/all-MiniLM-L6-v2")
+        model = load_embedding_model("sentence-transformers/all-MiniLM-L6-v2")
         model.encode("warmup")
         print("✅ Fallback model loaded successfully.")
     except Exception as e2:
         print(f"❌ CRITICAL: Could not load embedding model: {e2}")
         model = None
 
+# Query embeddings: LRU cache in front of a micro-batching encoder
+embedding_cache = EmbeddingCache()
+EMBED_BATCHING = os.getenv("EMBED_BATCHING", "true").lower() in ("1", "true", "yes")
+# The shared embedding server already batches across requests and services
+encode_batcher = (
+    EncodeBatcher(model)
+    if (model is not None and EMBED_BATCHING and not isinstance(model, RemoteEmbedder))
+    else None
+)
+
+# Final search payloads (result + alternatives), shared across workers when Redis is configured
+result_cache = ResultCache()
+
 s3_client = boto3.client(
     "s3",
     region_name=os.getenv("S3_REGION", os.getenv("AWS_REGION", "ap-south-1").strip()).strip()
 )
 
 
-def download_from_s3(s3_uri, download_dir="downloaded_results"):
+# S3 templates cached on local disk by bucket+key+ETag, revalidated with If-None-Match
+template_cache = TemplateCache(s3_client)
+
+# Cache stats exported on /metrics
+register_stats("result_cache", result_cache.stats, counters=("hits_local", "hits_redis", "misses"))
+register_stats("embedding_cache", embedding_cache.stats, counters=("hits", "misses"))
+if encode_batcher:
+    register_stats("embedding_batcher", encode_batcher.stats, counters=("batches", "encoded"))
+register_stats("template_cache", template_cache.stats, counters=("hits", "revalidated_304", "downloads"))
+
+
+def download_from_s3(s3_uri):
+    """Return a local path for s3_uri, served from the template cache when current."""
     parsed = urlparse(s3_uri)
     bucket = parsed.netloc
     key = parsed.path.lstrip("/")
-    filename = key.split("/")[-1]
-
-    os.makedirs(download_dir, exist_ok=True)
-    local_path = os.path.join(download_dir, filename)
-
-    print(f"Downloading {s3_uri} -> {local_path} ...")
-    s3_client.download_file(bucket, key, local_path)
-    print("Download Complete.")
 
-    return local_path
+    local_path = template_cache.fetch(bucket, key)
+    logger.debug(f"Template {s3_uri} -> {local_path}")
+    return str(local_path)
 
 
 def safe_normalize_query(user_query):
@@ -69,78 +97,72 @@ def safe_normalize_query(user_query):
             parsed = {"search_terms": kw[:8], "language": "en"}
         return parsed
     except Exception as e:
-        print("DEBUG: Parser error:", e)
+        logger.debug(f"Parser error: {e}")
         kw = [w.strip().lower() for w in re.findall(r"[A-Za-z0-9]+", user_query) if len(w) > 2]
         return {"search_terms": kw[:8], "language": "en"}
 
 
-def score_match(row, user_query):
-    title = (row.get("canonical_title") or row.get("title") or "").lower()
-    snippet = (row.get("snippet") or "").lower()
-    q = user_query.lower()
-    score_title = SequenceMatcher(None, title, q).ratio()
-    score_snip = SequenceMatcher(None, snippet, q).ratio()
-    tags = row.get("tags") or []
-    tag_boost = 0.15 if any(t.lower() in q for t in tags) else 0.0
-    score = min(1.0, (score_title * 0.6 + score_snip * 0.3) + tag_boost)
-    return score
-
-
 # === LOWER THRESHOLD FOR FASTER RESPONSE ===
 FAST_PATH_THRESHOLD = 0.45  # Was 0.6
 
+# Start the Gemini normalization alongside the fast-path search instead of after it,
+# and stop waiting for it once the request deadline is spent (0 = no deadline)
+SPECULATIVE_SLOW_PATH = os.getenv("SPECULATIVE_SLOW_PATH", "true").lower() in ("1", "true", "yes")
+SLOW_PATH_DEADLINE_MS = int(os.getenv("SLOW_PATH_DEADLINE_MS", 3000))
 
-def get_best_template(user_query):
-    print("=== get_best_template called with:", user_query)
-    
-    # Generate embedding
-    query_embedding = None
+
+def embed_query(user_query):
+    key = normalize_query_key(user_query)
+    cached = embedding_cache.get(key)
+    if cached is not None:
+        return cached
     try:
-        query_embedding = model.encode(user_query).tolist()
+        if encode_batcher:
+            embedding = encode_batcher.encode(key)
+        else:
+            embedding = model.encode(key).tolist()
     except Exception as e:
         print(f"Embedding failed: {e}")
+        return None
+    embedding_cache.put(key, embedding)
+    return embedding
+
+
+def embedding_stats():
+    return {
+        "cache": embedding_cache.stats(),
+        "batcher": encode_batcher.stats() if encode_batcher else None,
+    }
+
+
+def process_candidates(cand_list, query):
+    if not cand_list: return []
+    # One batch call for all candidates (see scoring.RESCORE_MODE)
+    text_sims = score_matches(cand_list, query)
+    scored = []
+    for r, text_sim in zip(cand_list, text_sims):
+        db_score = float(r.get("score", 0))
+        final_s = (db_score * 0.7) + (text_sim * 0.3)
+        scored.append((final_s, r))
+    scored.sort(reverse=True, key=lambda x: x[0])
+    return scored
+
+
+def merge_candidates(candidates, more_candidates):
+    seen = {c['doc_id'] for c in candidates}
+    for mc in more_candidates:
+        if mc['doc_id'] not in seen:
+            candidates.append(mc)
+    return candidates
 
-    # Fast-Path Search
-    print("DEBUG: Running Fast-Path Search...")
-    candidates = search_documents([], query_embedding=query_embedding, raw_query=user_query)
-    
-    def process_candidates(cand_list, query):
-        if not cand_list: return []
-        scored = []
-        for r in cand_list:
-            db_score = float(r.get("score", 0))
-            text_sim = score_match(r, query)
-            final_s = (db_score * 0.7) + (text_sim * 0.3)
-            scored.append((final_s, r))
-        scored.sort(reverse=True, key=lambda x: x[0])
-        return scored
-
-    scored = process_candidates(candidates, user_query)
-    
-    # Check if Fast-Path is good enough (LOWER THRESHOLD)
-    if scored and scored[0][0] > FAST_PATH_THRESHOLD:
-        print(f"DEBUG: Fast-Path SUCCESS (Score: {scored[0][0]:.3f})")
-    else:
-        # Slow-Path (Gemini)
-        print("DEBUG: Fast-Path weak. Calling Gemini...")
-        parsed = safe_normalize_query(user_query)
-        terms = parsed.get("search_terms", []) or []
-        
-        more_candidates = search_documents(terms, query_embedding=query_embedding, raw_query=user_query)
-        
-        seen = {c['doc_id'] for c in candidates}
-        for mc in more_candidates:
-            if mc['doc_id'] not in seen:
-                candidates.append(mc)
-        
-        scored = process_candidates(candidates, user_query)
 
+def build_result(scored):
     if not scored:
-        print("DEBUG: No candidates found")
+        logger.debug("No candidates found")
         return None, []
 
     best_score, best_doc = scored[0]
-    print("DEBUG: Best score:", best_score, "Best title:", best_doc["title"])
+    logger.debug(f"Best score: {best_score:.3f} Best title: {best_doc['title']}")
     
     result = {
         "title": best_doc["title"],
@@ -150,3 +172,196 @@ def get_best_template(user_query):
         "alternatives": [{"title": r["title"], "score": round(s,3), "s3_path": r["s3_path"]} for s, r in scored[1:6]]
     }
     return result, scored
+
+
+def get_best_template(user_query):
+    """
+    Synchronous search path (used by latency_analysis.py and scripts).
+    On a result-cache hit only the cached payload is returned; scored is empty.
+    """
+    cached = result_cache.get(user_query)
+    if cached is not None:
+        logger.debug("Result cache HIT")
+        count_path("cache_hit")
+        return cached["result"], []
+
+    result, scored = _search_best_template(user_query)
+    result_cache.set(user_query, result)
+    return result, scored
+
+
+def _search_best_template(user_query):
+    logger.debug(f"get_best_template called with: {user_query}")
+    tracker = LatencyTracker()
+
+    # Generate embedding
+    with tracker.step("embed"):
+        query_embedding = embed_query(user_query)
+
+    # Fast-Path Search
+    logger.debug("Running Fast-Path Search...")
+    with tracker.step("fast_path_search"):
+        candidates = search_documents([], query_embedding=query_embedding, raw_query=user_query)
+    with tracker.step("rescore"):
+        scored = process_candidates(candidates, user_query)
+
+    # Check if Fast-Path is good enough (LOWER THRESHOLD)
+    if scored and scored[0][0] > FAST_PATH_THRESHOLD:
+        logger.debug(f"Fast-Path SUCCESS (Score: {scored[0][0]:.3f})")
+        count_path("fast")
+    else:
+        # Slow-Path (Gemini)
+        logger.debug("Fast-Path weak. Calling Gemini...")
+        count_path("slow")
+        with tracker.step("parse_query"):
+            parsed = safe_normalize_query(user_query)
+        terms = parsed.get("search_terms", []) or []
+
+        with tracker.step("slow_path_search"):
+            more_candidates = search_documents(terms, query_embedding=query_embedding, raw_query=user_query)
+        candidates = merge_candidates(candidates, more_candidates)
+        with tracker.step("rescore"):
+            scored = process_candidates(candidates, user_query)
+
+    tracker.finish()
+    tracker.summary()
+    return build_result(scored)
+
+
+# Searches currently running, keyed on normalized query, so concurrent identical
+# requests share one search (and at most one Gemini call). A deadline-cut search
+# stays registered, serving its fast-path result, until its background slow path
+# has cached the refined one.
+_inflight = {}
+
+
+async def get_best_template_async(user_query):
+    """
+    Event-loop friendly search path for /search: DB access goes through the
+    async pool, CPU-bound encoding and the Gemini call run in worker threads.
+    """
+    cached = result_cache.get(user_query)
+    if cached is not None:
+        logger.debug("Result cache HIT")
+        count_path("cache_hit")
+        return cached["result"], []
+
+    key = normalize_query_key(user_query)
+    task = _inflight.get(key)
+    if task is None:
+        async def _compute():
+            complete = True
+            try:
+                result, scored, complete = await _search_best_template_async(user_query, key)
+                # A deadline-cut result is refined and cached by _finish_slow_path instead
+                if complete:
+                    result_cache.set(user_query, result)
+                return result, scored
+            finally:
+                # Otherwise _finish_slow_path unregisters it once the refined result is cached
+                if complete:
+                    _inflight.pop(key, None)
+
+        task = asyncio.ensure_future(_compute())
+        _inflight[key] = task
+    else:
+        logger.debug("Joining in-flight search for same query")
+        count_path("coalesced")
+
+    # Shield so one client disconnecting doesn't cancel the search for the others
+    return await asyncio.shield(task)
+
+
+# Keeps background slow-path tasks referenced until they finish
+_background_tasks = set()
+
+
+async def _search_best_template_async(user_query, key=None):
+    """
+    Returns (result, scored, complete); complete is False if Gemini missed the deadline.
+    `key` is the _inflight entry the background slow path releases when it finishes.
+    """
+    logger.debug(f"get_best_template_async called with: {user_query}")
+    tracker = LatencyTracker()
+    started = time.monotonic()
+
+    gemini_task = None
+    if SPECULATIVE_SLOW_PATH:
+        gemini_task = asyncio.ensure_future(asyncio.to_thread(safe_normalize_query, user_query))
+
+    with tracker.step("embed"):
+        query_embedding = await asyncio.to_thread(embed_query, user_query)
+
+    logger.debug("Running Fast-Path Search...")
+    try:
+        with tracker.step("fast_path_search"):
+            candidates = await search_documents_async([], query_embedding=query_embedding, raw_query=user_query)
+    except SearchUnavailable:
+        # Failed, not empty: don't escalate to Gemini (or cache anything) on an overloaded DB
+        count_path("unavailable")
+        if gemini_task:
+            gemini_task.cancel()
+        raise
+    with tracker.step("rescore"):
+        scored = process_candidates(candidates, user_query)
+
+    if scored and scored[0][0] > FAST_PATH_THRESHOLD:
+        logger.debug(f"Fast-Path SUCCESS (Score: {scored[0][0]:.3f})")
+        count_path("fast")
+        if gemini_task:
+            # The worker thread can't be interrupted; its result is simply discarded
+            gemini_task.cancel()
+        tracker.finish()
+        tracker.summary()
+        return build_result(scored) + (True,)
+
+    logger.debug("Fast-Path weak. Calling Gemini...")
+    if gemini_task is None:
+        gemini_task = asyncio.ensure_future(asyncio.to_thread(safe_normalize_query, user_query))
+
+    timeout = None
+    if SLOW_PATH_DEADLINE_MS > 0:
+        timeout = max(0.0, SLOW_PATH_DEADLINE_MS / 1000.0 - (time.monotonic() - started))
+    try:
+        # Only the wait left after the fast path; with speculation most of the call overlaps it
+        with tracker.step("parse_query_wait"):
+            parsed = await asyncio.wait_for(asyncio.shield(gemini_task), timeout=timeout)
+    except asyncio.TimeoutError:
+        logger.debug(f"Gemini missed {SLOW_PATH_DEADLINE_MS}ms deadline. Returning Fast-Path result.")
+        count_path("deadline")
+        task = asyncio.ensure_future(
+            _finish_slow_path(user_query, query_embedding, list(candidates), gemini_task, key)
+        )
+        _background_tasks.add(task)
+        task.add_done_callback(_background_tasks.discard)
+        tracker.finish()
+        tracker.summary()
+        return build_result(scored) + (False,)
+
+    count_path("slow")
+    terms = parsed.get("search_terms", []) or []
+    with tracker.step("slow_path_search"):
+        more_candidates = await search_documents_async(terms, query_embedding=query_embedding, raw_query=user_query)
+    candidates = merge_candidates(candidates, more_candidates)
+    with tracker.step("rescore"):
+        scored = process_candidates(candidates, user_query)
+
+    tracker.finish()
+    tracker.summary()
+    return build_result(scored) + (True,)
+
+
+async def _finish_slow_path(user_query, query_embedding, candidates, gemini_task, key=None):
+    """Let a late Gemini call finish, then cache the full slow-path result for next time."""
+    try:
+        parsed = await gemini_task
+        terms = parsed.get("search_terms", []) or []
+        more_candidates = await search_documents_async(terms, query_embedding=query_embedding, raw_query=user_query)
+        scored = process_candidates(merge_candidates(candidates, more_candidates), user_query)
+        result, _ = build_result(scored)
+        result_cache.set(user_query, result)
+    except Exception as e:
+        logger.warning(f"Background slow path failed: {e}")
+    finally:
+        if key is not None:
+            _inflight.pop(key, None)
@@ -0,0 +1,194 @@
+"""
+metrics.py - Per-stage timing and Prometheus metrics for the Query service.
+
+- LatencyTracker: per-request step timings (same interface as lex_bot's
+  core/timing.py); every step is also observed in the query_stage_seconds histogram
+- timed(stage): decorator form for whole functions (sync or async)
+- observe_pool_wait(pool, seconds): connection acquire time per pool
+- count_path(path): fast / slow / deadline / cache_hit / coalesced / unavailable search outcomes;
+  path_counts() returns the in-process totals (available without prometheus_client)
+- register_stats(component, fn, counters): exports the numeric fields of a stats() dict
+  (result cache, embedding cache, template cache, async pool) as gauges, or as
+  counters for the cumulative fields named in `counters`
+
+GET /metrics renders everything in the Prometheus text format. Without
+prometheus_client installed the trackers still work; only the export is disabled.
+"""
+import time
+import asyncio
+import logging
+import functools
+from collections import Counter as _PathCounter
+from contextlib import contextmanager
+
+try:
+    from prometheus_client import Counter, Histogram, CollectorRegistry, generate_latest, CONTENT_TYPE_LATEST
+    from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+    HAS_PROMETHEUS = True
+except ImportError:
+    HAS_PROMETHEUS = False
+    CONTENT_TYPE_LATEST = "text/plain; charset=utf-8"
+
+logger = logging.getLogger(__name__)
+
+# Seconds; /search stages range from sub-ms cache hits to multi-second Gemini calls
+STAGE_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+POOL_WAIT_BUCKETS = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0)
+
+
+class _NoopMetric:
+    def labels(self, *args, **kwargs):
+        return self
+
+    def observe(self, value):
+        pass
+
+    def inc(self, amount=1):
+        pass
+
+
+_stats_sources = {}
+_path_counts = _PathCounter()
+
+if HAS_PROMETHEUS:
+    registry = CollectorRegistry()
+
+    STAGE_SECONDS = Histogram(
+        "query_stage_seconds", "Time spent per search stage", ["stage"],
+        buckets=STAGE_BUCKETS, registry=registry,
+    )
+    POOL_WAIT_SECONDS = Histogram(
+        "query_db_pool_wait_seconds", "Time to acquire a database connection", ["pool"],
+        buckets=POOL_WAIT_BUCKETS, registry=registry,
+    )
+    SEARCH_PATH_TOTAL = Counter(
+        "query_search_path_total", "Searches by outcome path", ["path"], registry=registry,
+    )
+
+    class _StatsCollector:
+        """Reads registered stats() dicts at scrape time, so nothing is updated on the hot path."""
+
+        def collect(self):
+            for component, (fn, counters) in list(_stats_sources.items()):
+                try:
+                    stats = fn() or {}
+                except Exception as e:
+                    logger.warning(f"Metrics: stats for {component} failed: {e}")
+                    continue
+                for stat, value in stats.items():
+                    if isinstance(value, bool) or not isinstance(value, (int, float)):
+                        continue
+                    # Monotonic fields as counters, so rate() and restarts are handled correctly
+                    family = CounterMetricFamily if stat in counters else GaugeMetricFamily
+                    yield family(f"query_{component}_{stat}", f"{component} {stat}", value=value)
+
+    registry.register(_StatsCollector())
+else:
+    registry = None
+    STAGE_SECONDS = POOL_WAIT_SECONDS = SEARCH_PATH_TOTAL = _NoopMetric()
+
+
+def observe_stage(stage, seconds):
+    STAGE_SECONDS.labels(stage).observe(seconds)
+
+
+def observe_pool_wait(pool, seconds):
+    POOL_WAIT_SECONDS.labels(pool).observe(seconds)
+
+
+def count_path(path):
+    _path_counts[path] += 1
+    SEARCH_PATH_TOTAL.labels(path).inc()
+
+
+def path_counts():
+    """Searches per outcome path in this process (same counts as query_search_path_total)."""
+    return dict(_path_counts)
+
+
+def register_stats(component, fn, counters=()):
+    """
+    Export fn()'s numeric fields as query_<component>_<field> gauges; fields named
+    in `counters` only ever grow and are exported as query_<component>_<field>_total.
+    """
+    _stats_sources[component] = (fn, frozenset(counters))
+
+
+def render_latest():
+    """Returns (body, content_type) for the /metrics endpoint."""
+    if not HAS_PROMETHEUS:
+        return b"# prometheus_client not installed\n", CONTENT_TYPE_LATEST
+    return generate_latest(registry), CONTENT_TYPE_LATEST
+
+
+@contextmanager
+def stage_timer(stage):
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe_stage(stage, time.perf_counter() - t0)
+
+
+def timed(stage):
+    """Decorator: observe the wall time of every call under query_stage_seconds{stage}."""
+    def decorator(fn):
+        if asyncio.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                with stage_timer(stage):
+                    return await fn(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with stage_timer(stage):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+class LatencyTracker:
+    """Tracks latency per step of one search; steps also feed the stage histogram."""
+
+    def __init__(self):
+        self._steps = {}  # step_name -> duration_ms
+        self._start_time = time.perf_counter()
+
+    @contextmanager
+    def step(self, name):
+        """Context manager to time a named step."""
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, (time.perf_counter() - t0) * 1000)
+
+    def record(self, name, duration_ms):
+        """Manually record a step duration (repeated steps accumulate)."""
+        self._steps[name] = round(self._steps.get(name, 0.0) + duration_ms, 1)
+        observe_stage(name, duration_ms / 1000.0)
+
+    @property
+    def total_ms(self):
+        """Total elapsed time since tracker creation."""
+        return round((time.perf_counter() - self._start_time) * 1000, 1)
+
+    def finish(self):
+        """Record the end-to-end time as the "total" stage."""
+        observe_stage("total", self.total_ms / 1000.0)
+
+    def as_dict(self):
+        return {"steps": dict(self._steps), "total_ms": self.total_ms}
+
+    def summary(self):
+        """Log the step breakdown at DEBUG level."""
+        if not logger.isEnabledFor(logging.DEBUG):
+            return ""
+        lines = ["Latency Breakdown:"]
+        for name, ms in self._steps.items():
+            lines.append(f"   {name:<24s} {ms:>8.1f}ms")
+        lines.append(f"   {'TOTAL':<24s} {self.total_ms:>8.1f}ms")
+        msg = "\n".join(lines)
+        logger.debug(msg)
+        return msg
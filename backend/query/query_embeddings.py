@@ -0,0 +1,152 @@
+"""
+query_embeddings.py - Query embedding cache and micro-batching encoder.
+
+1. EmbeddingCache: bounded LRU of query -> embedding, keyed on a normalized query
+2. EncodeBatcher: gathers concurrent encode requests arriving within a short
+   window into a single SentenceTransformer.encode call
+"""
+import os
+import re
+import time
+import threading
+import logging
+from collections import OrderedDict
+from concurrent.futures import Future
+
+logger = logging.getLogger(__name__)
+
+EMBED_CACHE_SIZE = int(os.getenv("QUERY_EMBED_CACHE_SIZE", 2048))
+EMBED_BATCH_WINDOW_MS = float(os.getenv("EMBED_BATCH_WINDOW_MS", 5))
+EMBED_BATCH_MAX = int(os.getenv("EMBED_BATCH_MAX", 16))
+
+_WS_RE = re.compile(r"\s+")
+
+
+def normalize_query_key(user_query):
+    """Lowercase and collapse whitespace; the embedding model is uncased."""
+    return _WS_RE.sub(" ", (user_query or "").strip().lower())
+
+
+class EmbeddingCache:
+    """Thread-safe bounded LRU of normalized query -> embedding list."""
+
+    def __init__(self, max_size=EMBED_CACHE_SIZE):
+        self.max_size = max_size
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self._lock:
+            emb = self._data.get(key)
+            if emb is None:
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return emb
+
+    def put(self, key, embedding):
+        if self.max_size <= 0:
+            return
+        with self._lock:
+            self._data[key] = embedding
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "size": len(self._data),
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / total, 3) if total else 0.0,
+            }
+
+
+class EncodeBatcher:
+    """
+    Single worker thread that owns model.encode. Callers enqueue a text and
+    block on a Future; requests arriving within window_ms of the first one
+    (up to max_batch) are encoded together.
+    """
+
+    def __init__(self, model, window_ms=EMBED_BATCH_WINDOW_MS, max_batch=EMBED_BATCH_MAX):
+        self.model = model
+        self.window_s = window_ms / 1000.0
+        self.max_batch = max(1, max_batch)
+        self._pending = []
+        self._cond = threading.Condition()
+        self.batches = 0
+        self.encoded = 0
+        self._worker = threading.Thread(target=self._run, name="encode-batcher", daemon=True)
+        self._worker.start()
+
+    def submit(self, text):
+        fut = Future()
+        with self._cond:
+            self._pending.append((text, fut))
+            self._cond.notify()
+        return fut
+
+    def encode(self, text):
+        return self.submit(text).result()
+
+    def _take_batch(self):
+        with self._cond:
+            while not self._pending:
+                self._cond.wait()
+            # First request seen: hold the window open for stragglers
+            deadline = time.monotonic() + self.window_s
+            while len(self._pending) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(timeout=remaining)
+            batch = self._pending[:self.max_batch]
+            self._pending = self._pending[self.max_batch:]
+            return batch
+
+    def _run(self):
+        while True:
+            batch = self._take_batch()
+            try:
+                self._encode_batch(batch)
+            except Exception as e:
+                # Never let one bad batch kill the worker: every later encode would hang
+                logger.error(f"Encode batcher: batch failed: {e}")
+
+    def _encode_batch(self, batch):
+        # Drop requests cancelled while queued (e.g. a disconnected /embed client); the
+        # rest move to RUNNING and can no longer be cancelled, so set_result is safe
+        batch = [(t, fut) for t, fut in batch if fut.set_running_or_notify_cancel()]
+        if not batch:
+            return
+        texts = [t for t, _ in batch]
+        try:
+            vectors = self.model.encode(texts)
+        except Exception as e:
+            for _, fut in batch:
+                fut.set_exception(e)
+            return
+        self.batches += 1
+        self.encoded += len(texts)
+        for (_, fut), vec in zip(batch, vectors):
+            fut.set_result(vec.tolist())
+
+    def stats(self):
+        return {
+            "batches": self.batches,
+            "encoded": self.encoded,
+            "avg_batch_size": round(self.encoded / self.batches, 2) if self.batches else 0.0,
+            "window_ms": self.window_s * 1000.0,
+            "max_batch": self.max_batch,
+        }
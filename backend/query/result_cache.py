@@ -0,0 +1,206 @@
+"""
+result_cache.py - Two-tier cache for template search results.
+
+1. In-process TTL/LRU tier (per uvicorn worker, sub-millisecond)
+2. Optional Redis tier shared across workers (set QUERY_CACHE_REDIS_URL)
+
+Entries are stamped with a cache generation. ingest.py and
+backfill_embeddings.py call invalidate_result_cache() after upserting into
+documents, which bumps the generation in Redis and clears the local tier.
+Workers re-read the generation at most every GENERATION_CHECK_SECONDS.
+"""
+import os
+import json
+import time
+import threading
+import logging
+from collections import OrderedDict
+
+from query_embeddings import normalize_query_key
+
+logger = logging.getLogger(__name__)
+
+RESULT_CACHE_SIZE = int(os.getenv("RESULT_CACHE_SIZE", 1024))
+RESULT_CACHE_TTL_SECONDS = int(os.getenv("RESULT_CACHE_TTL", 3600))
+# "No matching template" answers expire sooner so newly ingested templates show up quickly
+RESULT_CACHE_NEGATIVE_TTL_SECONDS = int(os.getenv("RESULT_CACHE_NEGATIVE_TTL", 60))
+REDIS_URL = os.getenv("QUERY_CACHE_REDIS_URL")
+GENERATION_CHECK_SECONDS = float(os.getenv("RESULT_CACHE_GENERATION_CHECK", 2.0))
+
+_KEY_PREFIX = "query:search:"
+_GENERATION_KEY = "query:search:generation"
+
+try:
+    import redis
+    HAS_REDIS = True
+except ImportError:
+    HAS_REDIS = False
+
+
+class TTLCache:
+    """Thread-safe LRU with per-entry expiry."""
+
+    def __init__(self, max_size=RESULT_CACHE_SIZE, ttl=RESULT_CACHE_TTL_SECONDS):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.time():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl=None):
+        if self.max_size <= 0:
+            return
+        with self._lock:
+            self._data[key] = (time.time() + (ttl or self.ttl), value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+class ResultCache:
+    """Local TTL/LRU tier in front of an optional shared Redis tier."""
+
+    def __init__(self, redis_url=REDIS_URL):
+        self.local = TTLCache()
+        self.redis = None
+        self._generation = 0
+        self._generation_checked_at = 0.0
+        self.hits_local = 0
+        self.hits_redis = 0
+        self.misses = 0
+
+        if redis_url and HAS_REDIS:
+            try:
+                # Short timeouts: a slow Redis must never be worse than a cache miss
+                self.redis = redis.Redis.from_url(redis_url, socket_timeout=0.05, socket_connect_timeout=0.2)
+                self.redis.ping()
+                logger.info("Result cache: Redis tier enabled")
+            except Exception as e:
+                logger.warning(f"Result cache: Redis unavailable ({e}), using in-process tier only")
+                self.redis = None
+        elif redis_url:
+            logger.warning("QUERY_CACHE_REDIS_URL set but redis package not installed")
+
+    def _current_generation(self):
+        if not self.redis:
+            return self._generation
+        now = time.time()
+        if now - self._generation_checked_at >= GENERATION_CHECK_SECONDS:
+            try:
+                gen = int(self.redis.get(_GENERATION_KEY) or 0)
+                if gen != self._generation:
+                    self.local.clear()
+                    self._generation = gen
+            except Exception as e:
+                logger.warning(f"Result cache: generation check failed: {e}")
+            self._generation_checked_at = now
+        return self._generation
+
+    @staticmethod
+    def _local_ttl(entry):
+        return RESULT_CACHE_NEGATIVE_TTL_SECONDS if entry["result"] is None else None
+
+    def _key(self, user_query, language):
+        return f"{language}:{normalize_query_key(user_query)}"
+
+    def get(self, user_query, language="en"):
+        """Return {"result": ...} on hit (result may be None for a known no-match), else None."""
+        gen = self._current_generation()
+        key = self._key(user_query, language)
+
+        entry = self.local.get(key)
+        if entry is not None and entry["generation"] == gen:
+            self.hits_local += 1
+            return entry
+
+        if self.redis:
+            try:
+                raw = self.redis.get(f"{_KEY_PREFIX}{gen}:{key}")
+                if raw:
+                    entry = json.loads(raw)
+                    self.local.set(key, entry, ttl=self._local_ttl(entry))
+                    self.hits_redis += 1
+                    return entry
+            except Exception as e:
+                logger.warning(f"Result cache: Redis get failed: {e}")
+
+        self.misses += 1
+        return None
+
+    def set(self, user_query, result, language="en"):
+        """
+        Cache a completed search. result=None is a real no-match and gets the
+        short RESULT_CACHE_NEGATIVE_TTL; failed searches must not be cached at all.
+        """
+        gen = self._current_generation()
+        key = self._key(user_query, language)
+        entry = {"generation": gen, "result": result}
+        self.local.set(key, entry, ttl=self._local_ttl(entry))
+        if self.redis:
+            try:
+                ex = RESULT_CACHE_TTL_SECONDS if result is not None else RESULT_CACHE_NEGATIVE_TTL_SECONDS
+                self.redis.set(f"{_KEY_PREFIX}{gen}:{key}", json.dumps(entry), ex=ex)
+            except Exception as e:
+                logger.warning(f"Result cache: Redis set failed: {e}")
+
+    def invalidate(self):
+        """Drop every cached result, in this process and (via generation bump) in all workers."""
+        self.local.clear()
+        if self.redis:
+            try:
+                self._generation = int(self.redis.incr(_GENERATION_KEY))
+                self._generation_checked_at = time.time()
+            except Exception as e:
+                logger.warning(f"Result cache: Redis invalidate failed: {e}")
+        else:
+            self._generation += 1
+
+    def stats(self):
+        lookups = self.hits_local + self.hits_redis + self.misses
+        return {
+            "local_size": len(self.local),
+            "local_max_size": self.local.max_size,
+            "ttl_seconds": self.local.ttl,
+            "negative_ttl_seconds": RESULT_CACHE_NEGATIVE_TTL_SECONDS,
+            "redis_enabled": bool(self.redis),
+            "generation": self._generation,
+            "hits_local": self.hits_local,
+            "hits_redis": self.hits_redis,
+            "misses": self.misses,
+            "hit_ratio": round((self.hits_local + self.hits_redis) / lookups, 3) if lookups else 0.0,
+        }
+
+
+def invalidate_result_cache():
+    """
+    Called by ingest.py / backfill_embeddings.py after writing to documents.
+    Only the Redis generation bump reaches running services; without Redis,
+    workers pick up new documents when their entries expire (RESULT_CACHE_TTL).
+    """
+    if not (REDIS_URL and HAS_REDIS):
+        print("[CACHE] QUERY_CACHE_REDIS_URL not set; running query services refresh on TTL expiry.")
+        return
+    try:
+        client = redis.Redis.from_url(REDIS_URL, socket_timeout=2)
+        gen = client.incr(_GENERATION_KEY)
+        print(f"[CACHE] Template search cache invalidated (generation {gen}).")
+    except Exception as e:
+        print(f"[CACHE] Failed to invalidate search cache: {e}")
@@ -1,6 +1,105 @@
+"""
+scoring.py - Text-similarity re-scoring of search candidates.
+
+RESCORE_MODE selects the scorer used by score_matches():
+- "rapidfuzz": Indel ratio via rapidfuzz.process.cdist (C, one call per field)
+- "ngram": character 3-gram TF-IDF cosine in NumPy
+- "sequencematcher": the original difflib scorer, kept for ranking comparisons
+Default is rapidfuzz when installed, otherwise ngram.
+"""
+import os
+from collections import Counter
 from difflib import SequenceMatcher
 
+import numpy as np
+
+try:
+    from rapidfuzz import fuzz, process
+    HAS_RAPIDFUZZ = True
+except ImportError:
+    HAS_RAPIDFUZZ = False
+
+RESCORE_MODE = os.getenv("RESCORE_MODE", "rapidfuzz" if HAS_RAPIDFUZZ else "ngram").lower()
+NGRAM_SIZE = 3
+
+TITLE_WEIGHT = 0.6
+SNIPPET_WEIGHT = 0.3
+TAG_BOOST = 0.15
+
+
+def _fields(row):
+    title = (row.get("canonical_title") or row.get("title") or "").lower()
+    snippet = (row.get("snippet") or "").lower()
+    return title, snippet
+
+
+def _tag_boost(row, q):
+    tags = row.get("tags") or []
+    return TAG_BOOST if any(t.lower() in q for t in tags) else 0.0
+
+
 def score_match(row, user_query):
-    score_title = SequenceMatcher(None, row["canonical_title"], user_query.lower()).ratio()
-    score_snippet = SequenceMatcher(None, row["snippet"].lower(), user_query.lower()).ratio()
-    return (score_title + score_snippet) / 2
+    title, snippet = _fields(row)
+    q = user_query.lower()
+    score_title = SequenceMatcher(None, title, q).ratio()
+    score_snip = SequenceMatcher(None, snippet, q).ratio()
+    score = min(1.0, (score_title * TITLE_WEIGHT + score_snip * SNIPPET_WEIGHT) + _tag_boost(row, q))
+    return score
+
+
+def _char_ngrams(text, n=NGRAM_SIZE):
+    padded = f" {text} "
+    if len(padded) < n:
+        return Counter([padded])
+    return Counter(padded[i:i + n] for i in range(len(padded) - n + 1))
+
+
+def _ngram_similarities(q, texts):
+    """TF-IDF cosine between q and each text over character n-grams, as one matrix product."""
+    grams = [_char_ngrams(t) for t in texts]
+    q_grams = _char_ngrams(q)
+    vocab = {}
+    for g in [q_grams] + grams:
+        for k in g:
+            vocab.setdefault(k, len(vocab))
+
+    mat = np.zeros((len(texts) + 1, len(vocab)), dtype=np.float32)
+    for i, g in enumerate([q_grams] + grams):
+        for k, c in g.items():
+            mat[i, vocab[k]] = c
+
+    df = np.count_nonzero(mat, axis=0)
+    idf = np.log((1 + mat.shape[0]) / (1 + df)) + 1.0
+    mat *= idf
+    norms = np.linalg.norm(mat, axis=1)
+    norms[norms == 0] = 1.0
+    mat /= norms[:, None]
+    return mat[1:] @ mat[0]
+
+
+def _rapidfuzz_similarities(q, texts):
+    return process.cdist([q], texts, scorer=fuzz.ratio, dtype=np.float32)[0] / 100.0
+
+
+def score_matches(rows, user_query, mode=None):
+    """Batch equivalent of score_match: returns one text-similarity score per row."""
+    if not rows:
+        return []
+    mode = (mode or RESCORE_MODE).lower()
+    q = user_query.lower()
+
+    if mode == "rapidfuzz" and not HAS_RAPIDFUZZ:
+        mode = "ngram"
+    if mode == "sequencematcher":
+        return [score_match(r, user_query) for r in rows]
+
+    fields = [_fields(r) for r in rows]
+    titles = [t for t, _ in fields]
+    snippets = [s for _, s in fields]
+    sim = _rapidfuzz_similarities if mode == "rapidfuzz" else _ngram_similarities
+
+    title_scores = np.asarray(sim(q, titles), dtype=np.float64)
+    snippet_scores = np.asarray(sim(q, snippets), dtype=np.float64)
+    boosts = np.array([_tag_boost(r, q) for r in rows])
+    scores = np.minimum(1.0, title_scores * TITLE_WEIGHT + snippet_scores * SNIPPET_WEIGHT + boosts)
+    return scores.tolist()
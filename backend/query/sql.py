@@ -20,8 +20,21 @@ import psycopg2
 import psycopg2.extras
 from psycopg2 import pool
 import os
+import time
 import socket
+import asyncio
 from dotenv import load_dotenv
+from metrics import observe_pool_wait, stage_timer, timed
+import ann_index
+from template_index import TemplateIndexManager, TEMPLATE_INDEX_MODE
+
+# Optional asyncio-native driver for the /search hot path
+try:
+    from psycopg.rows import dict_row
+    from psycopg_pool import AsyncConnectionPool, PoolTimeout, TooManyRequests
+    HAS_ASYNC_DRIVER = True
+except ImportError:
+    HAS_ASYNC_DRIVER = False
 
 load_dotenv()
 
@@ -30,10 +43,29 @@ BASTION_IP = os.getenv("BASTION_IP")
 SSH_KEY_PATH = os.getenv("SSH_KEY_PATH")
 RDS_ENDPOINT = os.getenv("RDS_ENDPOINT", "privet-lawdb.cfge8ai08o3t.ap-south-1.rds.amazonaws.com")
 LOCAL_BIND_PORT = 5432
+# Applied once per pooled connection instead of a SET round trip per search.
+STATEMENT_TIMEOUT_MS = int(os.getenv("DB_STATEMENT_TIMEOUT_MS", 10000))
+CONNECTION_OPTIONS = f"-c statement_timeout={STATEMENT_TIMEOUT_MS} {ann_index.connection_options()}"
+
+# Async pool sizing: acquire timeout (s) and how many requests may queue for a connection
+ASYNC_POOL_MIN = int(os.getenv("DB_ASYNC_POOL_MIN", 2))
+ASYNC_POOL_MAX = int(os.getenv("DB_ASYNC_POOL_MAX", 20))
+ASYNC_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", 5.0))
+ASYNC_POOL_MAX_WAITING = int(os.getenv("DB_POOL_MAX_WAITING", 100))
 
 # Global variables
 tunnel = None
 connection_pool = None
+async_pool = None
+template_index = None  # TemplateIndexManager when TEMPLATE_INDEX_MODE is fallback/primary
+
+
+class SearchUnavailable(Exception):
+    """The documents table could not be searched; not the same as a search with no matches."""
+
+
+class PoolSaturated(SearchUnavailable):
+    """The async pool had no free connection in time; the request should be retried, not escalated."""
 
 def is_port_open(host='127.0.0.1', port=LOCAL_BIND_PORT, timeout=1.0):
     """Check if a port is open (manual tunnel running)."""
@@ -49,7 +81,8 @@ def is_port_open(host='127.0.0.1', port=LOCAL_BIND_PORT, timeout=1.0):
 import logging
 
 # Set up logging
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+# LOG_LEVEL=DEBUG restores the per-connection / per-query trace lines
+logging.basicConfig(level=os.getenv("LOG_LEVEL", "INFO").upper(), format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
 # Replace RDS endpoint with localhost for tunneled connections
@@ -80,17 +113,20 @@ def _get_tunneled_dsn():
 
 def start_tunnel_and_pool():
     global tunnel, connection_pool
-    logger.info("DEBUG: Entering start_tunnel_and_pool")
+    logger.debug("Entering start_tunnel_and_pool")
     
     # 1. Check if manual tunnel is already running
-    logger.info("DEBUG: Checking is_port_open...")
+    logger.debug("Checking is_port_open...")
     if is_port_open():
         logger.info(f"Port {LOCAL_BIND_PORT} is open. Using existing tunnel.")
         try:
             dsn = _get_tunneled_dsn()
-            logger.info(f"DEBUG: Creating pool with DSN: {dsn}")
+            logger.debug(f"Creating pool with DSN: {dsn}")
             pool_size = int(os.getenv("DB_POOL_SIZE", 5))
-            connection_pool = pool.ThreadedConnectionPool(1, pool_size, dsn, connect_timeout=5)
+            connection_pool = pool.ThreadedConnectionPool(
+                1, pool_size, dsn, connect_timeout=5,
+                options=CONNECTION_OPTIONS
+            )
             logger.info(f"Threaded connection pool created (Manual Tunnel, Size: {pool_size})")
             return
         except Exception as e:
@@ -98,7 +134,7 @@ def start_tunnel_and_pool():
             return
 
     # 2. Start auto-tunnel only if port is NOT open AND not in AWS
-    logger.info("DEBUG: Checking tunnel conditions...")
+    logger.debug("Checking tunnel conditions...")
     if BASTION_IP and SSH_KEY_PATH and not os.getenv("SKIP_TUNNEL"):
         logger.info(f"Starting auto SSH tunnel via {BASTION_IP}...")
         try:
@@ -115,14 +151,17 @@ def start_tunnel_and_pool():
             logger.error(f"Auto-tunnel failed: {e}")
             return
     else:
-        logger.info("DEBUG: Skipping tunnel (BASTION_IP not set or SKIP_TUNNEL=true)")
+        logger.debug("Skipping tunnel (BASTION_IP not set or SKIP_TUNNEL=true)")
 
     # 3. Create connection pool
     try:
         dsn = _get_tunneled_dsn()
-        logger.info(f"DEBUG: Creating pool with DSN: {dsn}")
+        logger.debug(f"Creating pool with DSN: {dsn}")
         pool_size = int(os.getenv("DB_POOL_SIZE", 5))
-        connection_pool = pool.ThreadedConnectionPool(1, pool_size, dsn, connect_timeout=5)
+        connection_pool = pool.ThreadedConnectionPool(
+            1, pool_size, dsn, connect_timeout=5,
+            options=CONNECTION_OPTIONS
+        )
         logger.info(f"Threaded connection pool created (Size: {pool_size})")
     except Exception as e:
         logger.error(f"Error creating connection pool: {e}")
@@ -139,164 +178,477 @@ def stop_tunnel_and_pool():
         tunnel.stop()
         tunnel = None
 
+async def start_async_pool():
+    """Open the asyncio connection pool used by search_documents_async (after the tunnel is up)."""
+    global async_pool
+    if not HAS_ASYNC_DRIVER:
+        logger.warning("psycopg/psycopg_pool not installed. Async search will use the threaded pool.")
+        return
+    dsn = _get_tunneled_dsn()
+    if not dsn:
+        logger.warning("POSTGRES_DSN not set. Async pool not created.")
+        return
+    try:
+        async_pool = AsyncConnectionPool(
+            dsn,
+            min_size=ASYNC_POOL_MIN,
+            max_size=ASYNC_POOL_MAX,
+            timeout=ASYNC_POOL_TIMEOUT,
+            max_waiting=ASYNC_POOL_MAX_WAITING,
+            kwargs={
+                "connect_timeout": 5,
+                "options": CONNECTION_OPTIONS,
+                "row_factory": dict_row,
+            },
+            open=False,
+        )
+        await async_pool.open(wait=False)
+        logger.info(f"Async connection pool created (Size: {ASYNC_POOL_MIN}-{ASYNC_POOL_MAX})")
+    except Exception as e:
+        logger.error(f"Async pool creation failed: {e}")
+        async_pool = None
+
+async def stop_async_pool():
+    global async_pool
+    if async_pool:
+        logger.info("Closing async database connection pool...")
+        await async_pool.close()
+        async_pool = None
+
+def async_pool_stats():
+    """Pool size, acquire wait and queue depth for the async pool (empty if not running)."""
+    if not async_pool:
+        return {}
+    stats = async_pool.get_stats()
+    return {
+        "pool_min": stats.get("pool_min", ASYNC_POOL_MIN),
+        "pool_max": stats.get("pool_max", ASYNC_POOL_MAX),
+        "pool_size": stats.get("pool_size", 0),
+        "pool_available": stats.get("pool_available", 0),
+        "requests_waiting": stats.get("requests_waiting", 0),
+        "requests_num": stats.get("requests_num", 0),
+        "requests_queued": stats.get("requests_queued", 0),
+        "requests_wait_ms": stats.get("requests_wait_ms", 0),
+        "requests_errors": stats.get("requests_errors", 0),
+        "acquire_timeout_s": ASYNC_POOL_TIMEOUT,
+        "max_waiting": ASYNC_POOL_MAX_WAITING,
+    }
+
+def start_template_index():
+    """Load the on-disk documents snapshot and keep it fresh from Postgres in the background."""
+    global template_index
+    if TEMPLATE_INDEX_MODE not in ("fallback", "primary"):
+        return
+    template_index = TemplateIndexManager()
+    template_index.load()
+    template_index.start(get_db_connection, release_db_connection)
+
+def stop_template_index():
+    global template_index
+    if template_index:
+        template_index.stop()
+        template_index = None
+
+def template_index_stats():
+    return template_index.stats() if template_index else {"mode": TEMPLATE_INDEX_MODE, "loaded": False}
+
+def _search_local(search_terms, query_embedding, raw_query, language):
+    """Fused results from the in-process snapshot, or None if no snapshot is loaded."""
+    if not template_index:
+        return None
+    with stage_timer("local_index"):
+        sources = template_index.search_sources(search_terms, query_embedding, raw_query, language)
+        return fuse_results(sources) if sources is not None else None
+
+def _use_local_first():
+    return TEMPLATE_INDEX_MODE == "primary" and template_index is not None and template_index.index is not None
+
 def get_db_connection():
     if connection_pool:
-        logger.info("DEBUG: Requesting connection from pool...")
+        logger.debug("Requesting connection from pool...")
+        t0 = time.perf_counter()
         conn = connection_pool.getconn()
-        logger.info("DEBUG: Connection acquired from pool.")
+        observe_pool_wait("threaded", time.perf_counter() - t0)
+        logger.debug("Connection acquired from pool.")
         return conn
     else:
         # Fallback if pool wasn't initialized
         logger.warning("Connection pool not initialized. Attempting direct connection.")
-        return psycopg2.connect(POSTGRES_DSN)
+        return psycopg2.connect(POSTGRES_DSN, options=CONNECTION_OPTIONS)
 
 def release_db_connection(conn):
     if connection_pool:
-        logger.info("DEBUG: Releasing connection to pool...")
+        logger.debug("Releasing connection to pool...")
         connection_pool.putconn(conn)
-        logger.info("DEBUG: Connection released.")
+        logger.debug("Connection released.")
     else:
         conn.close()
 
 
+# Per-source weights applied before fusion, and the order in which sources are
+# folded together. The fold is order-dependent, so the SQL below mirrors it exactly.
+SOURCE_WEIGHTS = {"vector": 1.0, "fuzzy": 1.2, "text": 0.9, "legacy": 0.5}
+FUSION_ORDER = ("vector", "fuzzy", "text", "legacy")
+SEARCH_RESULT_LIMIT = 40
+
+# Set to false to fall back to the one-statement-per-source path.
+SINGLE_QUERY_SEARCH = os.getenv("SINGLE_QUERY_SEARCH", "true").lower() in ("1", "true", "yes")
+
+
+def _fold_sql(acc, col):
+    return (f"CASE WHEN {acc} IS NULL THEN {col} WHEN {col} IS NULL THEN {acc} "
+            f"ELSE GREATEST({acc}, {col}) + 0.2 * LEAST({acc}, {col}) END")
+
+
+# Vector, full-text and trigram candidates (plus the legacy ILIKE fallback when
+# the other three find fewer than 3 rows) are computed and fused in one round trip.
+HYBRID_SEARCH_SQL = f"""
+WITH params AS (
+    SELECT %(raw_query)s::text AS qtext,
+           websearch_to_tsquery('english', coalesce(%(raw_query)s::text, '')) AS qtsv
+),
+vec AS (
+    -- Nearest-first with a literal query vector so the ANN index drives the scan;
+    -- the similarity threshold is applied to the top-k afterwards
+    SELECT nn.doc_id, nn.raw_score, 'vector' AS match_type
+    FROM (
+        SELECT d.doc_id, (1 - (d.embedding <=> %(embedding)s::vector)) AS raw_score
+        FROM documents d
+        WHERE %(embedding)s::vector IS NOT NULL
+        ORDER BY d.embedding <=> %(embedding)s::vector
+        LIMIT 25
+    ) nn
+    WHERE nn.raw_score > 0.35
+),
+txt AS (
+    SELECT d.doc_id, LEAST(ts_rank(d.search_vector, p.qtsv) * 1.5, 1.0) AS raw_score, 'text' AS match_type
+    FROM documents d, params p
+    WHERE p.qtext IS NOT NULL
+      AND d.search_vector @@ p.qtsv
+    ORDER BY raw_score DESC
+    LIMIT 20
+),
+fuzzy AS (
+    SELECT d.doc_id, similarity(d.canonical_title, p.qtext) AS raw_score, 'fuzzy' AS match_type
+    FROM documents d, params p
+    WHERE char_length(coalesce(p.qtext, '')) > 3
+      AND similarity(d.canonical_title, p.qtext) > 0.3
+    ORDER BY raw_score DESC
+    LIMIT 15
+),
+legacy AS (
+    SELECT d.doc_id, 0.2 AS raw_score, 'legacy' AS match_type
+    FROM documents d
+    WHERE ((SELECT count(*) FROM vec) + (SELECT count(*) FROM txt) + (SELECT count(*) FROM fuzzy)) < 3
+      AND d.language = %(language)s
+      AND (d.canonical_title ILIKE ANY(%(patterns)s::text[]) OR d.snippet ILIKE ANY(%(patterns)s::text[]))
+    LIMIT 10
+),
+hits AS (
+    SELECT doc_id, raw_score::float8 * {SOURCE_WEIGHTS["vector"]} AS score, match_type FROM vec
+    UNION ALL
+    SELECT doc_id, raw_score::float8 * {SOURCE_WEIGHTS["fuzzy"]}, match_type FROM fuzzy
+    UNION ALL
+    SELECT doc_id, raw_score::float8 * {SOURCE_WEIGHTS["text"]}, match_type FROM txt
+    UNION ALL
+    SELECT doc_id, raw_score::float8 * {SOURCE_WEIGHTS["legacy"]}, match_type FROM legacy
+),
+per_doc AS (
+    SELECT doc_id,
+           max(score) FILTER (WHERE match_type = 'vector') AS s_vector,
+           max(score) FILTER (WHERE match_type = 'fuzzy') AS s_fuzzy,
+           max(score) FILTER (WHERE match_type = 'text') AS s_text,
+           max(score) FILTER (WHERE match_type = 'legacy') AS s_legacy,
+           array_agg(DISTINCT match_type) AS sources
+    FROM hits
+    GROUP BY doc_id
+),
+fused AS (
+    SELECT pd.doc_id, f3.score, pd.sources
+    FROM per_doc pd
+    CROSS JOIN LATERAL (SELECT {_fold_sql("pd.s_vector", "pd.s_fuzzy")} AS score) f1
+    CROSS JOIN LATERAL (SELECT {_fold_sql("f1.score", "pd.s_text")} AS score) f2
+    CROSS JOIN LATERAL (SELECT {_fold_sql("f2.score", "pd.s_legacy")} AS score) f3
+)
+SELECT d.doc_id, d.title, d.canonical_title, d.tags, d.snippet, d.s3_path,
+       f.score, f.sources
+FROM fused f
+JOIN documents d ON d.doc_id = f.doc_id
+ORDER BY f.score DESC
+LIMIT {SEARCH_RESULT_LIMIT}
+"""
+
+
+# Per-source statements used by search_documents_multi (and timed separately by benchmark.py)
+VECTOR_SEARCH_SQL = """
+    SELECT * FROM (
+        SELECT doc_id, title, canonical_title, tags, snippet, s3_path,
+               (1 - (embedding <=> %s::vector)) as raw_score,
+               'vector' as match_type
+        FROM documents
+        ORDER BY embedding <=> %s::vector
+        LIMIT 25
+    ) nn
+    WHERE raw_score > 0.35
+    ORDER BY raw_score DESC
+"""
+
+TEXT_SEARCH_SQL = """
+    SELECT doc_id, title, canonical_title, tags, snippet, s3_path,
+           LEAST(ts_rank(search_vector, websearch_to_tsquery('english', %s)) * 1.5, 1.0) as raw_score,
+           'text' as match_type
+    FROM documents
+    WHERE search_vector @@ websearch_to_tsquery('english', %s)
+    ORDER BY raw_score DESC
+    LIMIT 20
+"""
+
+TRIGRAM_SEARCH_SQL = """
+    SELECT doc_id, title, canonical_title, tags, snippet, s3_path,
+           similarity(canonical_title, %s::text) as raw_score,
+           'fuzzy' as match_type
+    FROM documents
+    WHERE similarity(canonical_title, %s::text) > 0.3
+    ORDER BY raw_score DESC
+    LIMIT 15
+"""
+
+
+def fuse_results(rows_by_source, limit=SEARCH_RESULT_LIMIT):
+    """
+    Reference score fusion for hybrid search.
+
+    rows_by_source maps a match_type ("vector", "fuzzy", "text", "legacy") to
+    rows carrying doc_id, raw_score and document columns. Sources are folded in
+    FUSION_ORDER; HYBRID_SEARCH_SQL must produce the same ranking.
+    """
+    doc_map = {}
+
+    def add_result(row, source_weight=1.0):
+        did = row['doc_id']
+        score = float(row['raw_score']) * source_weight
+
+        if did not in doc_map:
+            doc_map[did] = {
+                "doc_id": did,
+                "title": row.get("title"),
+                "canonical_title": row.get("canonical_title"),
+                "tags": row.get("tags"),
+                "snippet": row.get("snippet"),
+                "s3_path": row.get("s3_path"),
+                "score": score,
+                "sources": {row['match_type']}
+            }
+        else:
+            curr = doc_map[did]['score']
+            doc_map[did]['score'] = max(curr, score) + (0.2 * min(curr, score))
+            doc_map[did]['sources'].add(row['match_type'])
+
+    for source in FUSION_ORDER:
+        for r in rows_by_source.get(source) or []:
+            add_result(r, SOURCE_WEIGHTS[source])
+
+    final_results = list(doc_map.values())
+    final_results.sort(key=lambda x: x['score'], reverse=True)
+
+    return final_results[:limit]
+
+
+def _hybrid_params(search_terms, query_embedding, raw_query, language):
+    return {
+        "embedding": query_embedding,
+        "raw_query": raw_query,
+        "language": language,
+        "patterns": [f"%{term}%" for term in (search_terms or [])],
+    }
+
+
+def _hybrid_row(r):
+    return {
+        "doc_id": r["doc_id"],
+        "title": r["title"],
+        "canonical_title": r["canonical_title"],
+        "tags": r["tags"],
+        "snippet": r["snippet"],
+        "s3_path": r["s3_path"],
+        "score": float(r["score"]),
+        "sources": set(r["sources"] or []),
+    }
+
+
 def search_documents(search_terms, query_embedding=None, raw_query=None, language="en"):
     """
     Hybrid Search v2:
     1. Vector Search (Semantic) - Score 0.0-1.0
     2. Full Text Search (Keyword) - Score Normalized
     3. Trigram Fuzzy Search (Title Matching) - Score 0.0-1.0
+
+    All sources are fetched and fused by HYBRID_SEARCH_SQL in a single round trip.
+    If that statement fails (e.g. pg_trgm missing) we fall back to the
+    per-source queries and fuse them in Python.
+
+    Raises SearchUnavailable when the database can't be searched and no local
+    snapshot is loaded; [] always means "searched, nothing matched".
     """
-    conn = get_db_connection()
+    if _use_local_first():
+        return _search_local(search_terms, query_embedding, raw_query, language)
+    if not SINGLE_QUERY_SEARCH:
+        return search_documents_multi(search_terms, query_embedding, raw_query, language)
+
+    try:
+        conn = get_db_connection()
+    except Exception as e:
+        print(f"[ERROR] DB connection failed: {e}")
+        local = _search_local(search_terms, query_embedding, raw_query, language)
+        if local is None:
+            raise SearchUnavailable(f"DB connection failed: {e}") from e
+        return local
     try:
         with conn.cursor(cursor_factory=psycopg2.extras.DictCursor) as cur:
-            # 1. Vector Search
-            vector_results = []
-            if query_embedding:
-                try:
-                    # --- DIAGNOSTICS START ---
-                    logger.info(f"DEBUG: Embedding size: {len(query_embedding)} dimensions")
-                    
-                    logger.info("DEBUG: Running Warmup (SELECT 1)...")
-                    cur.execute("SELECT 1")
-                    logger.info("DEBUG: Warmup complete.")
-
-                    logger.info("DEBUG: Setting statement_timeout to 10s...")
-                    cur.execute("SET statement_timeout = 10000") # 10s
-                    # --- DIAGNOSTICS END ---
-
-                    logger.info("DEBUG: Executing Vector Search query...")
-                    cur.execute("""
-                        SELECT doc_id, title, canonical_title, tags, snippet, s3_path,
-                               (1 - (embedding <=> %s::vector)) as raw_score,
-                               'vector' as match_type
-                        FROM documents
-                        WHERE (1 - (embedding <=> %s::vector)) > 0.35
-                        ORDER BY raw_score DESC
-                        LIMIT 25
-                    """, (query_embedding, query_embedding))
-                    logger.info("DEBUG: Vector Search query finished.")
-                    vector_results = cur.fetchall()
-                except Exception as e:
-                    print(f"[WARN] Vector search failed: {e}")
-                    conn.rollback()
-
-            # 2. Text Search (TSVECTOR)
-            text_results = []
-            if raw_query:
-                try:
-                    logger.info("DEBUG: Executing Text Search query...")
-                    cur.execute("""
-                        SELECT doc_id, title, canonical_title, tags, snippet, s3_path,
-                               LEAST(ts_rank(search_vector, websearch_to_tsquery('english', %s)) * 1.5, 1.0) as raw_score,
-                               'text' as match_type
-                        FROM documents
-                        WHERE search_vector @@ websearch_to_tsquery('english', %s)
-                        ORDER BY raw_score DESC
-                        LIMIT 20
-                    """, (raw_query, raw_query))
-                    logger.info("DEBUG: Text Search query finished.")
-                    text_results = cur.fetchall()
-                except Exception as e:
-                    print(f"[WARN] Text search failed: {e}")
-                    conn.rollback()
-
-            # 3. Trigram Fuzzy Search
-            trigram_results = []
-            if raw_query and len(raw_query) > 3:
-                try:
-                    cur.execute("""
-                        SELECT doc_id, title, canonical_title, tags, snippet, s3_path,
-                               similarity(canonical_title, %s::text) as raw_score,
-                               'fuzzy' as match_type
-                        FROM documents
-                        WHERE similarity(canonical_title, %s::text) > 0.3
-                        ORDER BY raw_score DESC
-                        LIMIT 15
-                    """, (raw_query, raw_query))
-                    trigram_results = cur.fetchall()
-                except Exception as e:
-                    print(f"[WARN] Trigram search failed: {e}")
-                    conn.rollback()
-
-            # 4. Legacy ILIKE fallback
-            legacy_results = []
-            total_hits = len(vector_results) + len(text_results) + len(trigram_results)
-            
-            if total_hits < 3 and search_terms:
-                sql = """
-                SELECT doc_id, title, canonical_title, tags, snippet, s3_path, 
-                       0.2 as raw_score, 'legacy' as match_type
-                FROM documents WHERE language = %s
-                """
-                params = [language]
-                conds = []
-                for term in search_terms:
-                    conds.append("(canonical_title ILIKE %s OR snippet ILIKE %s)")
-                    params.extend([f"%{term}%", f"%{term}%"])
-                if conds:
-                    sql += " AND (" + " OR ".join(conds) + ")"
-                    sql += " LIMIT 10"
-                    try:
-                        cur.execute(sql, params)
-                        legacy_results = cur.fetchall()
-                    except Exception:
-                        conn.rollback()
-
-            # Combine results with score fusion
-            doc_map = {}
-            
-            def add_result(row, source_weight=1.0):
-                did = row['doc_id']
-                score = float(row['raw_score']) * source_weight
-                
-                if did not in doc_map:
-                    doc_map[did] = {
-                        "doc_id": did,
-                        "title": row.get("title"),
-                        "canonical_title": row.get("canonical_title"),
-                        "tags": row.get("tags"),
-                        "snippet": row.get("snippet"),
-                        "s3_path": row.get("s3_path"),
-                        "score": score,
-                        "sources": {row['match_type']}
-                    }
-                else:
-                    curr = doc_map[did]['score']
-                    doc_map[did]['score'] = max(curr, score) + (0.2 * min(curr, score))
-                    doc_map[did]['sources'].add(row['match_type'])
-
-            for r in vector_results: add_result(r, 1.0)
-            for r in trigram_results: add_result(r, 1.2)
-            for r in text_results: add_result(r, 0.9)
-            for r in legacy_results: add_result(r, 0.5)
-            
-            final_results = list(doc_map.values())
-            final_results.sort(key=lambda x: x['score'], reverse=True)
-            
-            return final_results[:40]
+            try:
+                with stage_timer("hybrid_sql"):
+                    cur.execute(HYBRID_SEARCH_SQL, _hybrid_params(search_terms, query_embedding, raw_query, language))
+                    rows = cur.fetchall()
+            except Exception as e:
+                print(f"[WARN] Hybrid search query failed, using per-source queries: {e}")
+                conn.rollback()
+                return _search_documents_multi(cur, conn, search_terms, query_embedding, raw_query, language)
+
+            return [_hybrid_row(r) for r in rows]
 
     except Exception as e:
         print(f"[ERROR] DB Error: {e}")
-        return []
+        local = _search_local(search_terms, query_embedding, raw_query, language)
+        if local is None:
+            raise SearchUnavailable(f"DB error: {e}") from e
+        return local
     finally:
         release_db_connection(conn)
+
+
+async def search_documents_async(search_terms, query_embedding=None, raw_query=None, language="en"):
+    """
+    Non-blocking variant of search_documents for the FastAPI event loop.
+    Uses the asyncio pool when available, otherwise runs the sync path in a thread.
+    Raises PoolSaturated when the pool is exhausted and no local snapshot can answer.
+    """
+    if _use_local_first():
+        return _search_local(search_terms, query_embedding, raw_query, language)
+    if not async_pool or not SINGLE_QUERY_SEARCH:
+        return await asyncio.to_thread(search_documents, search_terms, query_embedding, raw_query, language)
+
+    try:
+        t0 = time.perf_counter()
+        async with async_pool.connection() as conn:
+            observe_pool_wait("async", time.perf_counter() - t0)
+            with stage_timer("hybrid_sql"):
+                cur = await conn.execute(
+                    HYBRID_SEARCH_SQL, _hybrid_params(search_terms, query_embedding, raw_query, language)
+                )
+                rows = await cur.fetchall()
+        return [_hybrid_row(r) for r in rows]
+    except (PoolTimeout, TooManyRequests) as e:
+        # Saturated: don't pile onto the threaded pool as well
+        logger.error(f"Async pool exhausted: {e} | {async_pool_stats()}")
+        local = _search_local(search_terms, query_embedding, raw_query, language)
+        if local is None:
+            raise PoolSaturated(str(e)) from e
+        return local
+    except Exception as e:
+        print(f"[WARN] Async hybrid search failed, using threaded pool: {e}")
+        return await asyncio.to_thread(search_documents, search_terms, query_embedding, raw_query, language)
+
+
+def search_documents_multi(search_terms, query_embedding=None, raw_query=None, language="en"):
+    """Per-source hybrid search fused in Python (reference path for HYBRID_SEARCH_SQL)."""
+    try:
+        conn = get_db_connection()
+    except Exception as e:
+        raise SearchUnavailable(f"DB connection failed: {e}") from e
+    try:
+        with conn.cursor(cursor_factory=psycopg2.extras.DictCursor) as cur:
+            return _search_documents_multi(cur, conn, search_terms, query_embedding, raw_query, language)
+    except SearchUnavailable:
+        raise
+    except Exception as e:
+        print(f"[ERROR] DB Error: {e}")
+        raise SearchUnavailable(f"DB error: {e}") from e
+    finally:
+        release_db_connection(conn)
+
+
+@timed("multi_sql")
+def _search_documents_multi(cur, conn, search_terms, query_embedding, raw_query, language):
+    attempted, failed = 0, []
+
+    # 1. Vector Search
+    vector_results = []
+    if query_embedding:
+        attempted += 1
+        try:
+            cur.execute(VECTOR_SEARCH_SQL, (query_embedding, query_embedding))
+            vector_results = cur.fetchall()
+        except Exception as e:
+            print(f"[WARN] Vector search failed: {e}")
+            failed.append(e)
+            conn.rollback()
+
+    # 2. Text Search (TSVECTOR)
+    text_results = []
+    if raw_query:
+        attempted += 1
+        try:
+            cur.execute(TEXT_SEARCH_SQL, (raw_query, raw_query))
+            text_results = cur.fetchall()
+        except Exception as e:
+            print(f"[WARN] Text search failed: {e}")
+            failed.append(e)
+            conn.rollback()
+
+    # 3. Trigram Fuzzy Search
+    trigram_results = []
+    if raw_query and len(raw_query) > 3:
+        attempted += 1
+        try:
+            cur.execute(TRIGRAM_SEARCH_SQL, (raw_query, raw_query))
+            trigram_results = cur.fetchall()
+        except Exception as e:
+            print(f"[WARN] Trigram search failed: {e}")
+            failed.append(e)
+            conn.rollback()
+
+    # Every source erroring is an outage, not an empty result
+    if attempted and len(failed) == attempted:
+        raise SearchUnavailable(f"All search sources failed: {failed[0]}")
+
+    # 4. Legacy ILIKE fallback
+    legacy_results = []
+    total_hits = len(vector_results) + len(text_results) + len(trigram_results)
+
+    if total_hits < 3 and search_terms:
+        sql = """
+        SELECT doc_id, title, canonical_title, tags, snippet, s3_path, 
+               0.2 as raw_score, 'legacy' as match_type
+        FROM documents WHERE language = %s
+        """
+        params = [language]
+        conds = []
+        for term in search_terms:
+            conds.append("(canonical_title ILIKE %s OR snippet ILIKE %s)")
+            params.extend([f"%{term}%", f"%{term}%"])
+        if conds:
+            sql += " AND (" + " OR ".join(conds) + ")"
+            sql += " LIMIT 10"
+            try:
+                cur.execute(sql, params)
+                legacy_results = cur.fetchall()
+            except Exception:
+                conn.rollback()
+
+    # Combine results with score fusion
+    return fuse_results({
+        "vector": vector_results,
+        "fuzzy": trigram_results,
+        "text": text_results,
+        "legacy": legacy_results,
+    })
@@ -0,0 +1,185 @@
+"""
+template_cache.py - Local disk cache for S3 template objects.
+
+- Content-addressed: each object version lives at <dir>/<sha256(bucket/key@etag)>/<filename>,
+  so two templates with the same file name never collide
+- Revalidated with a conditional GET (If-None-Match: etag); a 304 costs no body transfer
+- Entries fresher than TEMPLATE_CACHE_REVALIDATE_SECONDS are served without asking S3
+- LRU eviction once the total cached size exceeds TEMPLATE_CACHE_MAX_BYTES, skipping
+  entries used within TEMPLATE_CACHE_EVICT_GRACE_SECONDS (the cache may briefly overshoot)
+- A version replaced by a new ETag is deleted on a later store, once it has been unused
+  for the same grace period
+"""
+import os
+import json
+import time
+import shutil
+import hashlib
+import logging
+import threading
+from pathlib import Path
+
+from botocore.exceptions import ClientError
+
+logger = logging.getLogger(__name__)
+
+TEMPLATE_CACHE_DIR = Path(os.getenv("TEMPLATE_CACHE_DIR", "template_cache"))
+TEMPLATE_CACHE_MAX_BYTES = int(os.getenv("TEMPLATE_CACHE_MAX_BYTES", 512 * 1024 * 1024))
+TEMPLATE_CACHE_REVALIDATE_SECONDS = float(os.getenv("TEMPLATE_CACHE_REVALIDATE_SECONDS", 300))
+# Entries used this recently are never evicted: their path may just have been handed to a caller
+TEMPLATE_CACHE_EVICT_GRACE_SECONDS = float(os.getenv("TEMPLATE_CACHE_EVICT_GRACE_SECONDS", 30))
+
+_INDEX_FILE = "index.json"
+
+
+def _is_not_modified(err):
+    code = str(err.response.get("Error", {}).get("Code", ""))
+    status = err.response.get("ResponseMetadata", {}).get("HTTPStatusCode")
+    return code in ("304", "NotModified") or status == 304
+
+
+class TemplateCache:
+    def __init__(self, s3_client, cache_dir=TEMPLATE_CACHE_DIR, max_bytes=TEMPLATE_CACHE_MAX_BYTES,
+                 revalidate_seconds=TEMPLATE_CACHE_REVALIDATE_SECONDS):
+        self.s3 = s3_client
+        self.dir = Path(cache_dir)
+        self.max_bytes = max_bytes
+        self.revalidate_seconds = revalidate_seconds
+        self._lock = threading.Lock()
+        self._key_locks = {}
+        # "bucket/key" -> {"etag", "path", "size", "last_used", "validated_at"}
+        self._entries = {}
+        # Directories of versions replaced by a newer ETag: (dir, last_used), deleted after the grace period
+        self._retired = []
+        self.hits = 0
+        self.revalidated = 0
+        self.downloads = 0
+        self._load_index()
+
+    # ---------- index ----------
+
+    def _load_index(self):
+        self.dir.mkdir(parents=True, exist_ok=True)
+        idx = self.dir / _INDEX_FILE
+        if not idx.exists():
+            return
+        try:
+            entries = json.loads(idx.read_text(encoding="utf-8"))
+        except (OSError, json.JSONDecodeError):
+            return
+        for k, e in entries.items():
+            if Path(e["path"]).exists():
+                e["validated_at"] = 0.0  # revalidate once after restart
+                self._entries[k] = e
+
+    def _save_index(self):
+        tmp = self.dir / f"{_INDEX_FILE}.tmp"
+        tmp.write_text(json.dumps(self._entries), encoding="utf-8")
+        tmp.replace(self.dir / _INDEX_FILE)
+
+    def _key_lock(self, name):
+        with self._lock:
+            return self._key_locks.setdefault(name, threading.Lock())
+
+    # ---------- public ----------
+
+    def fetch(self, bucket, key):
+        """Return a local Path holding the current version of s3://bucket/key."""
+        name = f"{bucket}/{key}"
+        with self._key_lock(name):
+            with self._lock:
+                entry = dict(self._entries[name]) if name in self._entries else None
+
+            if entry and time.time() - entry["validated_at"] < self.revalidate_seconds:
+                self._touch(name, validated=False)
+                self.hits += 1
+                return Path(entry["path"])
+
+            kwargs = {"Bucket": bucket, "Key": key}
+            if entry:
+                kwargs["IfNoneMatch"] = entry["etag"]
+            try:
+                obj = self.s3.get_object(**kwargs)
+            except ClientError as e:
+                if entry and _is_not_modified(e):
+                    self._touch(name, validated=True)
+                    self.revalidated += 1
+                    return Path(entry["path"])
+                raise
+
+            path = self._store(name, bucket, key, obj)
+            self.downloads += 1
+            return path
+
+    def stats(self):
+        with self._lock:
+            total = sum(e["size"] for e in self._entries.values())
+            count = len(self._entries)
+        lookups = self.hits + self.revalidated + self.downloads
+        return {
+            "entries": count,
+            "bytes": total,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "revalidated_304": self.revalidated,
+            "downloads": self.downloads,
+            "hit_ratio": round((self.hits + self.revalidated) / lookups, 3) if lookups else 0.0,
+        }
+
+    # ---------- internals ----------
+
+    def _touch(self, name, validated):
+        with self._lock:
+            e = self._entries.get(name)
+            if e:
+                e["last_used"] = time.time()
+                if validated:
+                    e["validated_at"] = e["last_used"]
+
+    def _store(self, name, bucket, key, obj):
+        etag = obj.get("ETag", "")
+        digest = hashlib.sha256(f"{bucket}/{key}@{etag}".encode("utf-8")).hexdigest()
+        target_dir = self.dir / digest
+        target_dir.mkdir(parents=True, exist_ok=True)
+        path = target_dir / (key.split("/")[-1] or "object")
+
+        tmp = path.with_name(path.name + ".part")
+        size = 0
+        with tmp.open("wb") as f:
+            for chunk in obj["Body"].iter_chunks(64 * 1024):
+                f.write(chunk)
+                size += len(chunk)
+        tmp.replace(path)
+
+        now = time.time()
+        with self._lock:
+            old = self._entries.get(name)
+            self._entries[name] = {
+                "etag": etag, "path": str(path), "size": size,
+                "last_used": now, "validated_at": now,
+            }
+            # An ETag that changes back reuses its old directory
+            self._retired = [(d, used) for d, used in self._retired if d != target_dir]
+            if old and old["path"] != str(path):
+                self._retired.append((Path(old["path"]).parent, old["last_used"]))
+            stale_dirs = self._evict_locked(keep=name)
+            self._save_index()
+
+        for d in stale_dirs:
+            shutil.rmtree(d, ignore_errors=True)
+        return path
+
+    def _evict_locked(self, keep):
+        total = sum(e["size"] for e in self._entries.values())
+        recent = time.time() - TEMPLATE_CACHE_EVICT_GRACE_SECONDS
+        removed = [d for d, used in self._retired if used < recent]
+        self._retired = [(d, used) for d, used in self._retired if used >= recent]
+        for name, e in sorted(self._entries.items(), key=lambda kv: kv[1]["last_used"]):
+            if total <= self.max_bytes or e["last_used"] >= recent:
+                break
+            if name == keep:
+                continue
+            total -= e["size"]
+            removed.append(Path(e["path"]).parent)
+            del self._entries[name]
+        return removed
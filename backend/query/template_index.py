@@ -0,0 +1,362 @@
+"""
+template_index.py - In-process snapshot of the documents table for search without Postgres.
+
+Three indexes over the same rows, answering the same sources as HYBRID_SEARCH_SQL:
+1. Vector: L2-normalized float32 embedding matrix (memory-mapped .npy), cosine via one matvec
+2. Text: inverted index of title/snippet tokens (AND semantics like websearch_to_tsquery)
+3. Fuzzy: pg_trgm-style trigram index over canonical_title (shared / union trigrams)
+
+On disk (TEMPLATE_INDEX_DIR):
+    embeddings.npy   N x dim float32, rows aligned with meta.json
+    meta.json        {"fingerprint": ..., "rows": [{doc_id, title, canonical_title, tags, snippet, s3_path, language}]}
+
+TEMPLATE_INDEX_MODE:
+- "off": not loaded
+- "fallback": sql.search_documents answers from the snapshot when the DB is unreachable
+- "primary": the snapshot answers every search; Postgres is only read to refresh it
+
+Build a snapshot by hand with:
+
+    python template_index.py --build
+"""
+import os
+import re
+import json
+import time
+import shutil
+import logging
+import threading
+from collections import Counter, defaultdict
+from pathlib import Path
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+TEMPLATE_INDEX_MODE = os.getenv("TEMPLATE_INDEX_MODE", "off").lower()
+TEMPLATE_INDEX_DIR = Path(os.getenv("TEMPLATE_INDEX_DIR", Path(__file__).parent / "template_index"))
+TEMPLATE_INDEX_REFRESH_SECONDS = float(os.getenv("TEMPLATE_INDEX_REFRESH_SECONDS", 600))
+
+# Mirrors the per-source thresholds and limits in sql.HYBRID_SEARCH_SQL
+VECTOR_LIMIT, VECTOR_MIN_SCORE = 25, 0.35
+TEXT_LIMIT = 20
+FUZZY_LIMIT, FUZZY_MIN_SCORE = 15, 0.3
+LEGACY_LIMIT = 10
+
+_WORD_RE = re.compile(r"[a-z0-9]+")
+_META_FIELDS = ("doc_id", "title", "canonical_title", "tags", "snippet", "s3_path", "language")
+
+# Postgres 'english' stopwords that commonly appear in template queries
+_EN_STOPWORDS = {
+    "a", "an", "the", "of", "for", "to", "in", "on", "at", "by", "with", "and", "or", "from",
+    "into", "as", "is", "are", "be", "it", "its", "this", "that", "these", "those", "me", "my",
+    "i", "we", "our", "us", "you", "your", "some", "any", "all", "which", "who", "what", "where",
+    "how", "can", "will", "should", "about", "not", "no",
+}
+
+
+def _words(text):
+    return _WORD_RE.findall((text or "").lower())
+
+
+def _stem(word):
+    # Just enough of the english stemmer to fold plurals ("agreements" -> "agreement")
+    if len(word) > 3 and word.endswith("s") and not word.endswith("ss"):
+        return word[:-1]
+    return word
+
+
+def _terms(text):
+    return [_stem(w) for w in _words(text) if w not in _EN_STOPWORDS]
+
+
+def _trigrams(text):
+    """pg_trgm's show_trgm: each word padded with two leading and one trailing space."""
+    grams = set()
+    for w in _words(text):
+        padded = f"  {w} "
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+def _snapshot_fingerprint(cur):
+    # ingest bumps updated_at; backfill only changes embeddings, so count those too
+    cur.execute("SELECT count(*), count(embedding), max(updated_at)::text FROM documents")
+    return list(cur.fetchone())
+
+
+class TemplateIndex:
+    def __init__(self, rows, embeddings, fingerprint=None):
+        self.rows = rows
+        self.embeddings = embeddings
+        self.fingerprint = fingerprint
+        self.loaded_at = time.time()
+
+        # Postings are sorted int32 row-index arrays so lookups are NumPy ops, not Python loops
+        postings = defaultdict(list)          # term -> [(row, tf)]
+        trgm_postings = defaultdict(list)     # trigram -> [row]
+        trgm_sizes = []
+        for i, r in enumerate(rows):
+            tf = Counter(_terms(f"{r.get('canonical_title') or ''} {r.get('snippet') or ''}"))
+            for t, n in tf.items():
+                postings[t].append((i, n))
+            grams = _trigrams(r.get("canonical_title"))
+            trgm_sizes.append(len(grams))
+            for g in grams:
+                trgm_postings[g].append(i)
+
+        self._postings = {
+            t: (np.array([i for i, _ in p], dtype=np.int32), np.array([n for _, n in p], dtype=np.float32))
+            for t, p in postings.items()
+        }
+        self._trgm_postings = {g: np.array(p, dtype=np.int32) for g, p in trgm_postings.items()}
+        self._trgm_sizes = np.array(trgm_sizes, dtype=np.float32)
+
+    def __len__(self):
+        return len(self.rows)
+
+    # ---------- persistence ----------
+
+    @classmethod
+    def from_db(cls, conn):
+        with conn.cursor() as cur:
+            fingerprint = _snapshot_fingerprint(cur)
+            cur.execute("""
+                SELECT doc_id::text, title, canonical_title, tags, snippet, s3_path, language, embedding::text
+                FROM documents
+                ORDER BY doc_id
+            """)
+            rows, vectors = [], []
+            for rec in cur:
+                rows.append(dict(zip(_META_FIELDS, rec[:7])))
+                vectors.append(np.array(rec[7].strip("[]").split(","), dtype=np.float32) if rec[7] else None)
+
+        dim = next((len(v) for v in vectors if v is not None), 0)
+        mat = np.zeros((len(rows), dim), dtype=np.float32)
+        for i, v in enumerate(vectors):
+            if v is not None:
+                norm = np.linalg.norm(v)
+                mat[i] = v / norm if norm else v
+        return cls(rows, mat, fingerprint)
+
+    def save(self, path=TEMPLATE_INDEX_DIR):
+        """Write to a sibling temp dir and swap, so a reader never sees half a snapshot."""
+        path = Path(path)
+        tmp = path.with_name(path.name + ".tmp")
+        shutil.rmtree(tmp, ignore_errors=True)
+        tmp.mkdir(parents=True)
+        np.save(tmp / "embeddings.npy", np.ascontiguousarray(self.embeddings, dtype=np.float32))
+        (tmp / "meta.json").write_text(
+            json.dumps({"fingerprint": self.fingerprint, "rows": self.rows}, ensure_ascii=False),
+            encoding="utf-8",
+        )
+        old = path.with_name(path.name + ".old")
+        shutil.rmtree(old, ignore_errors=True)
+        if path.exists():
+            path.rename(old)
+        tmp.rename(path)
+        shutil.rmtree(old, ignore_errors=True)
+
+    @classmethod
+    def load(cls, path=TEMPLATE_INDEX_DIR):
+        path = Path(path)
+        if not (path / "meta.json").exists():
+            return None
+        meta = json.loads((path / "meta.json").read_text(encoding="utf-8"))
+        embeddings = np.load(path / "embeddings.npy", mmap_mode="r")
+        return cls(meta["rows"], embeddings, meta.get("fingerprint"))
+
+    # ---------- search ----------
+
+    def _row(self, i, score, match_type):
+        r = self.rows[int(i)]
+        return {
+            "doc_id": r["doc_id"], "title": r["title"], "canonical_title": r["canonical_title"],
+            "tags": r["tags"], "snippet": r["snippet"], "s3_path": r["s3_path"],
+            "raw_score": float(score), "match_type": match_type,
+        }
+
+    def _vector(self, query_embedding):
+        if query_embedding is None or not len(self) or not self.embeddings.shape[1]:
+            return []
+        q = np.asarray(query_embedding, dtype=np.float32)
+        norm = np.linalg.norm(q)
+        if not norm:
+            return []
+        sims = self.embeddings @ (q / norm)
+        k = min(VECTOR_LIMIT, len(sims))
+        top = np.argpartition(-sims, k - 1)[:k]
+        top = top[np.argsort(-sims[top])]
+        return [self._row(i, sims[i], "vector") for i in top if sims[i] > VECTOR_MIN_SCORE]
+
+    def _text(self, raw_query):
+        terms = list(dict.fromkeys(_terms(raw_query)))
+        if not terms:
+            return []
+        if any(t not in self._postings for t in terms):
+            return []
+        matches = self._postings[terms[0]][0]
+        for t in terms[1:]:
+            matches = np.intersect1d(matches, self._postings[t][0], assume_unique=True)
+        if not len(matches):
+            return []
+        # Approximates LEAST(ts_rank * 1.5, 1.0): saturating term frequency per query term
+        rank = np.zeros(len(matches), dtype=np.float32)
+        for t in terms:
+            idx, tf = self._postings[t]
+            n = tf[np.searchsorted(idx, matches)]
+            rank += 0.1 * n / (n + 1.0)
+        scores = np.minimum(rank * 1.5, 1.0)
+        order = np.argsort(-scores, kind="stable")[:TEXT_LIMIT]
+        return [self._row(matches[j], scores[j], "text") for j in order]
+
+    def _fuzzy(self, raw_query):
+        if not raw_query or len(raw_query) <= 3:
+            return []
+        q_grams = _trigrams(raw_query)
+        if not q_grams:
+            return []
+        hits = [self._trgm_postings[g] for g in q_grams if g in self._trgm_postings]
+        if not hits:
+            return []
+        shared = np.bincount(np.concatenate(hits), minlength=len(self)).astype(np.float32)
+        cand = np.nonzero(shared)[0]
+        sims = shared[cand] / (len(q_grams) + self._trgm_sizes[cand] - shared[cand])
+        keep = sims > FUZZY_MIN_SCORE
+        cand, sims = cand[keep], sims[keep]
+        order = np.argsort(-sims, kind="stable")[:FUZZY_LIMIT]
+        return [self._row(cand[j], sims[j], "fuzzy") for j in order]
+
+    def _legacy(self, search_terms, language):
+        needles = [t.lower() for t in search_terms or [] if t]
+        out = []
+        for i, r in enumerate(self.rows):
+            if r.get("language") != language:
+                continue
+            hay = f"{(r.get('canonical_title') or '').lower()}\n{(r.get('snippet') or '').lower()}"
+            if any(n in hay for n in needles):
+                out.append(self._row(i, 0.2, "legacy"))
+                if len(out) >= LEGACY_LIMIT:
+                    break
+        return out
+
+    def search_sources(self, search_terms, query_embedding=None, raw_query=None, language="en"):
+        """Per-source candidate rows in the shape sql.fuse_results expects."""
+        sources = {
+            "vector": self._vector(query_embedding),
+            "text": self._text(raw_query),
+            "fuzzy": self._fuzzy(raw_query),
+            "legacy": [],
+        }
+        if len(sources["vector"]) + len(sources["text"]) + len(sources["fuzzy"]) < 3 and search_terms:
+            sources["legacy"] = self._legacy(search_terms, language)
+        return sources
+
+    def stats(self):
+        return {
+            "documents": len(self),
+            "dim": int(self.embeddings.shape[1]) if len(self) else 0,
+            "terms": len(self._postings),
+            "trigrams": len(self._trgm_postings),
+            "age_seconds": round(time.time() - self.loaded_at, 1),
+            "fingerprint": self.fingerprint,
+        }
+
+
+class TemplateIndexManager:
+    """Holds the current snapshot and refreshes it from Postgres in a daemon thread."""
+
+    def __init__(self, path=TEMPLATE_INDEX_DIR, refresh_seconds=TEMPLATE_INDEX_REFRESH_SECONDS):
+        self.path = Path(path)
+        self.refresh_seconds = refresh_seconds
+        self.index = None
+        self.refreshes = 0
+        self.refresh_errors = 0
+        self.served = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def load(self):
+        try:
+            self.index = TemplateIndex.load(self.path)
+        except Exception as e:
+            logger.warning(f"Template index: snapshot at {self.path} unreadable: {e}")
+        if self.index:
+            logger.info(f"Template index: loaded {len(self.index)} documents from {self.path}")
+        return self.index
+
+    def refresh(self, get_conn, release_conn):
+        """Rebuild from the DB if the documents table changed since the current snapshot."""
+        conn = get_conn()
+        try:
+            with conn.cursor() as cur:
+                fingerprint = _snapshot_fingerprint(cur)
+            if self.index and self.index.fingerprint == fingerprint:
+                return False
+            index = TemplateIndex.from_db(conn)
+        finally:
+            release_conn(conn)
+        index.save(self.path)
+        # Re-open so the matrix is memory-mapped rather than held on the heap
+        self.index = TemplateIndex.load(self.path)
+        self.refreshes += 1
+        logger.info(f"Template index: refreshed, {len(self.index)} documents")
+        return True
+
+    def start(self, get_conn, release_conn):
+        if self._thread:
+            return
+
+        def _loop():
+            while not self._stop.is_set():
+                try:
+                    self.refresh(get_conn, release_conn)
+                except Exception as e:
+                    self.refresh_errors += 1
+                    logger.warning(f"Template index: refresh failed, keeping current snapshot: {e}")
+                self._stop.wait(self.refresh_seconds)
+
+        self._thread = threading.Thread(target=_loop, name="template-index-refresh", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread = None
+
+    def search_sources(self, *args, **kwargs):
+        if self.index is None:
+            return None
+        self.served += 1
+        return self.index.search_sources(*args, **kwargs)
+
+    def stats(self):
+        out = {
+            "mode": TEMPLATE_INDEX_MODE,
+            "loaded": self.index is not None,
+            "served": self.served,
+            "refreshes": self.refreshes,
+            "refresh_errors": self.refresh_errors,
+            "refresh_seconds": self.refresh_seconds,
+        }
+        if self.index is not None:
+            out.update(self.index.stats())
+        return out
+
+
+if __name__ == "__main__":
+    import sys
+    import psycopg2
+    from dotenv import load_dotenv
+
+    load_dotenv()
+    if "--build" in sys.argv:
+        conn = psycopg2.connect(os.getenv("POSTGRES_DSN"))
+        try:
+            index = TemplateIndex.from_db(conn)
+        finally:
+            conn.close()
+        index.save()
+        print(f"Wrote {len(index)} documents to {TEMPLATE_INDEX_DIR}")
+    else:
+        index = TemplateIndex.load()
+        print(json.dumps(index.stats() if index else {"loaded": False}, indent=2))
@@ -0,0 +1,85 @@
+"""
+Parity checks for the single-round-trip hybrid search.
+
+fuse_results() is the reference implementation of score fusion; the combined
+HYBRID_SEARCH_SQL statement must rank documents the same way. The database
+checks run only when QUERY_TEST_POSTGRES_DSN points at a documents table
+with pgvector and pg_trgm installed.
+"""
+import os
+
+import pytest
+
+pytest.importorskip("psycopg2")
+pytest.importorskip("sshtunnel")
+
+import sql  # noqa: E402
+
+
+def _row(doc_id, raw_score, match_type):
+    return {"doc_id": doc_id, "raw_score": raw_score, "match_type": match_type, "title": doc_id}
+
+
+def test_fuse_results_folds_sources_in_order():
+    fused = sql.fuse_results({
+        "vector": [_row("a", 0.8, "vector")],
+        "fuzzy": [_row("a", 0.5, "fuzzy"), _row("b", 0.7, "fuzzy")],
+        "text": [_row("a", 0.4, "text")],
+    })
+
+    by_id = {r["doc_id"]: r for r in fused}
+    # vector 0.8 then fuzzy 0.6 -> 0.8 + 0.12 = 0.92; then text 0.36 -> 0.92 + 0.072
+    assert by_id["a"]["score"] == pytest.approx(0.992)
+    assert by_id["a"]["sources"] == {"vector", "fuzzy", "text"}
+    assert by_id["b"]["score"] == pytest.approx(0.84)
+    assert [r["doc_id"] for r in fused] == ["a", "b"]
+
+
+def test_fuse_results_respects_limit():
+    rows = [_row(str(i), i / 100, "vector") for i in range(60)]
+    fused = sql.fuse_results({"vector": rows}, limit=5)
+    assert [r["doc_id"] for r in fused] == ["59", "58", "57", "56", "55"]
+
+
+def test_db_failure_raises_instead_of_returning_no_match(monkeypatch):
+    def broken():
+        raise RuntimeError("connection refused")
+
+    monkeypatch.setattr(sql, "get_db_connection", broken)
+    monkeypatch.setattr(sql, "template_index", None)
+    for single_query in (True, False):
+        monkeypatch.setattr(sql, "SINGLE_QUERY_SEARCH", single_query)
+        with pytest.raises(sql.SearchUnavailable):
+            sql.search_documents([], query_embedding=[0.1] * 3, raw_query="rent agreement")
+
+
+TEST_DSN = os.getenv("QUERY_TEST_POSTGRES_DSN")
+
+
+@pytest.mark.skipif(not TEST_DSN, reason="QUERY_TEST_POSTGRES_DSN not set")
+@pytest.mark.parametrize("raw_query,terms", [
+    ("Rental agreement", []),
+    ("Partnership deed", ["partnership", "deed"]),
+])
+def test_hybrid_sql_matches_reference_fusion(monkeypatch, raw_query, terms):
+    monkeypatch.setattr(sql, "connection_pool", None)
+    monkeypatch.setattr(sql, "POSTGRES_DSN", TEST_DSN)
+
+    conn = sql.psycopg2.connect(TEST_DSN)
+    try:
+        with conn.cursor() as cur:
+            cur.execute("SELECT embedding::text FROM documents WHERE embedding IS NOT NULL LIMIT 1")
+            row = cur.fetchone()
+    finally:
+        conn.close()
+    embedding = [float(x) for x in row[0].strip("[]").split(",")] if row else None
+
+    combined = sql.search_documents(terms, query_embedding=embedding, raw_query=raw_query)
+    reference = sql.search_documents_multi(terms, query_embedding=embedding, raw_query=raw_query)
+
+    assert len(combined) == len(reference)
+    ref_by_id = {r["doc_id"]: r for r in reference}
+    for r in combined:
+        assert r["doc_id"] in ref_by_id
+        assert r["score"] == pytest.approx(ref_by_id[r["doc_id"]]["score"], rel=1e-5)
+        assert r["sources"] == ref_by_id[r["doc_id"]]["sources"]
@@ -0,0 +1,45 @@
+"""Offline keyword extraction must pick the terms Gemini used to, without the round trip."""
+from keyword_extractor import KeywordExtractor, tokenize
+
+ROWS = [
+    ("rental agreement", ["rent", "lease"], "This rental agreement is made between the landlord and the tenant"),
+    ("power of attorney", ["general power of attorney"], "Know all men by these presents that I appoint"),
+    ("partnership deed", ["partnership"], "Deed of partnership between the partners named below"),
+    ("non disclosure agreement", ["nda", "confidentiality"], "The receiving party shall keep confidential"),
+    ("legal notice for cheque bounce", ["cheque", "section 138"], "Notice under section 138 of the Negotiable Instruments Act"),
+]
+
+extractor = KeywordExtractor.from_rows(ROWS)
+
+
+def test_phrases_are_matched_whole_even_with_stopwords_inside():
+    result = extractor.extract("Please draft a power of attorney for property")
+    assert result["search_terms"][0] == "power of attorney"
+    assert "attorney" not in result["search_terms"]
+
+
+def test_request_phrasing_and_stopwords_are_dropped():
+    terms = extractor.extract("I need a sample rental agreement template in India")["search_terms"]
+    assert terms == ["rental agreement"]
+
+
+def test_known_terms_outrank_and_raise_confidence_over_unknown_ones():
+    known = extractor.extract("cheque bounce notice")
+    unknown = extractor.extract("zxqv frobnicate")
+    assert set(known["search_terms"]) == {"cheque", "bounce", "notice"}
+    assert known["confidence"] > unknown["confidence"]
+    assert unknown["confidence"] == 0.0
+
+
+def test_empty_and_stopword_only_input():
+    for query in ("", None, "please find me a template"):
+        result = extractor.extract(query)
+        assert result["search_terms"] == []
+        assert result["confidence"] == 0.0
+    assert tokenize(None) == []
+
+
+def test_without_vocabulary_confidence_defers_to_gemini():
+    result = KeywordExtractor().extract("rental agreement")
+    assert result["search_terms"] == ["rental", "agreement"]
+    assert result["confidence"] == 0.0
@@ -0,0 +1,45 @@
+"""EncodeBatcher must survive callers that cancel or fail while their request is queued."""
+import time
+import threading
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from query_embeddings import EncodeBatcher  # noqa: E402
+
+
+class _SlowModel:
+    def __init__(self):
+        self.release = threading.Event()
+        self.calls = []
+
+    def encode(self, texts):
+        self.calls.append(list(texts))
+        self.release.wait(2)
+        if "boom" in texts:
+            raise ValueError("bad input")
+        return np.ones((len(texts), 3))
+
+
+def test_cancelled_request_does_not_kill_the_worker():
+    model = _SlowModel()
+    batcher = EncodeBatcher(model, window_ms=1, max_batch=1)
+    first = batcher.submit("a")        # picked up immediately, blocks in encode
+    time.sleep(0.05)
+    cancelled = batcher.submit("b")    # still queued
+    assert cancelled.cancel()
+    model.release.set()
+
+    assert first.result(2) == [1.0, 1.0, 1.0]
+    assert batcher.submit("c").result(2) == [1.0, 1.0, 1.0]
+    assert ["b"] not in model.calls
+
+
+def test_model_error_reaches_callers_and_worker_keeps_running():
+    model = _SlowModel()
+    model.release.set()
+    batcher = EncodeBatcher(model, window_ms=1, max_batch=4)
+    with pytest.raises(ValueError):
+        batcher.encode("boom")
+    assert batcher.encode("ok") == [1.0, 1.0, 1.0]
@@ -0,0 +1,40 @@
+"""Batch re-scoring modes must rank candidates like the difflib score_match."""
+import pytest
+
+pytest.importorskip("numpy")
+
+from scoring import HAS_RAPIDFUZZ, score_match, score_matches  # noqa: E402
+
+ROWS = [
+    {"title": "Rental Agreement", "canonical_title": "rental agreement",
+     "snippet": "This rental agreement is made between the landlord and the tenant", "tags": ["rent"]},
+    {"title": "Partnership Deed", "canonical_title": "partnership deed",
+     "snippet": "Deed of partnership between the partners named below", "tags": []},
+    {"title": "Loan Acknowledgement", "canonical_title": "loan acknowledgement",
+     "snippet": "", "tags": None},
+]
+
+
+def test_sequencematcher_mode_matches_score_match():
+    q = "Rental agreement for house"
+    assert score_matches(ROWS, q, mode="sequencematcher") == [score_match(r, q) for r in ROWS]
+
+
+@pytest.mark.parametrize("mode", ["ngram", "rapidfuzz"])
+@pytest.mark.parametrize("query,expected", [
+    ("Rental agreement for house", "rental agreement"),
+    ("partnership deed", "partnership deed"),
+    ("acknowledgement of loan", "loan acknowledgement"),
+])
+def test_batch_modes_agree_on_best_candidate(mode, query, expected):
+    if mode == "rapidfuzz" and not HAS_RAPIDFUZZ:
+        pytest.skip("rapidfuzz not installed")
+    scores = score_matches(ROWS, query, mode=mode)
+    assert len(scores) == len(ROWS)
+    assert all(0.0 <= s <= 1.0 for s in scores)
+    best = max(zip(scores, ROWS), key=lambda x: x[0])[1]
+    assert best["canonical_title"] == expected
+
+
+def test_empty_candidates():
+    assert score_matches([], "anything") == []
@@ -0,0 +1,54 @@
+"""Replaced template versions must outlive the eviction grace period, not vanish under a caller."""
+import pytest
+
+pytest.importorskip("botocore")
+
+import template_cache  # noqa: E402
+from template_cache import TemplateCache  # noqa: E402
+
+
+class _Body:
+    def __init__(self, data):
+        self.data = data
+
+    def iter_chunks(self, size):
+        yield self.data
+
+
+class _S3:
+    def __init__(self):
+        self.etag = "v1"
+
+    def get_object(self, Bucket, Key, IfNoneMatch=None):
+        return {"ETag": self.etag, "Body": _Body(self.etag.encode())}
+
+
+def test_replaced_version_is_kept_for_the_grace_period(tmp_path, monkeypatch):
+    s3 = _S3()
+    cache = TemplateCache(s3, cache_dir=tmp_path, revalidate_seconds=0)
+    old = cache.fetch("b", "t/rent.docx")
+
+    s3.etag = "v2"
+    new = cache.fetch("b", "t/rent.docx")
+    assert new != old and new.read_bytes() == b"v2"
+    assert old.read_bytes() == b"v1"  # just handed out; still readable
+
+    monkeypatch.setattr(template_cache, "TEMPLATE_CACHE_EVICT_GRACE_SECONDS", 0)
+    s3.etag = "v3"
+    cache.fetch("b", "t/rent.docx")
+    assert not old.exists()
+
+
+def test_etag_changing_back_keeps_its_directory(tmp_path, monkeypatch):
+    s3 = _S3()
+    cache = TemplateCache(s3, cache_dir=tmp_path, revalidate_seconds=0)
+    first = cache.fetch("b", "t/rent.docx")
+    s3.etag = "v2"
+    second = cache.fetch("b", "t/rent.docx")
+    s3.etag = "v1"
+    assert cache.fetch("b", "t/rent.docx") == first
+
+    monkeypatch.setattr(template_cache, "TEMPLATE_CACHE_EVICT_GRACE_SECONDS", 0)
+    cache.fetch("b", "t/rent.docx")
+    assert not second.exists()
+    assert first.read_bytes() == b"v1"
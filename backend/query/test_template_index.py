@@ -0,0 +1,53 @@
+"""The in-process template index must answer the same sources as HYBRID_SEARCH_SQL."""
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from template_index import TemplateIndex, _trigrams  # noqa: E402
+
+ROWS = [
+    {"doc_id": "a", "title": "Rental Agreement", "canonical_title": "rental agreement",
+     "tags": ["rent"], "snippet": "This rental agreement is made between the landlord and the tenant",
+     "s3_path": "s3://b/a.pdf", "language": "en"},
+    {"doc_id": "b", "title": "Partnership Deed", "canonical_title": "partnership deed",
+     "tags": [], "snippet": "Deed of partnership between the partners named below",
+     "s3_path": "s3://b/b.pdf", "language": "en"},
+    {"doc_id": "c", "title": "Loan Acknowledgement", "canonical_title": "loan acknowledgement",
+     "tags": None, "snippet": "", "s3_path": "s3://b/c.pdf", "language": "hi"},
+]
+
+
+@pytest.fixture
+def index():
+    emb = np.eye(3, 8, dtype=np.float32)
+    return TemplateIndex(ROWS, emb, fingerprint=[3, 3, None])
+
+
+def test_trigrams_match_pg_trgm():
+    # show_trgm('word') has 5 trigrams; similarity('word', 'words') = 4 / 7
+    assert len(_trigrams("word")) == 5
+    shared = _trigrams("word") & _trigrams("words")
+    assert len(shared) / len(_trigrams("word") | _trigrams("words")) == pytest.approx(4 / 7)
+
+
+def test_sources(index):
+    sources = index.search_sources(["loan"], [1.0, 0.1, 0, 0, 0, 0, 0, 0], "rental agreements", "en")
+    assert [r["doc_id"] for r in sources["vector"]] == ["a"]
+    assert [r["doc_id"] for r in sources["text"]] == ["a"]  # plural folded, AND semantics
+    assert [r["doc_id"] for r in sources["fuzzy"]] == ["a"]
+    assert sources["legacy"] == []  # enough hits from the other sources
+    assert all(r["match_type"] == k for k, rows in sources.items() for r in rows)
+
+
+def test_legacy_filters_language(index):
+    sources = index.search_sources(["loan", "deed"], None, "zz", "en")
+    assert [r["doc_id"] for r in sources["legacy"]] == ["b"]
+
+
+def test_save_load_roundtrip(index, tmp_path):
+    index.save(tmp_path / "ix")
+    index.save(tmp_path / "ix")  # overwrite swaps the directory
+    loaded = TemplateIndex.load(tmp_path / "ix")
+    assert isinstance(loaded.embeddings, np.memmap)
+    assert loaded.fingerprint == [3, 3, None]
+    assert loaded.search_sources([], None, "partnership deed")["fuzzy"][0]["doc_id"] == "b"